@@ -4,13 +4,17 @@ Uses Self-Reflection reasoning to review content for brand alignment,
 checking against brand guidelines and past performance data.
 """
 
+import asyncio
 import logging
 import time
 
+from app.agents.context_builder import handoff_context
 from app.agents.prompts import ADVISOR_PROMPT
 from app.agents.factory import create_agent, get_agent_tools
 from app.agents.middleware import build_agent_trace_data, make_knowledge_citation
+from app.services.document_service import PLATFORM_LABELS
 from app.services.llm_service import get_llm_service
+from app.services.waterfall import record_span
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +22,23 @@ logger = logging.getLogger(__name__)
 async def run_advisor(task: str, context: dict) -> tuple[str, int, dict]:
     """Run the Advisor agent via MAF with Self-Reflection reasoning.
 
+    With ``context["drafts"]``, an ``asyncio.Queue`` of ``(platform, draft)``
+    pairs closed by ``None``, each draft is reviewed as soon as it arrives.
+    Review then overlaps with the Scribe's generation (see ``_review_drafts``).
+    Otherwise the Advisor reviews ``previous_results`` in one pass.
+
     Returns:
         Tuple of (client-ready communication, tokens used, trace data dict)
     """
-    previous = context.get("previous_results", {})
-    content_parts = []
-
-    for agent_name, result in previous.items():
-        content_parts.append(f"{agent_name.title()} Output:\n{result[:500]}")
+    if context.get("drafts") is not None:
+        return await _review_drafts(task, context)
 
-    content_str = "\n\n".join(content_parts) if content_parts else context.get("message", "")
+    previous = context.get("previous_results", {})
+    content_str = handoff_context(
+        "advisor", previous,
+        titles={agent_name: agent_name.title() for agent_name in previous},
+        template="{title} Output:\n{text}",
+    ) or context.get("message", "")
 
     prompt = f"""Task: {task}
 
@@ -45,12 +56,91 @@ Create a clear, executive-level communication that:
 2. Provides supporting context
 3. Ends with clear next steps or action items"""
 
+    return await _run(prompt)
+
+
+async def _review_drafts(task: str, context: dict) -> tuple[str, int, dict]:
+    """Review Scribe drafts one platform at a time, as they are written.
+
+    Each draft from the ``drafts`` queue starts its own review while the
+    remaining platforms are still being generated. Each finished review is
+    passed to ``context["on_review"]`` as ``(platform, review)``. Reviews are
+    assembled in the order the drafts arrived. If the queue closes without
+    any draft (the Scribe failed), the Advisor reviews ``previous_results``
+    as usual.
+    """
+    drafts: asyncio.Queue = context["drafts"]
+    on_review = context.get("on_review")
+    previous = {
+        name: text for name, text in context.get("previous_results", {}).items() if name != "scribe"
+    }
+    start_time = time.time()
+
+    async def _review(platform: str, draft: str) -> tuple[str, int, dict]:
+        label = PLATFORM_LABELS.get(platform, platform)
+        content_str = handoff_context(
+            "advisor", {**previous, "scribe": draft},
+            titles={"scribe": f"{label} Draft", "strategist": "Strategy", "memory": "Brand Context",
+                    "researcher": "Research"},
+            template="{title}:\n{text}",
+        )
+        prompt = f"""Task: {task}
+
+Review this {label} draft. The other platforms are reviewed separately.
+
+{content_str}
+
+Use available tools to retrieve brand guidelines and past post performance data.
+Apply the Self-Reflection pattern and give:
+1. A compliance score (1-10) for the {label} draft
+2. What works, what needs improvement, and any brand risk flags
+3. A suggested revision if the score is below 8"""
+        with record_span(platform, "review"):
+            review = await _run(prompt, route="advisor:review")
+        if on_review is not None:
+            await on_review(platform, review[0])
+        return review
+
+    reviews: dict[str, asyncio.Task] = {}
+    try:
+        while (item := await drafts.get()) is not None:
+            platform, draft = item
+            reviews[platform] = asyncio.create_task(_review(platform, draft))
+        results = await asyncio.gather(*reviews.values())
+    except BaseException:
+        for review_task in reviews.values():
+            review_task.cancel()
+        raise
+
+    if not reviews:
+        return await run_advisor(task, {key: value for key, value in context.items() if key != "drafts"})
+
+    text = "\n\n".join(
+        f"## {PLATFORM_LABELS.get(platform, platform)} Review\n\n{review.strip()}"
+        for platform, (review, _, _) in zip(reviews, results)
+    )
+    tokens = sum(review_tokens for _, review_tokens, _ in results)
+    trace = build_agent_trace_data("advisor", text, tokens, int((time.time() - start_time) * 1000))
+    for _, _, review_trace in results:
+        for citation in review_trace.get("citations", []):
+            if citation not in trace["citations"]:
+                trace["citations"].append(citation)
+        trace["tool_calls"].extend(review_trace.get("tool_calls", []))
+    trace["platforms"] = {
+        platform: {"duration_ms": review_trace.get("duration_ms"), "tokens_used": review_tokens}
+        for platform, (_, review_tokens, review_trace) in zip(reviews, results)
+    }
+    return text, tokens, trace
+
+
+async def _run(prompt: str, route: str = "advisor") -> tuple[str, int, dict]:
+    """Run one Advisor prompt through MAF, falling back to a direct LLM call on ``route``'s models."""
     start_time = time.time()
 
     # Try MAF agent path
     try:
         tools = get_agent_tools("advisor", include_mcp=False)
-        agent = create_agent("advisor", ADVISOR_PROMPT, tools=tools)
+        agent = create_agent("advisor", ADVISOR_PROMPT, tools=tools, route=route)
         response = await agent.run(prompt)
         text = response.text or ""
         tokens = response.usage_details.total_token_count if response.usage_details else 0
@@ -66,6 +156,7 @@ Create a clear, executive-level communication that:
         prompt=prompt,
         system_prompt=ADVISOR_PROMPT,
         temperature=0.6,
+        route=route,
     )
     duration_ms = int((time.time() - start_time) * 1000)
     trace = build_agent_trace_data("advisor", response.content, response.tokens_used, duration_ms)
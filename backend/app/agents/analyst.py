@@ -7,6 +7,7 @@ optimal posting schedules, and performance comparisons.
 import logging
 import time
 
+from app.agents.context_builder import handoff_context
 from app.agents.prompts import ANALYST_PROMPT
 from app.agents.factory import create_agent, get_agent_tools
 from app.agents.middleware import build_agent_trace_data, make_knowledge_citation
@@ -24,10 +25,11 @@ async def run_analyst(task: str, context: dict) -> tuple[str, int, dict]:
     previous = context.get("previous_results", {})
     data_context = ""
 
-    if "researcher" in previous:
-        data_context += f"\nResearch Data:\n{previous['researcher'][:1000]}"
-    if "memory" in previous:
-        data_context += f"\nHistorical Data:\n{previous['memory'][:1000]}"
+    data_context += handoff_context(
+        "analyst", previous,
+        titles={"researcher": "Research Data", "memory": "Historical Data"},
+        template="\n{title}:\n{text}", separator="",
+    )
 
     platforms = context.get("platforms", ["linkedin", "twitter", "instagram"])
     platforms_str = ", ".join(platforms)
@@ -63,6 +65,7 @@ Provide quantitative analysis, metrics, and data-driven insights."""
         prompt=prompt,
         system_prompt=ANALYST_PROMPT,
         temperature=0.3,
+        route="analyst",
     )
     duration_ms = int((time.time() - start_time) * 1000)
     trace = build_agent_trace_data("analyst", response.content, response.tokens_used, duration_ms)
@@ -0,0 +1,72 @@
+"""Local response assembly for intents that don't need a synthesis pass.
+
+For trend research (researcher, analyst, memory) and content review (memory,
+advisor), the synthesis completion mostly copies the agents' outputs back,
+rich blocks "EXACTLY as-is" included. That costs one more model round trip
+and its full output. ``assemble_response`` stitches the outputs together
+locally instead. Each agent gets a templated ``##`` section, the agent's own
+headings are nested under it, and fenced blocks (charts, callouts, platform
+previews) are kept byte for byte.
+
+It returns None when an agent's output is missing or the agent failed. The
+response then has to reason across whatever is left, so the LLM synthesis
+runs as usual.
+"""
+
+import re
+from typing import Optional
+
+from app.services.document_service import PLATFORM_LABELS
+
+# Intent -> (agent, section heading) in response order; "{platforms}" is filled in
+SECTION_TEMPLATES: dict[str, tuple[tuple[str, str], ...]] = {
+    "trend_research": (
+        ("researcher", "Trending on {platforms}"),
+        ("analyst", "Performance Data"),
+        ("memory", "Brand Fit"),
+    ),
+    "content_review": (
+        ("advisor", "Review"),
+        ("memory", "Brand Guidelines Applied"),
+    ),
+}
+
+_SECTION_LEVEL = 2  # Template headings are "##"; agent headings go below them
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_HEADING = re.compile(r"^(#{1,6})(?=\s)")
+
+
+def assemble_response(intent: str, results: dict[str, str], platforms: list[str]) -> Optional[str]:
+    """The final response built from agent ``results``, or None if synthesis is needed."""
+    template = SECTION_TEMPLATES.get(intent)
+    if template is None:
+        return None
+    labels = ", ".join(PLATFORM_LABELS.get(p, p) for p in platforms) or "Social Media"
+    sections = []
+    for agent, heading in template:
+        text = (results.get(agent) or "").strip()
+        if not text or text.startswith("Error from"):
+            return None
+        sections.append(f"{'#' * _SECTION_LEVEL} {heading.format(platforms=labels)}\n\n{nest_headings(text)}")
+    return "\n\n".join(sections)
+
+
+def nest_headings(text: str, level: int = _SECTION_LEVEL + 1) -> str:
+    """Shift markdown headings outside fenced blocks so the topmost one is at ``level``."""
+    lines = text.split("\n")
+    in_fence = False
+    headings: list[int] = []
+    for index, line in enumerate(lines):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and _HEADING.match(line):
+            headings.append(index)
+    if not headings:
+        return text
+    shift = level - min(len(_HEADING.match(lines[i]).group(1)) for i in headings)
+    if shift <= 0:
+        return text
+    for index in headings:
+        hashes = _HEADING.match(lines[index]).group(1)
+        lines[index] = "#" * min(len(hashes) + shift, 6) + lines[index][len(hashes):]
+    return "\n".join(lines)
@@ -0,0 +1,316 @@
+"""Token-budgeted context for agent handoffs.
+
+Wave 2 agents and the synthesis step receive the outputs of earlier agents.
+Instead of pasting them whole, or chopping them at a character offset,
+``handoff_context`` fits them into per-section token budgets:
+
+1. Sentences and fenced blocks already included by a higher-priority section
+   are dropped (agents often restate the same findings).
+2. Each section gets its budget. Slack left by sections that come in under
+   budget goes to over-budget sections in priority order.
+3. Sections still over their allocation are compressed extractively. The
+   highest-scoring sentences are kept in their original order, and fenced
+   rich blocks (charts, platform previews) are kept whole. Compressed
+   sections end with a note saying so, so nothing is cut silently.
+
+Tokens are counted with ``tiktoken``'s ``o200k_base`` encoding (GPT-4o and
+GPT-5). tiktoken downloads the encoding on first use; the Docker image
+fetches it at build time. If it can't be loaded (an offline host without a
+cached copy), counts fall back to a local approximation, so budgets are
+approximate for the life of that process.
+"""
+
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Budgets for earlier agents' outputs as seen by each consumer:
+# section -> (token budget, priority); lower priority numbers are kept first
+HANDOFF_BUDGETS: dict[str, dict[str, tuple[int, int]]] = {
+    "strategist": {"memory": (400, 0), "researcher": (400, 1)},
+    "analyst": {"researcher": (400, 0), "memory": (300, 1)},
+    "scribe": {"strategist": (1200, 0), "memory": (700, 1), "researcher": (800, 2), "analyst": (700, 3)},
+    "advisor": {"scribe": (2000, 0), "strategist": (400, 1), "memory": (400, 2), "researcher": (300, 3)},
+    "synthesis": {
+        "scribe": (2500, 0),
+        "advisor": (600, 1),
+        "analyst": (900, 2),
+        "strategist": (600, 3),
+        "memory": (300, 4),
+        "researcher": (500, 5),
+    },
+    # Progressive synthesis sections (see orchestrator._SYNTHESIS_SECTIONS). Each carries one or two
+    # agents and rewrites them closely, so they get room for whole outputs, not a share of one prompt
+    "synthesis:overview": {"researcher": (2000, 0), "memory": (1500, 1)},
+    "synthesis:strategy": {"strategist": (4000, 0)},
+    "synthesis:platforms": {"scribe": (16000, 0)},
+    "synthesis:analytics": {"analyst": (4000, 0)},
+    "synthesis:compliance": {"advisor": (4000, 0)},
+}
+_DEFAULT_BUDGET = (300, 9)  # Sections a consumer's table doesn't list
+
+_MIN_DEDUP_WORDS = 6  # Shorter sentences ("Key points:") are too generic to dedupe
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[*_A-Z0-9])")
+_WORDS = re.compile(r"[a-z0-9']+")
+_APPROX_PIECES = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or our that the their this to was "
+    "we were will with you your can should more most into also which".split()
+)
+
+
+# ============ Token counting ============
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding("o200k_base")  # GPT-4o / GPT-5 family
+    except Exception as e:  # Encoding files are fetched on first use
+        logger.warning("tiktoken encoding unavailable, approximating token counts: %s", e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of model tokens in ``text``."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Words split into ~5-character pieces; digits in groups of three; each symbol on its own
+    return sum(1 + (len(piece) - 1) // 5 if piece[0].isalpha() else 1
+               for piece in _APPROX_PIECES.findall(text))
+
+
+# ============ Splitting ============
+
+
+@dataclass
+class _Unit:
+    """A sentence, line, heading or fenced block, with the separator before it."""
+    text: str
+    kind: str  # "sentence", "line", "heading", "block"
+    lead: str
+    paragraph_start: bool = False
+    tokens: int = 0
+
+
+def _split_units(text: str) -> list[_Unit]:
+    units: list[_Unit] = []
+    lines = text.strip().splitlines()
+    lead, index = "", 0
+    while index < len(lines):
+        line = lines[index]
+        stripped = line.strip()
+        if _FENCE.match(line):
+            end = index + 1
+            while end < len(lines) and not _FENCE.match(lines[end]):
+                end += 1
+            units.append(_Unit("\n".join(lines[index:end + 1]), "block", lead, True))
+            lead, index = "\n", end + 1
+            continue
+        if not stripped:
+            lead = "\n\n" if units else ""
+        elif stripped.startswith("#"):
+            units.append(_Unit(line, "heading", lead, True))
+            lead = "\n"
+        elif stripped[0] in "-*+|>" or re.match(r"\d+[.)]\s", stripped):
+            units.append(_Unit(line, "line", lead, True))
+            lead = "\n"
+        else:
+            for position, sentence in enumerate(_SENTENCE_END.split(stripped)):
+                units.append(_Unit(sentence, "sentence", lead if position == 0 else " ", position == 0))
+            lead = "\n"
+        index += 1
+    for unit in units:
+        unit.tokens = count_tokens(unit.text)
+    return units
+
+
+def _join(units: list[_Unit]) -> str:
+    return "".join((unit.lead if position else "") + unit.text for position, unit in enumerate(units))
+
+
+def _fingerprint(unit: _Unit) -> Optional[str]:
+    words = _WORDS.findall(unit.text.lower())
+    if unit.kind == "heading" or (unit.kind != "block" and len(words) < _MIN_DEDUP_WORDS):
+        return None
+    return " ".join(words) if unit.kind != "block" else unit.text.strip()
+
+
+# ============ Compression ============
+
+
+def _scores(units: list[_Unit]) -> list[float]:
+    """Extractive salience: term frequency, leading sentences, figures, and structure."""
+    frequencies = Counter(
+        word for unit in units for word in _WORDS.findall(unit.text.lower()) if word not in _STOPWORDS
+    )
+    top = max(frequencies.values(), default=1)
+    scores = []
+    for position, unit in enumerate(units):
+        words = [w for w in _WORDS.findall(unit.text.lower()) if w not in _STOPWORDS]
+        score = sum(frequencies[w] for w in words) / (top * max(len(words), 1)) if words else 0.0
+        score += 0.5 * (1 - position / max(len(units), 1))
+        if unit.paragraph_start:
+            score += 0.5
+        if any(ch.isdigit() for ch in unit.text):
+            score += 0.3
+        if unit.kind == "block":
+            score += 3.0  # Rich blocks are rendered by the frontend; keep them whole
+        elif unit.kind == "heading":
+            score += 1.5
+        scores.append(score)
+    return scores
+
+
+def _truncate_at_word(text: str, budget: int) -> str:
+    words = text.split()
+    kept: list[str] = []
+    for word in words:
+        if count_tokens(" ".join(kept + [word, "…"])) > budget:
+            break
+        kept.append(word)
+    return " ".join(kept) + " …" if kept else ""
+
+
+def compress(text: str, budget: int) -> str:
+    """Fit ``text`` into ``budget`` tokens by keeping its most salient sentences.
+
+    Kept sentences stay in their original order and whole. Only if not even
+    one fits is the first one cut, at a word boundary and marked with "…".
+    """
+    original = count_tokens(text)
+    if original <= budget:
+        return text
+    note = f"[condensed from ~{original} tokens]"
+    available = budget - count_tokens(note) - 1
+    units = _split_units(text)
+    scores = _scores(units)
+    order = sorted(range(len(units)), key=lambda i: -scores[i])
+    chosen: set[int] = set()
+    used = 0
+    for index in order:
+        cost = units[index].tokens + 1
+        if used + cost <= available:
+            chosen.add(index)
+            used += cost
+    if not any(units[i].kind != "heading" for i in chosen):
+        first = next((u for u in units if u.kind != "block"), None)
+        head = _truncate_at_word(first.text, available) if first else ""
+        return f"{head}\n{note}" if head else note
+    kept = _join([units[i] for i in sorted(chosen)])
+    return f"{kept}\n{note}"
+
+
+# ============ Building ============
+
+
+@dataclass
+class ContextSection:
+    """One earlier agent's output to hand off."""
+    name: str
+    text: str
+    budget: int
+    priority: int = 0
+    title: Optional[str] = None
+
+
+@dataclass
+class BuiltContext:
+    """The assembled context and per-section token accounting."""
+    text: str
+    stats: dict[str, dict]
+
+    @property
+    def tokens_in(self) -> int:
+        return sum(s["tokens_in"] for s in self.stats.values())
+
+    @property
+    def tokens_out(self) -> int:
+        return sum(s["tokens_out"] for s in self.stats.values())
+
+
+def build_context(sections: list[ContextSection], template: str = "{title}\n{text}",
+                  separator: str = "\n\n") -> BuiltContext:
+    """Dedupe, allocate budgets and compress ``sections`` into one context string.
+
+    ``template`` formats each section from its ``title`` (defaulting to the
+    name) and text. Sections are emitted in the order given.
+    """
+    by_priority = sorted(range(len(sections)), key=lambda i: sections[i].priority)
+
+    # 1. Drop what a higher-priority section already said
+    seen: set[str] = set()
+    texts: dict[int, str] = {}
+    for index in by_priority:
+        units = []
+        for unit in _split_units(sections[index].text):
+            fingerprint = _fingerprint(unit)
+            if fingerprint is not None:
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+            units.append(unit)
+        texts[index] = _join(units)
+
+    # 2. Budgets, with slack going to over-budget sections in priority order
+    needs = {index: count_tokens(texts[index]) for index in texts}
+    allocation = {index: min(needs[index], sections[index].budget) for index in texts}
+    slack = sum(section.budget for section in sections) - sum(allocation.values())
+    for index in by_priority:
+        extra = min(needs[index] - allocation[index], slack)
+        if extra > 0:
+            allocation[index] += extra
+            slack -= extra
+
+    # 3. Compress what still doesn't fit
+    parts, stats = [], {}
+    for index, section in enumerate(sections):
+        text = compress(texts[index], allocation[index]) if needs[index] > allocation[index] else texts[index]
+        if not text.strip():
+            continue
+        parts.append(template.format(title=section.title or section.name, text=text))
+        stats[section.name] = {
+            "tokens_in": count_tokens(section.text),
+            "tokens_out": count_tokens(text),
+            "budget": section.budget,
+            "compressed": needs[index] > allocation[index],
+        }
+    return BuiltContext(separator.join(parts), stats)
+
+
+def handoff_context(consumer: str, previous: dict[str, str], titles: Optional[dict[str, str]] = None,
+                    template: str = "{title}\n{text}", separator: str = "\n\n") -> str:
+    """Budget earlier agents' ``previous`` outputs for ``consumer`` using ``HANDOFF_BUDGETS``.
+
+    ``titles`` maps agent names to section titles; when given, only those
+    agents are included, in that order.
+    """
+    budgets = HANDOFF_BUDGETS.get(consumer, {})
+    names = [name for name in titles if name in previous] if titles is not None else list(previous)
+    sections = [
+        ContextSection(
+            name=name,
+            text=previous[name] or "",
+            budget=budgets.get(name, _DEFAULT_BUDGET)[0],
+            priority=budgets.get(name, _DEFAULT_BUDGET)[1],
+            title=(titles or {}).get(name, name),
+        )
+        for name in names
+    ]
+    built = build_context(sections, template=template, separator=separator)
+    telemetry.HANDOFF_TOKENS.inc(built.tokens_in, consumer=consumer, stage="raw")
+    telemetry.HANDOFF_TOKENS.inc(built.tokens_out, consumer=consumer, stage="sent")
+    return built.text
@@ -14,6 +14,8 @@ from agent_framework.azure import AzureOpenAIResponsesClient
 from agent_framework import ai_function as tool, MCPStdioTool
 
 from app.config import settings
+from app.agents.middleware import llm_metrics_middleware, route_metrics_middleware, tool_metrics_middleware
+from app.services.model_router import get_model_router
 
 _credential = DefaultAzureCredential()
 _AZURE_COGSERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
@@ -25,13 +27,20 @@ _DRAFTS_DIR = _DATA_DIR / "drafts"
 _NPX_PATH = shutil.which("npx")
 
 
+def _auth_kwargs() -> dict:
+    """API key when configured, otherwise Entra ID tokens from DefaultAzureCredential."""
+    if settings.azure_openai_api_key:
+        return {"api_key": settings.azure_openai_api_key}
+    return {"ad_token_provider": _token_provider}
+
+
 def get_azure_client() -> AzureOpenAIResponsesClient:
     """Get configured Azure OpenAI client for MAF."""
     return AzureOpenAIResponsesClient(
         endpoint=settings.azure_openai_endpoint,
         deployment_name=settings.azure_openai_deployment_name,
         api_version=settings.azure_openai_api_version,
-        ad_token_provider=_token_provider,
+        **_auth_kwargs(),
     )
 
 
@@ -45,7 +54,7 @@ def create_filesystem_mcp() -> MCPStdioTool | None:
     Uses @modelcontextprotocol/server-filesystem to provide
     file read/write capabilities scoped to the drafts directory.
     """
-    if not _NPX_PATH:
+    if not _NPX_PATH or not settings.agent_mcp_enabled:
         return None
     _DRAFTS_DIR.mkdir(parents=True, exist_ok=True)
     return MCPStdioTool(
@@ -71,6 +80,7 @@ def create_agent(
     instructions: str,
     tools: list | None = None,
     deployment: str = None,
+    route: str = None,
 ):
     """Create an agent using MAF pattern with optional MCP tools.
 
@@ -79,21 +89,24 @@ def create_agent(
         instructions: System prompt for the agent
         tools: Optional list of tool functions (@tool) and/or MCPStdioTool instances
         deployment: Optional specific deployment to use
+        route: Model route (see model_router); defaults to the agent name
 
     Returns:
         MAF ChatAgent instance with MCP servers auto-connected at runtime
     """
+    route = route or name
     client = AzureOpenAIResponsesClient(
         endpoint=settings.azure_openai_endpoint,
-        deployment_name=deployment or settings.azure_openai_deployment_name,
+        deployment_name=deployment or get_model_router().deployments(route)[0],
         api_version=settings.azure_openai_api_version,
-        ad_token_provider=_token_provider,
+        **_auth_kwargs(),
     )
 
     return client.create_agent(
         name=name,
         instructions=instructions,
         tools=tools or [],
+        middleware=[tool_metrics_middleware, llm_metrics_middleware, route_metrics_middleware(route)],
     )
 
 
@@ -95,6 +95,7 @@ Analyze the retrieved information and provide:
         prompt=prompt,
         system_prompt=MEMORY_PROMPT,
         temperature=0.4,
+        route="memory",
     )
     duration_ms = int((time.time() - start_time) * 1000)
     trace = build_agent_trace_data("memory", response.content, response.tokens_used, duration_ms)
@@ -4,11 +4,21 @@ Provides utilities that capture:
 - URLs embedded in agent / tool output text
 - Knowledge-source references from internal tools (brand guidelines, past posts, etc.)
 - Tool call metadata from MAF response objects
+- Prometheus metrics for agent LLM calls and tool invocations
 """
 
 import re
+import time
 import logging
 from dataclasses import dataclass, field
+from typing import AsyncIterable, Callable, Optional
+
+from agent_framework import chat_middleware, function_middleware
+
+from app.services import telemetry
+from app.services.model_router import get_model_router, is_fallback_error
+from app.services.token_usage import TokenUsage, record_usage
+from app.services.waterfall import add_span, record_span
 
 logger = logging.getLogger(__name__)
 
@@ -197,3 +207,118 @@ def build_agent_trace_data(
         "tokens_used": tokens_used,
         "agent_name": agent_name,
     }
+
+
+@function_middleware
+async def tool_metrics_middleware(context, next) -> None:
+    """Time each tool invocation made by a MAF agent."""
+    started = time.perf_counter()
+    status = "error"
+    name = getattr(context.function, "name", "unknown")
+    try:
+        with record_span(name, "tool"):
+            await next(context)
+        status = "ok"
+    finally:
+        telemetry.TOOL_CALL_DURATION.observe(
+            time.perf_counter() - started,
+            tool=name,
+            status=status,
+        )
+
+
+def _response_usage(result) -> Optional[TokenUsage]:
+    usage = getattr(result, "usage_details", None)
+    if usage is None:
+        return None
+    return TokenUsage(usage.input_token_count or 0, usage.output_token_count or 0)
+
+
+async def _metered_stream(
+    updates: AsyncIterable,
+    on_end: Callable[[Optional[TokenUsage], Optional[Exception]], None],
+):
+    """Pass a streamed chat result through, then report its usage (or error) once it ends.
+
+    For a streaming run, ``next(context)`` returns as soon as the stream is
+    set up, before any token is generated, so calls are measured here.
+    """
+    usage: Optional[TokenUsage] = None
+    error: Optional[Exception] = None
+    try:
+        async for update in updates:
+            for content in getattr(update, "contents", None) or ():
+                details = getattr(content, "details", None)
+                if getattr(content, "type", None) == "usage" and details is not None:
+                    usage = (usage or TokenUsage()) + TokenUsage(
+                        details.input_token_count or 0, details.output_token_count or 0
+                    )
+            yield update
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        on_end(usage, error)
+
+
+@chat_middleware
+async def llm_metrics_middleware(context, next) -> None:
+    """Count and time the model calls a MAF agent makes, with token usage."""
+    deployment = getattr(context.chat_client, "model_id", None) or "unknown"
+    if context.is_streaming:
+        started = time.perf_counter()
+
+        def _on_end(usage: Optional[TokenUsage], error: Optional[Exception]) -> None:
+            ended = time.perf_counter()
+            status = "error" if error is not None else "ok"
+            telemetry.LLM_CALL_DURATION.observe(ended - started, deployment=deployment, method="agent_stream")
+            telemetry.LLM_CALLS.inc(deployment=deployment, method="agent_stream", status=status)
+            add_span(deployment, "llm", started, ended)
+            if usage is not None:
+                record_usage(deployment, usage.prompt_tokens, usage.completion_tokens)
+
+        try:
+            await next(context)
+        except Exception as e:
+            _on_end(None, e)
+            raise
+        context.result = _metered_stream(context.result, _on_end)
+        return
+
+    with telemetry.llm_call(deployment, "agent"), record_span(deployment, "llm"):
+        await next(context)
+    usage = _response_usage(context.result)
+    if usage is not None:
+        record_usage(deployment, usage.prompt_tokens, usage.completion_tokens)
+
+
+def route_metrics_middleware(route: str):
+    """Per-route latency and cost for a MAF agent's model calls.
+
+    A fallback error (429, 5xx, connection error, timeout) puts the
+    deployment in cooldown, so the agent's direct LLM fallback starts on the
+    route's next deployment.
+    """
+    @chat_middleware
+    async def _route_metrics(context, next) -> None:
+        router = get_model_router()
+        deployment = getattr(context.chat_client, "model_id", None) or "unknown"
+        started = time.perf_counter()
+
+        def _on_end(usage: Optional[TokenUsage], error: Optional[Exception]) -> None:
+            if error is not None and is_fallback_error(error):
+                router.failed(route, deployment, error)
+            router.observe(route, deployment, time.perf_counter() - started, usage,
+                           "error" if error is not None else "ok")
+
+        try:
+            await next(context)
+        except Exception as e:
+            _on_end(None, e)
+            raise
+        if context.is_streaming:
+            context.result = _metered_stream(context.result, _on_end)
+        else:
+            _on_end(_response_usage(context.result), None)
+
+    return _route_metrics
@@ -11,8 +11,11 @@ import time
 from datetime import datetime
 from typing import Optional, Any
 
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.agents.assembler import assemble_response
+from app.agents.context_builder import handoff_context
 from app.agents.prompts import AGENT_PROMPTS
 from app.agents.strategist import run_strategist
 from app.agents.researcher import run_researcher
@@ -20,11 +23,22 @@ from app.agents.analyst import run_analyst
 from app.agents.scribe import run_scribe
 from app.agents.advisor import run_advisor
 from app.agents.memory import run_memory
+from app.config import settings
+from app.services import telemetry
+from app.services.brand_data import brand_data_version
+from app.services.context_cache import conversation_topic, get_context_cache
 from app.services.llm_service import get_llm_service
 from app.services.trace_service import get_trace_service
-from app.services.document_service import get_document_service
+from app.services.rollup_service import get_rollup_service
+from app.services.document_service import (
+    PLATFORM_LABELS, find_platform_section, get_document_service, patch_platform_section,
+)
+from app.services.intent_classifier import detect_platforms, extract_entities, get_intent_classifier
+from app.services.response_cache import CacheMatch, get_response_cache
+from app.services.token_usage import TokenUsage, UsageLedger, usage_ledger
+from app.services.waterfall import Waterfall, add_span, record_span, start_waterfall
 from app.api.websocket import ConnectionManager
-from app.models.database import Document
+from app.models.database import AgentTrace, Document
 
 
 # Intent classification schema for structured output
@@ -97,6 +111,61 @@ _WAVE_CONFIG = {
 }
 
 
+# Formatting rules for every synthesis prompt: the frontend renders these fenced blocks as components
+_RICH_OUTPUT_RULES = """## CRITICAL: Rich Output Formatting Rules
+
+The frontend renders special fenced code blocks as interactive visual components. You MUST preserve and include these rich blocks from agent outputs.
+
+### Rules:
+1. **PRESERVE all rich code blocks** from agent outputs -- copy them EXACTLY as-is into your response. These include:
+   - `chart-bar`, `chart-line`, `chart-pie`, `chart-area`, `chart-radar` -- rendered as interactive charts
+   - `platform-linkedin`, `platform-twitter`, `platform-x`, `platform-instagram` -- rendered as platform post mockups
+   - `metrics`, `metric-cards`, `kpi` -- rendered as KPI dashboard cards
+   - `callout`, `insight`, `tip`, `warning` -- rendered as styled callout boxes
+   - `comparison`, `comparison-table` -- rendered as styled comparison tables
+
+2. **ADD your own rich blocks** where it helps the user. For example:
+   - Add a `callout` block for key recommendations or warnings
+   - Add a `metrics` block summarizing key projected numbers
+   - Add a `comparison` block when comparing platform strategies
+
+3. **Structure your response clearly** with markdown headings (##, ###) to organize sections
+
+4. **Include platform preview cards** for every platform where content was generated (from Scribe output)
+
+5. **Include chart visualizations** for analytics data (from Analyst output)
+
+### Callout block format:
+```callout
+{"type":"insight","title":"Title Here","content":"Your insight text here"}
+```
+Types: "info", "warning", "success", "tip", "insight", "action"
+
+### Comparison table format:
+```comparison
+{"title":"Platform Strategy Comparison","headers":["LinkedIn","Twitter","Instagram"],"rows":[{"label":"Tone","values":["Professional","Conversational","Authentic"]},{"label":"Format","values":["Article","Thread","Carousel"]}]}
+```"""
+
+# Progressive synthesis: (section, agents it draws on, what to write), streamed in this order.
+# Each section is written as soon as its agents finish; see _ProgressiveSynthesis.
+_SYNTHESIS_SECTIONS = (
+    ("overview", ("researcher", "memory"),
+     "A brief strategic overview: the angle, the audience, and the trends and brand points to build on. "
+     "At most two short paragraphs, no heading."),
+    ("strategy", ("strategist",),
+     "A `## Strategy` section: key messages, platform approach and the recommended posting schedule. "
+     "Add a `comparison` block when comparing platform strategies."),
+    ("platforms", ("scribe",),
+     "A `## Content` section with the content for each requested platform, each WITH its platform "
+     "preview card."),
+    ("analytics", ("analyst",),
+     "A `## Performance` section with the Analyst's engagement charts and a `metrics` block of the key "
+     "projected numbers."),
+    ("compliance", ("advisor",),
+     "A `## Compliance` section with the Advisor's feedback, including a `callout` block."),
+)
+
+
 async def process_message(
     conversation_id: str,
     message_content: str,
@@ -110,9 +179,29 @@ async def process_message(
     Two-wave parallel dispatch:
       Wave 1: Context gathering (researcher, strategist, memory, analyst)
       Wave 2: Content creation + review (scribe, advisor) using Wave 1 outputs
+
+    The run's latency waterfall and token usage are stored on the
+    orchestrator trace.
     """
+    with start_waterfall() as waterfall, usage_ledger("orchestrator") as usage:
+        return await _process_message(
+            conversation_id, message_content, message_metadata, ws_manager, db, message_id, waterfall, usage
+        )
+
+
+async def _process_message(
+    conversation_id: str,
+    message_content: str,
+    message_metadata: dict,
+    ws_manager: ConnectionManager,
+    db: AsyncSession,
+    message_id: Optional[str],
+    waterfall: Waterfall,
+    usage: UsageLedger,
+) -> str:
     llm = get_llm_service()
     trace_service = get_trace_service()
+    rollup_service = get_rollup_service()
 
     start_time = time.time()
 
@@ -128,32 +217,33 @@ async def process_message(
     # Notify WebSocket clients
     await ws_manager.send_agent_started(conversation_id, "orchestrator", "Analyzing request")
 
+    speculation: Optional[_Speculation] = None
+    embedding_task: Optional[asyncio.Task] = None
+    synthesis: Optional[_ProgressiveSynthesis] = None
     try:
         # -- Step 1: Classify intent
         await ws_manager.send_agent_thinking(
             conversation_id, "orchestrator", "Understanding your request...", 0.1
         )
 
-        intent = await llm.structured_output(
-            prompt=f"""Analyze this user request and determine how to handle it:
-
-User Request: {message_content}
-
-Determine:
-1. The primary intent:
-   - content_creation: User wants to create social media posts for one or more platforms
-   - content_strategy: User wants a content plan, calendar, or strategy
-   - content_review: User wants existing content reviewed for brand alignment
-   - trend_research: User wants to understand current trends, topics, or competitor activity
-   - question: A general question about social media or the platform
-   - other: Anything else
-2. Target platforms mentioned or implied (linkedin, twitter, instagram). If none specified, include all three.
-3. Which specialist agents should be involved
-4. Key entities mentioned (brands, topics, platforms, campaigns)
-5. A clear task description""",
-            output_schema=INTENT_SCHEMA,
-            system_prompt=AGENT_PROMPTS["orchestrator"],
-        )
+        response_cache = get_response_cache()
+        if response_cache.enabled_for(message_metadata):
+            # Embedded during intent classification; looked up once intent and platforms are known
+            embedding_task = asyncio.create_task(response_cache.embed(message_content))
+
+        classifier = get_intent_classifier()
+        prediction = classifier.classify(message_content)
+        if (prediction is None or not prediction.confident) and settings.speculative_agents:
+            # The LLM round trip is coming; start the agents most intents need meanwhile
+            speculation = _Speculation(settings.speculative_agents, message_content, conversation_id, ws_manager, db)
+
+        with record_span("intent", "intent"):
+            if prediction is not None and prediction.confident:
+                intent, intent_source = prediction.intent, "local"
+                classifier.record(prediction)
+            else:
+                intent, intent_source = await _classify_with_llm(llm, message_content), "llm"
+                classifier.record(prediction, intent)
 
         # Default to all platforms when none detected
         if not intent["target_platforms"]:
@@ -185,53 +275,213 @@ Determine:
         all_tokens: dict[str, int] = {}
         all_traces: dict[str, dict] = {}
 
+        # -- Semantic response cache: replay a similar run, or reuse its Wave 1 context
+        embedding = await embedding_task if embedding_task else None
+        brand_version: Optional[str] = None
+        cache_match: Optional[CacheMatch] = None
+        if embedding is not None:
+            with record_span("response_cache", "cache"):
+                brand_version = await brand_data_version(db)
+                cache_match = await response_cache.lookup(
+                    db, embedding, intent["primary_intent"], intent["target_platforms"], brand_version
+                )
+
+        if cache_match is not None and cache_match.kind == "hit":
+            if speculation:
+                await speculation.resolve([])
+            entry = cache_match.entry
+            await ws_manager.send_agent_thinking(
+                conversation_id,
+                "orchestrator",
+                f"Reusing the response to a similar request ({cache_match.similarity:.0%} match)",
+                0.9,
+            )
+            await ws_manager.send_stream_token(conversation_id, "orchestrator", entry.response)
+            ws_manager.flush_tokens(conversation_id, "orchestrator")
+            if entry.document_id:
+                await ws_manager.send_document_generated(
+                    conversation_id, entry.document_id, "social_post", entry.document_title
+                )
+
+            duration_ms = int((time.time() - start_time) * 1000)
+            await trace_service.complete_trace(
+                db=db,
+                trace=trace,
+                output_data={
+                    "response": entry.response[:500],
+                    "agents_used": [],
+                    "intent": intent,
+                    "intent_source": intent_source,
+                    "intent_confidence": prediction.confidence if prediction else None,
+                    "cache": cache_match.summary(),
+                    "speculation": speculation.summary() if speculation else None,
+                    "usage": usage.summary(),
+                },
+                tokens_used=usage.own_usage.total_tokens,
+                citations=entry.citations or [],
+                duration_ms=duration_ms,
+                waterfall=waterfall.to_compact(),
+            )
+            if entry.citations:
+                await ws_manager.send_response_citations(conversation_id, entry.citations)
+            await ws_manager.send_agent_completed(
+                conversation_id, "orchestrator", "Served from the response cache", duration_ms
+            )
+            return entry.response
+
+        if cache_match is not None:  # Warm start: rerun only what the stored context doesn't cover
+            for name, result in (cache_match.entry.context or {}).items():
+                if name in waves["wave1"]:
+                    all_results[name] = result
+                    all_tokens[name] = 0
+                    all_traces[name] = {
+                        "citations": [
+                            dict(c) for c in cache_match.entry.citations or []
+                            if c.get("contributing_agent") == name
+                        ],
+                    }
+
+        # Reuse Wave 1 outputs memoized for this topic; follow-ups inherit the conversation's topic
+        context_cache = get_context_cache()
+        topic: list[str] = []
+        context_reused: dict[str, dict] = {}
+        if context_cache.enabled_for(message_metadata) and waves["wave1"]:
+            topic = intent["key_entities"] or await conversation_topic(db, conversation_id, message_id)
+        if topic:
+            with record_span("context_cache", "cache"):
+                brand_version = brand_version or await brand_data_version(db)
+                cached = await context_cache.lookup(
+                    db,
+                    [name for name in waves["wave1"] if name not in all_results],
+                    topic,
+                    intent["target_platforms"],
+                    brand_version,
+                )
+            for name, entry in cached.items():
+                all_results[name] = entry.result
+                all_tokens[name] = 0
+                all_traces[name] = {"citations": [dict(c) for c in entry.citations or []]}
+                context_reused[name] = {
+                    "age_s": int((datetime.utcnow() - entry.created_at).total_seconds()),
+                    "tokens_saved": entry.tokens_used,
+                }
+
+        wave1 = [name for name in waves["wave1"] if name not in all_results]
+
+        first_token_at: list[float] = []
+
+        async def _on_token(token: str):
+            if not first_token_at:
+                first_token_at.append(time.perf_counter())
+            await ws_manager.send_stream_token(conversation_id, "orchestrator", token)
+
+        # Start writing the response from the first results while slower agents finish,
+        # unless this intent's response can be assembled from the agents' outputs alone
+        local_assembly = intent["primary_intent"] in settings.local_assembly_intents
+        if settings.progressive_synthesis and not local_assembly and (waves["wave1"] or waves["wave2"]):
+            synthesis = _ProgressiveSynthesis(
+                llm, message_content, intent, [*waves["wave1"], *waves["wave2"]], _on_token
+            )
+            for name, result in all_results.items():
+                synthesis.deliver(name, result)
+
+        async def _delivered(name: str, run) -> tuple[str, int, dict]:
+            result = await run
+            if synthesis is not None:
+                synthesis.deliver(name, result[0])
+            return result
+
+        # Keep the speculative agents this intent needs, cancel the rest
+        adopted = await speculation.resolve(wave1) if speculation else []
+
         # -- Wave 1: Context gathering (parallel)
-        if waves["wave1"]:
-            for agent_name in waves["wave1"]:
+        if wave1:
+            for agent_name in wave1:
                 await ws_manager.send_agent_handoff(
                     conversation_id, "orchestrator", agent_name, intent["task_description"]
                 )
 
-            w1_results = await asyncio.gather(
-                *[
-                    _execute_agent(
-                        agent_name=name,
-                        task=intent["task_description"],
-                        context=base_context,
-                        conversation_id=conversation_id,
-                        ws_manager=ws_manager,
-                        db=db,
-                    )
-                    for name in waves["wave1"]
-                ]
+            wave_start = time.time()
+            with record_span("wave1", "wave"):
+                queued_at = time.perf_counter()
+                w1_results = await asyncio.gather(
+                    *[
+                        _delivered(name, speculation.tasks[name] if name in adopted else _execute_agent(
+                            agent_name=name,
+                            task=intent["task_description"],
+                            context=base_context,
+                            conversation_id=conversation_id,
+                            ws_manager=ws_manager,
+                            db=db,
+                            queued_at=queued_at,
+                        ))
+                        for name in wave1
+                    ]
+                )
+
+            await rollup_service.record_latency(
+                db, "wave:wave1", (time.time() - wave_start) * 1000, trace.started_at
             )
 
-            for name, (result, tokens, trace_data) in zip(waves["wave1"], w1_results):
+            for name, (result, tokens, trace_data) in zip(wave1, w1_results):
                 all_results[name] = result
                 all_tokens[name] = tokens
                 all_traces[name] = trace_data
 
+            if topic:
+                await context_cache.store(
+                    db, dict(zip(wave1, w1_results)), topic, intent["target_platforms"], brand_version
+                )
+
         # -- Wave 2: Creation + review (parallel, with Wave 1 context)
         if waves["wave2"]:
-            wave2_context = {**base_context, "previous_results": all_results}
+            # Scribe drafts each platform concurrently and streams each draft as it finishes.
+            # When both run, the advisor reviews each draft as it lands instead of Wave 1 context.
+            drafts: asyncio.Queue = asyncio.Queue()
+            pipelined = "scribe" in waves["wave2"] and "advisor" in waves["wave2"]
+
+            async def _on_draft(platform: str, draft: str):
+                await ws_manager.send_agent_draft(conversation_id, "scribe", platform, draft)
+                if pipelined:
+                    drafts.put_nowait((platform, draft))
+
+            async def _on_review(platform: str, review: str):
+                await ws_manager.send_agent_review(conversation_id, "advisor", platform, review)
+
+            wave2_context = {**base_context, "previous_results": all_results, "on_draft": _on_draft}
+            agent_contexts = {name: wave2_context for name in waves["wave2"]}
+            if pipelined:
+                agent_contexts["advisor"] = {**wave2_context, "drafts": drafts, "on_review": _on_review}
 
             for agent_name in waves["wave2"]:
                 await ws_manager.send_agent_handoff(
                     conversation_id, "orchestrator", agent_name, intent["task_description"]
                 )
 
-            w2_results = await asyncio.gather(
-                *[
-                    _execute_agent(
+            async def _run_wave2_agent(name: str, queued_at: float):
+                try:
+                    return await _delivered(name, _execute_agent(
                         agent_name=name,
                         task=intent["task_description"],
-                        context=wave2_context,
+                        context=agent_contexts[name],
                         conversation_id=conversation_id,
                         ws_manager=ws_manager,
                         db=db,
-                    )
-                    for name in waves["wave2"]
-                ]
+                        queued_at=queued_at,
+                    ))
+                finally:
+                    if name == "scribe":
+                        drafts.put_nowait(None)  # No more drafts: the advisor can finish
+
+            wave_start = time.time()
+            with record_span("wave2", "wave"):
+                queued_at = time.perf_counter()
+                w2_results = await asyncio.gather(
+                    *[_run_wave2_agent(name, queued_at) for name in waves["wave2"]]
+                )
+
+            await rollup_service.record_latency(
+                db, "wave:wave2", (time.time() - wave_start) * 1000, trace.started_at
             )
 
             for name, (result, tokens, trace_data) in zip(waves["wave2"], w2_results):
@@ -240,41 +490,33 @@ Determine:
                 all_traces[name] = trace_data
 
         # -- Record agent traces with citation data
-        for agent_name in all_results:
-            agent_trace_data = all_traces.get(agent_name, {})
-            agent_trace = await trace_service.start_trace(
-                db=db,
-                agent_name=agent_name,
-                task_type=intent["task_description"][:50],
-                input_data={"task": intent["task_description"]},
-                message_id=message_id,
-            )
-            await trace_service.complete_trace(
-                db=db,
-                trace=agent_trace,
-                output_data={
-                    "result_preview": all_results[agent_name][:500],
-                },
-                tokens_used=all_tokens.get(agent_name, 0),
-                citations=agent_trace_data.get("citations", []),
-                tool_calls=agent_trace_data.get("tool_calls", []),
-                duration_ms=agent_trace_data.get("duration_ms"),
-                parent_trace_id=trace.id,
+        with record_span("record_traces", "persist"):
+            await _record_agent_traces(
+                db, trace, intent["task_description"], all_results, all_tokens, all_traces,
+                conversation_id, ws_manager, message_id,
             )
 
-            # Send citation data via WebSocket
-            citations = agent_trace_data.get("citations", [])
-            if citations:
-                await ws_manager.send_agent_citations(
-                    conversation_id, agent_name, citations
-                )
-
         # -- Step 3: Synthesize final response (streamed)
+        assembled = (
+            assemble_response(intent["primary_intent"], all_results, intent["target_platforms"])
+            if local_assembly else None
+        )
         await ws_manager.send_agent_thinking(
-            conversation_id, "orchestrator", "Synthesizing response...", 0.9
+            conversation_id,
+            "orchestrator",
+            "Assembling response..." if assembled is not None else "Synthesizing response...",
+            0.9,
         )
 
-        if all_results:
+        synthesis_start = time.perf_counter()
+        if assembled is not None:
+            # Agent outputs stitched under templated headings; no synthesis round trip
+            response = assembled
+            await _on_token(response)
+        elif synthesis is not None:
+            response = await synthesis.finish()
+            synthesis_start = synthesis.started_at or synthesis_start
+        elif all_results:
             synthesis_prompt = f"""Based on the following agent outputs, synthesize a comprehensive response to the user's request.
 
 User Request: {message_content}
@@ -284,39 +526,7 @@ Intent: {intent['primary_intent']}
 Agent Outputs:
 {_format_agent_results(all_results)}
 
-## CRITICAL: Rich Output Formatting Rules
-
-The frontend renders special fenced code blocks as interactive visual components. You MUST preserve and include these rich blocks from agent outputs.
-
-### Rules:
-1. **PRESERVE all rich code blocks** from agent outputs -- copy them EXACTLY as-is into your response. These include:
-   - `chart-bar`, `chart-line`, `chart-pie`, `chart-area`, `chart-radar` -- rendered as interactive charts
-   - `platform-linkedin`, `platform-twitter`, `platform-x`, `platform-instagram` -- rendered as platform post mockups
-   - `metrics`, `metric-cards`, `kpi` -- rendered as KPI dashboard cards
-   - `callout`, `insight`, `tip`, `warning` -- rendered as styled callout boxes
-   - `comparison`, `comparison-table` -- rendered as styled comparison tables
-
-2. **ADD your own rich blocks** where it helps the user. For example:
-   - Add a `callout` block for key recommendations or warnings
-   - Add a `metrics` block summarizing key projected numbers
-   - Add a `comparison` block when comparing platform strategies
-
-3. **Structure your response clearly** with markdown headings (##, ###) to organize sections
-
-4. **Include platform preview cards** for every platform where content was generated (from Scribe output)
-
-5. **Include chart visualizations** for analytics data (from Analyst output)
-
-### Callout block format:
-```callout
-{{"type":"insight","title":"Title Here","content":"Your insight text here"}}
-```
-Types: "info", "warning", "success", "tip", "insight", "action"
-
-### Comparison table format:
-```comparison
-{{"title":"Platform Strategy Comparison","headers":["LinkedIn","Twitter","Instagram"],"rows":[{{"label":"Tone","values":["Professional","Conversational","Authentic"]}},{{"label":"Format","values":["Article","Thread","Carousel"]}}]}}
-```
+{_RICH_OUTPUT_RULES}
 
 Provide a well-structured response that:
 - Opens with a brief strategic overview
@@ -326,24 +536,26 @@ Provide a well-structured response that:
 - Notes any compliance feedback from the Advisor with a callout block
 - Includes recommended posting schedule if applicable"""
 
-            async def _on_token(token: str):
-                await ws_manager.send_stream_token(conversation_id, "orchestrator", token)
-
             response = await llm.stream_with_callback(
                 prompt=synthesis_prompt,
                 system_prompt=AGENT_PROMPTS["orchestrator"],
                 on_token=_on_token,
+                route="orchestrator:synthesis",
             )
         else:
-            async def _on_token_simple(token: str):
-                await ws_manager.send_stream_token(conversation_id, "orchestrator", token)
-
             response = await llm.stream_with_callback(
                 prompt=message_content,
                 system_prompt=AGENT_PROMPTS["orchestrator"],
-                on_token=_on_token_simple,
+                on_token=_on_token,
+                route="orchestrator:synthesis",
             )
 
+        ws_manager.flush_tokens(conversation_id, "orchestrator")
+        synthesis_end = time.perf_counter()
+        first_token = first_token_at[0] if first_token_at else synthesis_end
+        add_span("synthesis.ttft", "synthesis_ttft", synthesis_start, first_token)
+        add_span("synthesis.stream", "synthesis_stream", first_token, synthesis_end)
+
         # -- Aggregate all citations for the response metadata
         all_citations = []
         for agent_name, trace_data in all_traces.items():
@@ -352,29 +564,51 @@ Provide a well-structured response that:
                 all_citations.append(c)
 
         # -- Save document for content intents
+        doc: Optional[Document] = None
         if intent["primary_intent"] in ("content_creation", "content_strategy") and all_results:
             doc_service = get_document_service()
             topic = intent["key_entities"][0] if intent["key_entities"] else "Social Media Content"
 
-            doc = await doc_service.create_document(
-                db=db,
-                title=f"Social Post: {intent['task_description'][:60]}",
-                doc_type="social_post",
-                content=response,
-                metadata={
-                    "topic": topic,
-                    "platforms": intent["target_platforms"],
-                    "intent": intent["primary_intent"],
-                    "conversation_id": conversation_id,
-                    "generated_via": "chat",
-                    "citations": all_citations,
-                },
-            )
+            with record_span("save_document", "persist"):
+                doc = await doc_service.create_document(
+                    db=db,
+                    title=f"Social Post: {intent['task_description'][:60]}",
+                    doc_type="social_post",
+                    content=response,
+                    metadata={
+                        "topic": topic,
+                        "platforms": intent["target_platforms"],
+                        "intent": intent["primary_intent"],
+                        "conversation_id": conversation_id,
+                        "generated_via": "chat",
+                        "citations": all_citations,
+                        "trace_id": trace.id,
+                        # Wave 1 outputs, so one platform can be regenerated later without rerunning them
+                        "context": {name: all_results[name] for name in waves["wave1"] if name in all_results},
+                    },
+                )
 
             await ws_manager.send_document_generated(
                 conversation_id, doc.id, "social_post", doc.title
             )
 
+        if embedding is not None and brand_version is not None:
+            with record_span("response_cache.store", "persist"):
+                await response_cache.store(
+                    db,
+                    embedding=embedding,
+                    message=message_content,
+                    intent=intent["primary_intent"],
+                    platforms=intent["target_platforms"],
+                    brand_version=brand_version,
+                    response=response,
+                    context={name: all_results[name] for name in waves["wave1"] if name in all_results},
+                    citations=all_citations,
+                    document_id=doc.id if doc else None,
+                    document_title=doc.title if doc else None,
+                    trace_id=trace.id,
+                )
+
         # -- Complete orchestrator trace
         duration_ms = int((time.time() - start_time) * 1000)
         await trace_service.complete_trace(
@@ -383,10 +617,19 @@ Provide a well-structured response that:
             output_data={
                 "response": response[:500],
                 "agents_used": list(all_results.keys()),
+                "intent": intent,
+                "intent_source": intent_source,  # Only "llm" intents train the local classifier
+                "intent_confidence": prediction.confidence if prediction else None,
+                "cache": cache_match.summary() if cache_match else {"status": "miss" if embedding else "off"},
+                "context_cache": context_reused or None,
+                "synthesis": "local" if assembled is not None else "progressive" if synthesis else "single",
+                "speculation": speculation.summary() if speculation else None,
+                "usage": usage.summary(),
             },
-            tokens_used=llm.last_tokens_used,
+            tokens_used=usage.own_usage.total_tokens,  # Agents' tokens are on their own traces
             citations=all_citations,
             duration_ms=duration_ms,
+            waterfall=waterfall.to_compact(),
         )
 
         # Send aggregated citations via WebSocket
@@ -405,10 +648,262 @@ Provide a well-structured response that:
         return response
 
     except Exception as e:
+        if speculation:
+            await speculation.cancel()
+        if embedding_task and not embedding_task.done():
+            embedding_task.cancel()
+        if synthesis:
+            await synthesis.cancel()
         await trace_service.fail_trace(db=db, trace=trace, error=str(e))
         raise
 
 
+async def _record_agent_traces(
+    db: AsyncSession,
+    parent: Any,
+    task: str,
+    results: dict[str, str],
+    tokens: dict[str, int],
+    traces: dict[str, dict],
+    conversation_id: str,
+    ws_manager: ConnectionManager,
+    message_id: Optional[str] = None,
+) -> None:
+    """Record a child trace under ``parent`` for each agent and stream its citations."""
+    trace_service = get_trace_service()
+    for agent_name in results:
+        agent_trace_data = traces.get(agent_name, {})
+        agent_trace = await trace_service.start_trace(
+            db=db,
+            agent_name=agent_name,
+            task_type=task[:50],
+            input_data={"task": task},
+            message_id=message_id,
+        )
+        await trace_service.complete_trace(
+            db=db,
+            trace=agent_trace,
+            output_data={
+                "result_preview": results[agent_name][:500],
+                "usage": agent_trace_data.get("usage"),
+            },
+            tokens_used=tokens.get(agent_name, 0),
+            citations=agent_trace_data.get("citations", []),
+            tool_calls=agent_trace_data.get("tool_calls", []),
+            duration_ms=agent_trace_data.get("duration_ms"),
+            parent_trace_id=parent.id,
+        )
+
+        # Send citation data via WebSocket
+        citations = agent_trace_data.get("citations", [])
+        if citations:
+            await ws_manager.send_agent_citations(
+                conversation_id, agent_name, citations
+            )
+
+
+async def _classify_with_llm(llm, message_content: str) -> dict:
+    """Classify a message with an ``INTENT_SCHEMA`` structured-output call."""
+    return await llm.structured_output(
+        prompt=f"""Analyze this user request and determine how to handle it:
+
+User Request: {message_content}
+
+Determine:
+1. The primary intent:
+   - content_creation: User wants to create social media posts for one or more platforms
+   - content_strategy: User wants a content plan, calendar, or strategy
+   - content_review: User wants existing content reviewed for brand alignment
+   - trend_research: User wants to understand current trends, topics, or competitor activity
+   - question: A general question about social media or the platform
+   - other: Anything else
+2. Target platforms mentioned or implied (linkedin, twitter, instagram). If none specified, include all three.
+3. Which specialist agents should be involved
+4. Key entities mentioned (brands, topics, platforms, campaigns)
+5. A clear task description""",
+        output_schema=INTENT_SCHEMA,
+        system_prompt=AGENT_PROMPTS["orchestrator"],
+        route="orchestrator:intent",
+    )
+
+
+class _Speculation:
+    """Wave 1 agents started while the LLM is still classifying intent.
+
+    Researcher and memory run in Wave 1 for nearly every intent, so they can
+    start at the same moment as the classification call. They work from the
+    raw message, with platforms and entities read from its text. Once the
+    intent is known, ``resolve`` keeps the runs that intent's Wave 1 needs
+    and cancels the rest. Tokens already spent on cancelled or unused runs
+    are reported as waste.
+    """
+
+    def __init__(self, agents: list[str], message: str, conversation_id: str,
+                 ws_manager: ConnectionManager, db: AsyncSession):
+        self.started_at = time.perf_counter()
+        self.conversation_id = conversation_id
+        self.ws_manager = ws_manager
+        self.ledgers: dict[str, UsageLedger] = {}
+        self.outcomes: dict[str, str] = {}
+        self.head_start_ms: Optional[float] = None
+        context = {
+            "message": message,
+            "entities": extract_entities(message),
+            "intent": None,
+            "platforms": detect_platforms(message),
+            "previous_results": {},
+        }
+        self.tasks = {
+            name: asyncio.create_task(self._run(name, message, context, db))
+            for name in dict.fromkeys(agents)
+        }
+
+    async def _run(self, name: str, message: str, context: dict, db: AsyncSession) -> tuple[str, int, dict]:
+        with usage_ledger(f"speculative:{name}") as ledger:
+            self.ledgers[name] = ledger
+            return await _execute_agent(
+                name, message, context, self.conversation_id, self.ws_manager, db, queued_at=self.started_at
+            )
+
+    async def resolve(self, needed: list[str]) -> list[str]:
+        """Adopt the speculative agents in ``needed``, cancel the others; return the adopted names."""
+        if self.head_start_ms is None:
+            self.head_start_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+        adopted = [name for name in self.tasks if name in needed]
+        for name, task in self.tasks.items():
+            if name in adopted or name in self.outcomes:
+                continue
+            outcome = "discarded" if task.done() else "cancelled"
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            self.outcomes[name] = outcome
+            wasted = self._usage(name).total_tokens
+            telemetry.SPECULATIVE_AGENTS.inc(agent=name, outcome=outcome)
+            if wasted:
+                telemetry.SPECULATIVE_WASTED_TOKENS.inc(wasted, agent=name)
+            if outcome == "cancelled":
+                await self.ws_manager.send_agent_completed(
+                    self.conversation_id, name, "Cancelled: not needed for this request", 0
+                )
+        for name in adopted:
+            if name not in self.outcomes:
+                self.outcomes[name] = "adopted"
+                telemetry.SPECULATIVE_AGENTS.inc(agent=name, outcome="adopted")
+        return adopted
+
+    async def cancel(self) -> None:
+        """Stop every speculative run still going, adopted or not (the request failed)."""
+        await self.resolve([])
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def _usage(self, name: str) -> TokenUsage:
+        ledger = self.ledgers.get(name)
+        return ledger.total_usage if ledger else TokenUsage()
+
+    def summary(self) -> dict:
+        wasted = [name for name, outcome in self.outcomes.items() if outcome != "adopted"]
+        return {
+            "agents": list(self.tasks),
+            "outcomes": self.outcomes,
+            "head_start_ms": self.head_start_ms,
+            "wasted_tokens": sum(self._usage(name).total_tokens for name in wasted),
+            "wasted_cost_usd": round(sum(self.ledgers[n].summary()["cost_usd"] for n in wasted if n in self.ledgers), 6),
+        }
+
+
+class _ProgressiveSynthesis:
+    """Final response written section by section while agents are still running.
+
+    A single synthesis call can only start once every agent is done. Here
+    each of ``_SYNTHESIS_SECTIONS`` is its own completion, started as soon as
+    the agents it draws on have been ``deliver``-ed: the overview right after
+    researcher and memory, the platform cards once the scribe is done, and so
+    on. Sections are written concurrently but streamed strictly in order; the
+    first unfinished section streams live and later ones are buffered until
+    it ends. Sections whose agents aren't in the run are skipped, except the
+    overview, which then starts from the intent alone.
+    """
+
+    def __init__(self, llm: Any, message: str, intent: dict, agents: list[str], on_token: Any):
+        self.llm = llm
+        self.message = message
+        self.intent = intent
+        self.on_token = on_token
+        self.results: dict[str, str] = {}
+        self.delivered = {name: asyncio.Event() for name in agents}
+        self.sections: list[tuple[str, asyncio.Task, asyncio.Queue]] = []
+        for name, inputs, instructions in _SYNTHESIS_SECTIONS:
+            inputs = [agent for agent in inputs if agent in self.delivered]
+            if inputs or name == "overview":
+                queue: asyncio.Queue = asyncio.Queue()
+                task = asyncio.create_task(self._write(name, inputs, instructions, queue))
+                self.sections.append((name, task, queue))
+        self.started_at: Optional[float] = None
+        self.stream = asyncio.create_task(self._stream())
+
+    def deliver(self, agent: str, result: str) -> None:
+        """Hand over an agent's result; sections waiting only on finished agents start."""
+        self.results[agent] = result
+        if agent in self.delivered:
+            self.delivered[agent].set()
+
+    async def _write(self, name: str, inputs: list[str], instructions: str, queue: asyncio.Queue) -> str:
+        try:
+            await asyncio.gather(*(self.delivered[agent].wait() for agent in inputs))
+            if name == "overview":
+                self.started_at = time.perf_counter()  # The streamed response starts with it
+
+            async def _on_token(token: str):
+                queue.put_nowait(token)
+
+            prompt = f"""You are writing one section of the response to the user's request. The other sections are written separately, so write only this section: no introduction or closing remarks.
+
+User Request: {self.message}
+Target Platforms: {", ".join(self.intent["target_platforms"])}
+Intent: {self.intent["primary_intent"]}
+
+Agent Outputs:
+{_format_agent_results({agent: self.results[agent] for agent in inputs}, f"synthesis:{name}") or "(none yet)"}
+
+{_RICH_OUTPUT_RULES}
+
+Section to write:
+{instructions}"""
+            with record_span(f"synthesis:{name}", "synthesis"):
+                return await self.llm.stream_with_callback(
+                    prompt=prompt,
+                    system_prompt=AGENT_PROMPTS["orchestrator"],
+                    on_token=_on_token,
+                    route="orchestrator:synthesis",
+                )
+        finally:
+            queue.put_nowait(None)
+
+    async def _stream(self) -> str:
+        streamed: list[str] = []
+        for _, task, queue in self.sections:
+            separator = "\n\n" if streamed else ""
+            while (token := await queue.get()) is not None:
+                streamed.append(separator + token)
+                await self.on_token(streamed[-1])
+                separator = ""
+            await task  # Raises if the section failed
+        return "".join(streamed)
+
+    async def finish(self) -> str:
+        """Wait for every section to be written and streamed; return the whole response."""
+        return await self.stream
+
+    async def cancel(self) -> None:
+        """Stop writing (the request failed)."""
+        tasks = [task for _, task, _ in self.sections] + [self.stream]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 async def _execute_agent(
     agent_name: str,
     task: str,
@@ -416,61 +911,208 @@ async def _execute_agent(
     conversation_id: str,
     ws_manager: ConnectionManager,
     db: AsyncSession,
+    queued_at: Optional[float] = None,
 ) -> tuple[str, int, dict]:
-    """Execute a specific agent and return its result with token usage and trace data."""
+    """Execute a specific agent and return its result with token usage and trace data.
+
+    ``queued_at`` (perf_counter) is when the wave dispatched the agent; the
+    gap until its run starts is recorded as queue time in the waterfall.
+    """
     start_time = time.time()
 
-    await ws_manager.send_agent_started(conversation_id, agent_name, task[:100])
+    with record_span(agent_name, "agent", agent=agent_name, start=queued_at), usage_ledger(agent_name) as usage:
+        await ws_manager.send_agent_started(conversation_id, agent_name, task[:100])
+
+        # Notify which tools/MCP servers this agent will use
+        _tool_info = {
+            "researcher": [("search_web", "tool"), ("search_news", "tool"), ("search_trends", "tool"), ("analyze_hashtags", "tool"), ("fetch_mcp", "mcp")],
+            "strategist": [("calculate_engagement_metrics", "tool"), ("recommend_posting_schedule", "tool"), ("search_trends", "tool")],
+            "memory": [("get_brand_guidelines", "tool"), ("get_past_posts", "tool"), ("get_content_calendar", "tool"), ("search_knowledge_base", "tool")],
+            "analyst": [("calculate_engagement_metrics", "tool"), ("recommend_posting_schedule", "tool"), ("search_trends", "tool")],
+            "advisor": [("get_brand_guidelines", "tool"), ("get_past_posts", "tool")],
+            "scribe": [("filesystem_mcp", "mcp")],
+        }
+        for tool_name, tool_type in _tool_info.get(agent_name, []):
+            await ws_manager.send_agent_tool_call(conversation_id, agent_name, tool_name, tool_type)
+
+        run_started = time.perf_counter()
+        add_span("queue", "queue", queued_at if queued_at is not None else run_started, run_started)
+
+        try:
+            with record_span("execute", "execute"):
+                if agent_name == "strategist":
+                    result, tokens_used, trace_data = await run_strategist(task, context)
+                elif agent_name == "researcher":
+                    result, tokens_used, trace_data = await run_researcher(task, context)
+                elif agent_name == "analyst":
+                    result, tokens_used, trace_data = await run_analyst(task, context)
+                elif agent_name == "scribe":
+                    result, tokens_used, trace_data = await run_scribe(task, context)
+                elif agent_name == "advisor":
+                    result, tokens_used, trace_data = await run_advisor(task, context)
+                elif agent_name == "memory":
+                    result, tokens_used, trace_data = await run_memory(task, context)
+                else:
+                    result = f"Unknown agent: {agent_name}"
+                    tokens_used = 0
+                    trace_data = {}
+
+            # Prefer the calls actually metered in this agent's ledger over its self-reported count
+            tokens_used = usage.total_usage.total_tokens or tokens_used
+            trace_data = {**trace_data, "usage": usage.summary()}
+            duration_ms = int((time.time() - start_time) * 1000)
+
+            await ws_manager.send_agent_completed(
+                conversation_id, agent_name, result[:100], duration_ms
+            )
 
-    # Notify which tools/MCP servers this agent will use
-    _tool_info = {
-        "researcher": [("search_web", "tool"), ("search_news", "tool"), ("search_trends", "tool"), ("analyze_hashtags", "tool"), ("fetch_mcp", "mcp")],
-        "strategist": [("calculate_engagement_metrics", "tool"), ("recommend_posting_schedule", "tool"), ("search_trends", "tool")],
-        "memory": [("get_brand_guidelines", "tool"), ("get_past_posts", "tool"), ("get_content_calendar", "tool"), ("search_knowledge_base", "tool")],
-        "analyst": [("calculate_engagement_metrics", "tool"), ("recommend_posting_schedule", "tool"), ("search_trends", "tool")],
-        "advisor": [("get_brand_guidelines", "tool"), ("get_past_posts", "tool")],
-        "scribe": [("filesystem_mcp", "mcp")],
-    }
-    for tool_name, tool_type in _tool_info.get(agent_name, []):
-        await ws_manager.send_agent_tool_call(conversation_id, agent_name, tool_name, tool_type)
+            return result, tokens_used, trace_data
 
-    try:
-        if agent_name == "strategist":
-            result, tokens_used, trace_data = await run_strategist(task, context)
-        elif agent_name == "researcher":
-            result, tokens_used, trace_data = await run_researcher(task, context)
-        elif agent_name == "analyst":
-            result, tokens_used, trace_data = await run_analyst(task, context)
-        elif agent_name == "scribe":
-            result, tokens_used, trace_data = await run_scribe(task, context)
-        elif agent_name == "advisor":
-            result, tokens_used, trace_data = await run_advisor(task, context)
-        elif agent_name == "memory":
-            result, tokens_used, trace_data = await run_memory(task, context)
-        else:
-            result = f"Unknown agent: {agent_name}"
-            tokens_used = 0
-            trace_data = {}
+        except Exception as e:
+            await ws_manager.send_agent_completed(conversation_id, agent_name, f"Error: {str(e)}", 0)
+            return f"Error from {agent_name}: {str(e)}", 0, {}
 
-        duration_ms = int((time.time() - start_time) * 1000)
 
-        await ws_manager.send_agent_completed(
-            conversation_id, agent_name, result[:100], duration_ms
+def _format_agent_results(results: dict, consumer: str = "synthesis") -> str:
+    """Format agent results for synthesis, within ``consumer``'s token budgets."""
+    return handoff_context(
+        consumer, results,
+        titles={agent: agent.upper() for agent in results},
+        template="=== {title} ===\n{text}\n", separator="\n",
+    )
+
+
+async def regenerate_platform(
+    document: Document,
+    platform: str,
+    instruction: str,
+    ws_manager: ConnectionManager,
+    db: AsyncSession,
+) -> dict:
+    """Rewrite one platform's content in a social post document, in place.
+
+    Only scribe and advisor run. They get the Wave 1 context stored with the
+    document, or, for documents saved before it was stored, the agent traces
+    of the run that produced the document. The new scribe draft replaces the
+    platform's section (see ``patch_platform_section``). Citations, the
+    advisor's review and the usage are appended to the document's metadata.
+    Returns the ``regenerations`` entry.
+    """
+    trace_service = get_trace_service()
+    metadata = dict(document.metadata_ or {})
+    conversation_id = document.conversation_id or metadata.get("conversation_id") or document.id
+    previous = dict(metadata.get("context") or {})
+    if not previous and metadata.get("trace_id"):
+        previous = await _context_from_traces(db, metadata["trace_id"])
+
+    label = PLATFORM_LABELS[platform]
+    topic = metadata.get("topic") or document.title
+    task = f"Rewrite the {label} content about '{topic}'. Instruction: {instruction}"
+    section = find_platform_section(document.content, platform)
+    if section:
+        task += f"\n\nCurrent {label} content:\n{document.content[section[0]:section[1]].strip()}"
+    async def _on_draft(draft_platform: str, draft: str):
+        await ws_manager.send_agent_draft(conversation_id, "scribe", draft_platform, draft)
+
+    context = {
+        "message": instruction,
+        "entities": [topic],
+        "intent": "content_creation",
+        "platforms": [platform],
+        "previous_results": previous,
+        "on_draft": _on_draft,
+    }
+
+    original_content, original_metadata = document.content, document.metadata_
+    start_time = time.time()
+    with start_waterfall() as waterfall, usage_ledger("regenerate_platform") as usage:
+        trace = await trace_service.start_trace(
+            db=db,
+            agent_name="orchestrator",
+            task_type="platform_regeneration",
+            input_data={"document_id": document.id, "platform": platform, "instruction": instruction},
         )
+        await ws_manager.send_agent_started(conversation_id, "orchestrator", f"Regenerating {label} content")
+        try:
+            results: dict[str, str] = {}
+            tokens: dict[str, int] = {}
+            traces: dict[str, dict] = {}
+            with record_span("wave2", "wave"):
+                results["scribe"], tokens["scribe"], traces["scribe"] = await _execute_agent(
+                    "scribe", task, context, conversation_id, ws_manager, db
+                )
+                if results["scribe"].startswith("Error from"):
+                    raise RuntimeError(results["scribe"])
+                results["advisor"], tokens["advisor"], traces["advisor"] = await _execute_agent(
+                    "advisor", task, {**context, "previous_results": {**previous, "scribe": results["scribe"]}},
+                    conversation_id, ws_manager, db,
+                )
 
-        return result, tokens_used, trace_data
+            with record_span("record_traces", "persist"):
+                await _record_agent_traces(db, trace, task, results, tokens, traces, conversation_id, ws_manager)
+
+            citations = []
+            for agent_name, trace_data in traces.items():
+                for c in trace_data.get("citations", []):
+                    c["contributing_agent"] = agent_name
+                    citations.append(c)
+
+            document.content, patched = patch_platform_section(document.content, platform, results["scribe"])
+            regeneration = {
+                "platform": platform,
+                "instruction": instruction,
+                "patched": patched,
+                "advisor_review": results["advisor"],
+                "trace_id": trace.id,
+                "regenerated_at": datetime.utcnow().isoformat(),
+                "usage": usage.summary(),
+            }
+            metadata["citations"] = [*metadata.get("citations", []), *citations]
+            metadata["regenerations"] = [*metadata.get("regenerations", []), regeneration]
+            document.metadata_ = metadata
+            with record_span("save_document", "persist"):
+                await db.flush()
+
+            duration_ms = int((time.time() - start_time) * 1000)
+            await trace_service.complete_trace(
+                db=db,
+                trace=trace,
+                output_data={
+                    "document_id": document.id,
+                    "platform": platform,
+                    "patched": patched,
+                    "agents_used": list(results),
+                    "context_agents": sorted(previous),
+                    "usage": usage.summary(),
+                },
+                tokens_used=usage.own_usage.total_tokens,
+                citations=citations,
+                duration_ms=duration_ms,
+                waterfall=waterfall.to_compact(),
+            )
+            await ws_manager.send_document_generated(conversation_id, document.id, document.doc_type, document.title)
+            await ws_manager.send_agent_completed(
+                conversation_id, "orchestrator", f"Regenerated {label} content", duration_ms
+            )
+            return regeneration
 
-    except Exception as e:
-        await ws_manager.send_agent_completed(conversation_id, agent_name, f"Error: {str(e)}", 0)
-        return f"Error from {agent_name}: {str(e)}", 0, {}
+        except Exception as e:
+            # The caller commits the failed trace; don't let a half-applied patch go with it
+            document.content, document.metadata_ = original_content, original_metadata
+            await trace_service.fail_trace(db=db, trace=trace, error=str(e))
+            raise
 
 
-def _format_agent_results(results: dict) -> str:
-    """Format agent results for synthesis."""
-    formatted = []
-    for agent, result in results.items():
-        formatted.append(f"=== {agent.upper()} ===\n{result}\n")
-    return "\n".join(formatted)
+async def _context_from_traces(db: AsyncSession, trace_id: str) -> dict[str, str]:
+    """Wave 1 outputs recorded under an orchestrator trace (previews, for documents without stored context)."""
+    result = await db.execute(
+        select(AgentTrace).where(AgentTrace.parent_trace_id == trace_id)
+    )
+    return {
+        child.agent_name: (child.output_data or {}).get("result_preview", "")
+        for child in result.scalars()
+        if child.agent_name in ("researcher", "strategist", "memory", "analyst")
+    }
 
 
 async def generate_social_content(
@@ -490,6 +1132,31 @@ async def generate_social_content(
 
     context = {"message": scope, "platforms": platforms}
 
+    with usage_ledger("generate_social_content") as usage:
+        content, wave1 = await _generate_social_content(llm, topic, platforms, scope, context)
+
+    # Save document
+    doc = await doc_service.create_document(
+        db=db,
+        title=f"Social Post: {topic[:60]}",
+        doc_type="social_post",
+        content=content,
+        metadata={
+            "topic": topic,
+            "platforms": platforms,
+            "content_type": content_type,
+            "generated_via": "api",
+            "usage": usage.summary(),
+            "context": wave1,
+        },
+    )
+
+    return doc
+
+
+async def _generate_social_content(llm, topic: str, platforms: list[str], scope: str,
+                                   context: dict) -> tuple[str, dict[str, str]]:
+    """Run the agents and synthesis for ``generate_social_content``; returns content and Wave 1 outputs."""
     # Wave 1: Gather context
     research_result, _, _ = await run_researcher(scope, context)
     memory_result, _, _ = await run_memory(scope, context)
@@ -510,33 +1177,22 @@ async def generate_social_content(
     })
 
     # Synthesize
+    agent_outputs = handoff_context(
+        "synthesis",
+        {"researcher": research_result, "strategist": strategy_result, "scribe": scribe_result, "advisor": advisor_result},
+        titles={"researcher": "Research", "strategist": "Strategy", "scribe": "Draft Content", "advisor": "Compliance Review"},
+        template="{title}: {text}", separator="\n",
+    )
     content = await llm.complete(
         prompt=f"""Combine these outputs into final social media content:
 
 Topic: {topic}
 Platforms: {', '.join(platforms)}
 
-Research: {research_result[:500]}
-Strategy: {strategy_result[:500]}
-Draft Content: {scribe_result}
-Compliance Review: {advisor_result[:500]}
+{agent_outputs}
 
 Produce the final platform-specific posts ready for publishing.""",
         system_prompt=AGENT_PROMPTS["orchestrator"],
+        route="orchestrator:synthesis",
     )
-
-    # Save document
-    doc = await doc_service.create_document(
-        db=db,
-        title=f"Social Post: {topic[:60]}",
-        doc_type="social_post",
-        content=content,
-        metadata={
-            "topic": topic,
-            "platforms": platforms,
-            "content_type": content_type,
-            "generated_via": "api",
-        },
-    )
-
-    return doc
+    return content, {"researcher": research_result, "memory": memory_result, "strategist": strategy_result}
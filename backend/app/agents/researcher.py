@@ -121,6 +121,7 @@ Synthesize these findings into a clear, well-organized research briefing."""
         prompt=fallback_prompt,
         system_prompt=RESEARCHER_PROMPT,
         temperature=0.5,
+        route="researcher",
     )
     duration_ms = int((time.time() - start_time) * 1000)
 
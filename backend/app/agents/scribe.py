@@ -8,10 +8,13 @@ import asyncio
 import logging
 import time
 
+from app.agents.context_builder import handoff_context
 from app.agents.prompts import SCRIBE_PROMPT
 from app.agents.factory import create_agent, get_agent_tools
 from app.agents.middleware import build_agent_trace_data
+from app.services.document_service import PLATFORM_LABELS
 from app.services.llm_service import get_llm_service
+from app.services.waterfall import record_span
 
 logger = logging.getLogger(__name__)
 
@@ -42,39 +45,76 @@ def _ensure_mcp_cleanup_filter():
 async def run_scribe(task: str, context: dict) -> tuple[str, int, dict]:
     """Run the Scribe agent for platform-specific content generation.
 
+    Each target platform is drafted by its own concurrent completion over the
+    same source context. Output tokens for LinkedIn, Twitter and Instagram are
+    therefore generated in parallel rather than in one long completion. Drafts
+    are assembled in platform order. If ``context["on_draft"]`` is set, it is
+    awaited with ``(platform, draft)`` as soon as each draft is finished.
+
     Returns:
         Tuple of (generated content, tokens used, trace data dict)
     """
     # Gather context from previous agents (Wave 1 outputs)
     previous = context.get("previous_results", {})
-    platforms = context.get("platforms", ["linkedin", "twitter", "instagram"])
-    content_parts = []
+    platforms = list(dict.fromkeys(context.get("platforms") or ["linkedin", "twitter", "instagram"]))
+    source_content = handoff_context(
+        "scribe", previous,
+        titles={
+            "strategist": "Content Strategy",
+            "researcher": "Research & Trends",
+            "analyst": "Engagement Data",
+            "memory": "Brand Context",
+        },
+        template="## {title}\n{text}",
+    ) or context.get("message", "")
+    on_draft = context.get("on_draft")
+
+    start_time = time.time()
 
-    if "strategist" in previous:
-        content_parts.append(f"## Content Strategy\n{previous['strategist']}")
-    if "researcher" in previous:
-        content_parts.append(f"## Research & Trends\n{previous['researcher']}")
-    if "analyst" in previous:
-        content_parts.append(f"## Engagement Data\n{previous['analyst']}")
-    if "memory" in previous:
-        content_parts.append(f"## Brand Context\n{previous['memory']}")
+    async def _draft(platform: str) -> tuple[str, int, dict]:
+        with record_span(platform, "draft"):
+            text, tokens, trace = await _draft_platform(task, platform, source_content)
+        if on_draft is not None:
+            await on_draft(platform, text)
+        return text, tokens, trace
 
-    source_content = "\n\n".join(content_parts) if content_parts else context.get("message", "")
-    platforms_str = ", ".join(platforms)
+    drafts = await asyncio.gather(*[_draft(platform) for platform in platforms])
 
+    text = "\n\n".join(draft.strip() for draft, _, _ in drafts)
+    tokens = sum(draft_tokens for _, draft_tokens, _ in drafts)
+    duration_ms = int((time.time() - start_time) * 1000)
+    trace = build_agent_trace_data("scribe", text, tokens, duration_ms)
+    seen = {c.get("url") or c.get("preview", "") for c in trace["citations"]}
+    for _, _, draft_trace in drafts:
+        for c in draft_trace.get("citations", []):
+            key = c.get("url") or c.get("preview", "")
+            if key not in seen:
+                seen.add(key)
+                trace["citations"].append(c)
+        trace["tool_calls"].extend(draft_trace.get("tool_calls", []))
+    trace["platforms"] = {
+        platform: {"duration_ms": draft_trace.get("duration_ms"), "tokens_used": draft_tokens}
+        for platform, (_, draft_tokens, draft_trace) in zip(platforms, drafts)
+    }
+    return text, tokens, trace
+
+
+async def _draft_platform(task: str, platform: str, source_content: str) -> tuple[str, int, dict]:
+    """Write one platform's post; the other platforms are drafted concurrently."""
+    label = PLATFORM_LABELS.get(platform, platform)
     prompt = f"""Task: {task}
 
-Target Platforms: {platforms_str}
+Target Platform: {label}
 
 Source Content from Research & Strategy:
 {source_content}
 
-Generate platform-specific social media content for each target platform.
+Generate social media content for {label} only; the other platforms are written separately.
 Follow the template-guided pattern: hook -> body -> CTA -> hashtags.
+Start with a "## {label}" heading and include the {label} preview card.
 
-After generating content, save each platform's post as a draft file using the
-filesystem tool (if available). Use filenames like 'linkedin_draft.md',
-'twitter_draft.md', 'instagram_draft.md'."""
+After generating content, save the post as a draft file using the filesystem tool
+(if available), named '{platform}_draft.md'."""
 
     start_time = time.time()
 
@@ -90,7 +130,7 @@ filesystem tool (if available). Use filenames like 'linkedin_draft.md',
         trace = build_agent_trace_data("scribe", text, tokens or 0, duration_ms, response)
         return text, tokens or 0, trace
     except Exception as e:
-        logger.warning("MAF agent path failed for scribe, falling back to direct LLM: %s", e)
+        logger.warning("MAF agent path failed for scribe (%s), falling back to direct LLM: %s", platform, e)
 
     # Fallback: direct LLM call (no MCP, no tools)
     llm = get_llm_service()
@@ -98,6 +138,7 @@ filesystem tool (if available). Use filenames like 'linkedin_draft.md',
         prompt=prompt,
         system_prompt=SCRIBE_PROMPT,
         temperature=0.6,
+        route="scribe",
     )
     duration_ms = int((time.time() - start_time) * 1000)
     trace = build_agent_trace_data("scribe", response.content, response.tokens_used, duration_ms)
@@ -7,6 +7,7 @@ content strategies, posting schedules, and platform-specific plans.
 import logging
 import time
 
+from app.agents.context_builder import handoff_context
 from app.agents.prompts import STRATEGIST_PROMPT
 from app.agents.factory import create_agent, get_agent_tools
 from app.agents.middleware import build_agent_trace_data
@@ -40,10 +41,13 @@ async def run_strategist(task: str, context: dict) -> tuple[str, int, dict]:
         context_parts.append(f"Timeline: {context['timeline']}")
 
     previous = context.get("previous_results", {})
-    if "researcher" in previous:
-        context_parts.append(f"\nResearch Findings:\n{previous['researcher'][:1000]}")
-    if "memory" in previous:
-        context_parts.append(f"\nBrand Context:\n{previous['memory'][:1000]}")
+    handoff = handoff_context(
+        "strategist", previous,
+        titles={"researcher": "Research Findings", "memory": "Brand Context"},
+        template="\n{title}:\n{text}", separator="\n",
+    )
+    if handoff:
+        context_parts.append(handoff)
 
     context_str = "\n".join(context_parts) if context_parts else ""
     platforms = context.get("platforms", ["linkedin", "twitter", "instagram"])
@@ -81,6 +85,7 @@ Provide strategic guidance or generate the requested proposal/scoping document."
         prompt=prompt,
         system_prompt=STRATEGIST_PROMPT,
         temperature=0.7,
+        route="strategist",
     )
     duration_ms = int((time.time() - start_time) * 1000)
     trace = build_agent_trace_data("strategist", response.content, response.tokens_used, duration_ms)
@@ -0,0 +1,93 @@
+"""Compact MessagePack framing for WebSocket events.
+
+Clients opt in per connection by offering the ``oneshot.msgpack.v1``
+subprotocol; everyone else keeps receiving JSON text frames. A compact frame
+is a binary MessagePack array::
+
+    [event_code, seq, timestamp_ms, payload]
+
+``event_code`` is the small integer from ``EVENT_CODES`` (or the event type
+string for events without one) and ``timestamp_ms`` is Unix epoch
+milliseconds. ``payload`` is the event's ``data`` object, except for
+``stream.token``, which is ``[agent_code, token]`` using ``AGENT_CODES``.
+
+Frames are independent of permessage-deflate, which the client negotiates
+with uvicorn per connection for either encoding.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import msgpack
+
+MSGPACK_SUBPROTOCOL = "oneshot.msgpack.v1"
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+EVENT_CODES = {
+    "agent.started": 1,
+    "agent.thinking": 2,
+    "agent.completed": 3,
+    "agent.handoff": 4,
+    "agent.error": 5,
+    "agent.tool_call": 6,
+    "agent.citations": 7,
+    "stream.token": 8,
+    "document.generated": 9,
+    "response.citations": 10,
+    "replay.gap": 11,
+    "pong": 12,
+    "agent.draft": 13,
+    "agent.review": 14,
+}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+
+AGENT_CODES = {
+    "orchestrator": 0,
+    "strategist": 1,
+    "researcher": 2,
+    "analyst": 3,
+    "scribe": 4,
+    "advisor": 5,
+    "memory": 6,
+}
+AGENT_NAMES = {code: name for name, code in AGENT_CODES.items()}
+
+
+def negotiate_encoding(scope: dict) -> str:
+    """Pick the frame encoding from the subprotocols a client offered."""
+    if MSGPACK_SUBPROTOCOL in scope.get("subprotocols", ()):
+        return ENCODING_MSGPACK
+    return ENCODING_JSON
+
+
+# ============ Event frames ============
+
+
+def _timestamp_ms(timestamp: str) -> int:
+    if not timestamp:
+        return 0
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)  # Event timestamps are naive UTC
+    return int(moment.timestamp() * 1000)
+
+
+def encode_compact(event_type: str, data: Optional[dict], timestamp: str, seq: int = 0) -> bytes:
+    """Encode an event as a compact MessagePack frame."""
+    payload: Any = data
+    if event_type == "stream.token" and data is not None:
+        agent = data["agent_name"]
+        payload = [AGENT_CODES.get(agent, agent), data["token"]]
+    return msgpack.packb([EVENT_CODES.get(event_type, event_type), seq, _timestamp_ms(timestamp), payload])
+
+
+def decode_compact(frame: bytes) -> dict:
+    """Expand a compact frame back to the JSON event shape (timestamp in epoch ms)."""
+    code, seq, timestamp_ms, payload = msgpack.unpackb(frame)
+    event_type = EVENT_NAMES.get(code, code)
+    if event_type == "stream.token":
+        agent, token = payload
+        payload = {"agent_name": AGENT_NAMES.get(agent, agent), "token": token}
+    return {"event_type": event_type, "seq": seq, "timestamp_ms": timestamp_ms, "data": payload}
@@ -0,0 +1,93 @@
+"""Keyset (cursor) pagination helpers for list endpoints.
+
+Cursors are opaque URL-safe tokens that encode the ``(sort key, id)`` pair of
+the last row on a page. Seeking past that pair instead of using ``OFFSET``
+keeps deep pages as cheap as the first one, and the ``id`` tie-breaker keeps
+ordering stable when new rows are inserted between requests.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, Select, and_, or_
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, row_id: str) -> str:
+    """Encode a (sort key, id) pair as an opaque cursor string."""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, str]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(row_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, row_id
+
+
+def paginate(
+    query: Select,
+    sort_column,
+    id_column,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    descending: bool = True,
+) -> Select:
+    """Order and window a select by ``(sort_column, id_column)``.
+
+    When ``cursor`` is given the query seeks past it and ``offset`` is ignored;
+    otherwise the legacy offset is applied. One extra row is fetched so
+    :func:`finish_page` can tell whether another page exists.
+    """
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if isinstance(sort_column.type, DateTime):
+            try:
+                sort_value = datetime.fromisoformat(sort_value)
+            except (ValueError, TypeError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        if descending:
+            past_key = sort_column < sort_value
+            past_id = id_column < row_id
+        else:
+            past_key = sort_column > sort_value
+            past_id = id_column > row_id
+        query = query.where(or_(past_key, and_(sort_column == sort_value, past_id)))
+    elif offset:
+        query = query.offset(offset)
+
+    return query.limit(limit + 1)
+
+
+def finish_page(rows: Sequence, response: Response, limit: int, sort_attr: str) -> list:
+    """Drop the look-ahead row and advertise the next cursor on the response."""
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if has_more and rows:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_attr), last.id)
+    return rows
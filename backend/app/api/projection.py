@@ -0,0 +1,105 @@
+"""Sparse fieldset (``fields=``) projections for list endpoints.
+
+List views rarely need full document bodies or trace citation/tool-call
+JSON. A ``fields`` query parameter selects just the columns a view renders,
+so the database never loads (and the API never serialises) the heavy ones.
+``fields=summary`` expands to a per-resource preset; detail endpoints keep
+returning full rows.
+"""
+
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from app.models.database import AgentTrace, Document
+
+# Preset name that expands to a resource's summary fields
+SUMMARY_FIELDS = "summary"
+
+# Characters of content included in a document ``preview``
+PREVIEW_CHARS = 200
+
+DOCUMENT_COLUMNS = {
+    "id": Document.id,
+    "title": Document.title,
+    "doc_type": Document.doc_type,
+    "format": Document.format,
+    "created_at": Document.created_at,
+    "metadata": Document.metadata_,
+    "content": Document.content,
+    "size": func.length(Document.content),
+    "preview": func.substr(Document.content, 1, PREVIEW_CHARS),
+}
+
+DOCUMENT_SUMMARY = ("id", "title", "doc_type", "format", "created_at", "size", "preview")
+
+TRACE_COLUMNS = {
+    "id": AgentTrace.id,
+    "agent_name": AgentTrace.agent_name,
+    "task_type": AgentTrace.task_type,
+    "status": AgentTrace.status,
+    "started_at": AgentTrace.started_at,
+    "completed_at": AgentTrace.completed_at,
+    "tokens_used": AgentTrace.tokens_used,
+    "error": AgentTrace.error,
+    "citations": AgentTrace.citations,
+    "tool_calls": AgentTrace.tool_calls,
+    "duration_ms": AgentTrace.duration_ms,
+    "parent_trace_id": AgentTrace.parent_trace_id,
+}
+
+TRACE_SUMMARY = (
+    "id", "agent_name", "task_type", "status", "started_at", "completed_at",
+    "tokens_used", "error", "duration_ms", "parent_trace_id",
+)
+
+
+def parse_fields(
+    fields: Optional[str],
+    columns: dict[str, Any],
+    summary: Sequence[str],
+) -> Optional[list[str]]:
+    """Resolve a ``fields=`` value into an ordered list of field names.
+
+    Returns None when no projection was requested (full rows). ``id`` is
+    always included.
+
+    Raises:
+        HTTPException: 400 for unknown field names.
+    """
+    if not fields:
+        return None
+
+    names: list[str] = ["id"]
+    for name in (part.strip() for part in fields.split(",")):
+        if not name:
+            continue
+        expanded = summary if name == SUMMARY_FIELDS else (name,)
+        for field_name in expanded:
+            if field_name not in columns:
+                raise HTTPException(status_code=400, detail=f"Unknown field: {field_name}")
+            if field_name not in names:
+                names.append(field_name)
+    return names
+
+
+def select_columns(columns: dict[str, Any], names: Sequence[str], sort_key: str) -> list:
+    """Labelled columns for ``names`` plus the sort key needed for cursors."""
+    wanted = list(names) if sort_key in names else [*names, sort_key]
+    return [columns[name].label(name) for name in wanted]
+
+
+def project_rows(rows: Sequence, names: Sequence[str]) -> list[dict[str, Any]]:
+    """Convert projected result rows into response dicts with only ``names``."""
+    projected = []
+    for row in rows:
+        mapping = row._mapping
+        item = {name: mapping[name] for name in names}
+        if "metadata" in item:
+            item["metadata"] = item["metadata"] or {}
+        for json_field in ("citations", "tool_calls"):
+            if json_field in item:
+                item[json_field] = item[json_field] or []
+        projected.append(item)
+    return projected
@@ -1,52 +1,140 @@
 """Analytics API routes — agent performance, token usage, and social content metrics."""
 
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, func, case, extract
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.database import get_db, AgentTrace, Document, Metric
-from app.models.schemas import AgentTraceResponse
+from app.models.database import get_db, AgentTrace, Document
+from app.models.schemas import AgentTraceResponse, AgentTraceSummaryResponse
+from app.api.pagination import paginate, finish_page
+from app.api.projection import TRACE_COLUMNS, TRACE_SUMMARY, parse_fields, project_rows, select_columns
+from app.services.context_cache import get_context_cache
+from app.services.intent_classifier import get_intent_classifier
+from app.services.model_router import get_model_router
+from app.services.response_cache import get_response_cache
+from app.services.rollup_service import get_rollup_service, latency_summary
+from app.services.waterfall import expand
 
 router = APIRouter()
 
 
-@router.get("/traces", response_model=list[AgentTraceResponse])
+def _trace_response(trace: AgentTrace) -> AgentTraceResponse:
+    """Build the full response for a trace row."""
+    return AgentTraceResponse(
+        id=trace.id,
+        agent_name=trace.agent_name,
+        task_type=trace.task_type,
+        status=trace.status,
+        started_at=trace.started_at,
+        completed_at=trace.completed_at,
+        tokens_used=trace.tokens_used,
+        error=trace.error,
+        citations=trace.citations or [],
+        tool_calls=trace.tool_calls or [],
+        duration_ms=trace.duration_ms,
+        parent_trace_id=trace.parent_trace_id,
+    )
+
+
+@router.get(
+    "/traces",
+    response_model=list[AgentTraceResponse | AgentTraceSummaryResponse],
+    response_model_exclude_unset=True,
+)
 async def list_traces(
+    response: Response,
     agent_name: str = None,
     status: str = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """List agent execution traces."""
-    query = select(AgentTrace).order_by(AgentTrace.started_at.desc())
+    """List agent execution traces, newest first (supports ``cursor``).
+
+    ``fields=summary`` skips the citation and tool-call JSON; fetch
+    ``/traces/{trace_id}`` for the full trace.
+    """
+    names = parse_fields(fields, TRACE_COLUMNS, TRACE_SUMMARY)
+    if names is None:
+        query = select(AgentTrace)
+    else:
+        query = select(*select_columns(TRACE_COLUMNS, names, "started_at"))
 
     if agent_name:
         query = query.where(AgentTrace.agent_name == agent_name)
     if status:
         query = query.where(AgentTrace.status == status)
 
-    result = await db.execute(query.offset(offset).limit(limit))
-    traces = result.scalars().all()
-
-    return [
-        AgentTraceResponse(
-            id=trace.id,
-            agent_name=trace.agent_name,
-            task_type=trace.task_type,
-            status=trace.status,
-            started_at=trace.started_at,
-            completed_at=trace.completed_at,
-            tokens_used=trace.tokens_used,
-            error=trace.error,
-            citations=trace.citations or [],
-            tool_calls=trace.tool_calls or [],
-            duration_ms=trace.duration_ms,
-            parent_trace_id=trace.parent_trace_id,
-        )
-        for trace in traces
-    ]
+    result = await db.execute(
+        paginate(query, AgentTrace.started_at, AgentTrace.id, limit=limit, offset=offset, cursor=cursor)
+    )
+    if names is not None:
+        return project_rows(finish_page(result.all(), response, limit, "started_at"), names)
+
+    traces = finish_page(result.scalars().all(), response, limit, "started_at")
+    return [_trace_response(trace) for trace in traces]
+
+
+@router.get("/traces/{trace_id}", response_model=AgentTraceResponse)
+async def get_trace(
+    trace_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a single trace with its citations and tool calls."""
+    result = await db.execute(select(AgentTrace).where(AgentTrace.id == trace_id))
+    trace = result.scalar_one_or_none()
+
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+
+    return _trace_response(trace)
+
+
+@router.get("/traces/{trace_id}/waterfall")
+async def get_trace_waterfall(
+    trace_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """Latency waterfall of an orchestrator run: every timed span plus time per span kind."""
+    result = await db.execute(select(AgentTrace).where(AgentTrace.id == trace_id))
+    trace = result.scalar_one_or_none()
+
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if not trace.waterfall:
+        raise HTTPException(status_code=404, detail="No waterfall recorded for this trace")
+
+    return {
+        "trace_id": trace.id,
+        "agent_name": trace.agent_name,
+        "status": trace.status,
+        "started_at": trace.started_at,
+        "duration_ms": trace.duration_ms,
+        **expand(trace.waterfall),
+    }
+
+
+@router.get("/intent-classifier")
+async def get_intent_classifier_stats():
+    """Local intent classifier: offline cross-validated accuracy and live hit rate."""
+    return get_intent_classifier().stats()
+
+
+@router.get("/caches")
+async def get_cache_stats():
+    """Response and Wave 1 context cache hit rates since startup."""
+    return {"response": get_response_cache().stats(), "context": get_context_cache().stats()}
+
+
+@router.get("/routes")
+async def get_route_stats():
+    """Model routing policy with per-route latency, cost and fallbacks since startup."""
+    return get_model_router().stats()
 
 
 @router.get("/metrics")
@@ -64,30 +152,23 @@ async def get_metrics(
     else:
         since = now - timedelta(days=30)
 
-    # Agent execution stats
-    trace_result = await db.execute(
-        select(
-            AgentTrace.agent_name,
-            func.count(AgentTrace.id).label("count"),
-            func.avg(AgentTrace.tokens_used).label("avg_tokens"),
-        )
-        .where(AgentTrace.started_at >= since)
-        .group_by(AgentTrace.agent_name)
-    )
-    agent_stats = trace_result.all()
+    # Agent execution stats (rollups for closed buckets, raw scan for the live window).
+    # avg_tokens is total / executions: tokens_used defaults to 0 and is never written
+    # as NULL, so this equals the AVG(tokens_used) these endpoints reported before rollups.
+    agent_totals = await get_rollup_service().agent_totals(db, since, now)
 
     return {
         "period": period,
         "since": since.isoformat(),
         "agent_stats": [
             {
-                "agent": stat.agent_name,
-                "executions": stat.count,
-                "avg_tokens": round(stat.avg_tokens or 0, 2),
+                "agent": agent_name,
+                "executions": totals["executions"],
+                "avg_tokens": round(totals["total_tokens"] / totals["executions"], 2) if totals["executions"] else 0,
             }
-            for stat in agent_stats
+            for agent_name, totals in agent_totals.items()
         ],
-        "total_executions": sum(stat.count for stat in agent_stats),
+        "total_executions": sum(totals["executions"] for totals in agent_totals.values()),
     }
 
 
@@ -103,6 +184,8 @@ async def get_social_analytics(
     - Agent utilization breakdown (which agents run most)
     - Token usage by agent (cost awareness)
     - Content volume by platform and type
+    - Latency percentiles (p50/p90/p99) and histograms per agent, per wave,
+      and end to end
     """
     now = datetime.utcnow()
 
@@ -114,40 +197,27 @@ async def get_social_analytics(
         since = now - timedelta(days=30)
 
     # 1. Average content generation time (seconds) per agent
-    duration_result = await db.execute(
-        select(
-            AgentTrace.agent_name,
-            func.count(AgentTrace.id).label("executions"),
-            func.avg(
-                func.julianday(AgentTrace.completed_at) - func.julianday(AgentTrace.started_at)
-            ).label("avg_duration_days"),
-            func.sum(AgentTrace.tokens_used).label("total_tokens"),
-            func.avg(AgentTrace.tokens_used).label("avg_tokens"),
-            func.sum(case((AgentTrace.status == "completed", 1), else_=0)).label("successes"),
-            func.sum(case((AgentTrace.status == "failed", 1), else_=0)).label("failures"),
-        )
-        .where(AgentTrace.started_at >= since)
-        .group_by(AgentTrace.agent_name)
-    )
-    agent_rows = duration_result.all()
+    agent_totals = await get_rollup_service().agent_totals(db, since, now)
 
     agent_performance = []
     total_tokens = 0
     total_executions = 0
 
-    for row in agent_rows:
-        avg_seconds = (row.avg_duration_days or 0) * 86400  # Convert days to seconds
+    for agent_name, totals in agent_totals.items():
+        executions = totals["executions"]
+        timed = totals["timed_executions"]
+        avg_seconds = totals["duration_ms_sum"] / timed / 1000 if timed else 0
         agent_performance.append({
-            "agent": row.agent_name,
-            "executions": row.executions,
+            "agent": agent_name,
+            "executions": executions,
             "avg_duration_seconds": round(avg_seconds, 2),
-            "total_tokens": row.total_tokens or 0,
-            "avg_tokens": round(row.avg_tokens or 0),
-            "success_rate": round(row.successes / row.executions * 100, 1) if row.executions else 0,
-            "failures": row.failures or 0,
+            "total_tokens": totals["total_tokens"],
+            "avg_tokens": round(totals["total_tokens"] / executions) if executions else 0,
+            "success_rate": round(totals["successes"] / executions * 100, 1) if executions else 0,
+            "failures": totals["failures"],
         })
-        total_tokens += row.total_tokens or 0
-        total_executions += row.executions
+        total_tokens += totals["total_tokens"]
+        total_executions += executions
 
     # 2. Content volume — posts generated by type
     content_result = await db.execute(
@@ -161,21 +231,27 @@ async def get_social_analytics(
     content_stats = {row.doc_type: row.count for row in content_result.all()}
 
     # 3. Orchestrator-level stats (overall content generation time)
-    orchestrator_result = await db.execute(
-        select(
-            func.avg(
-                func.julianday(AgentTrace.completed_at) - func.julianday(AgentTrace.started_at)
-            ).label("avg_duration_days"),
-            func.count(AgentTrace.id).label("count"),
-        )
-        .where(
-            AgentTrace.agent_name == "orchestrator",
-            AgentTrace.started_at >= since,
-            AgentTrace.status == "completed",
-        )
+    orch = agent_totals.get("orchestrator")
+    avg_generation_seconds = (
+        orch["completed_duration_ms_sum"] / orch["successes"] / 1000
+        if orch and orch["successes"] else 0
     )
-    orch_row = orchestrator_result.one_or_none()
-    avg_generation_seconds = ((orch_row.avg_duration_days or 0) * 86400) if orch_row else 0
+
+    # 4. Latency distributions from stored histograms
+    histograms = await get_rollup_service().latency_histograms(db, since)
+    latency = {
+        "orchestrator": latency_summary(histograms.get("agent:orchestrator", {})),
+        "waves": {
+            series.split(":", 1)[1]: latency_summary(bins)
+            for series, bins in sorted(histograms.items())
+            if series.startswith("wave:")
+        },
+        "agents": {
+            series.split(":", 1)[1]: latency_summary(bins)
+            for series, bins in sorted(histograms.items())
+            if series.startswith("agent:") and series != "agent:orchestrator"
+        },
+    }
 
     return {
         "period": period,
@@ -189,4 +265,5 @@ async def get_social_analytics(
         },
         "agent_performance": sorted(agent_performance, key=lambda x: x["executions"], reverse=True),
         "content_by_type": content_stats,
+        "latency": latency,
     }
@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,6 +16,7 @@ from app.models.schemas import (
     MessageResponse,
 )
 from app.agents.orchestrator import process_message
+from app.api.pagination import paginate, finish_page
 from app.api.websocket import manager
 
 router = APIRouter()
@@ -23,25 +24,38 @@ router = APIRouter()
 
 @router.get("/conversations", response_model=list[ConversationResponse])
 async def list_conversations(
+    response: Response,
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """List all conversations."""
+    """List all conversations, most recently updated first.
+
+    Pass the ``X-Next-Cursor`` header from a previous page as ``cursor`` for
+    keyset pagination; ``offset`` is ignored when a cursor is given. Pages
+    seek on ``updated_at``, which changes with every message, so a
+    conversation updated between page requests jumps ahead of the cursor
+    and is missing from later pages; restart from the first page to see it.
+    """
     result = await db.execute(
-        select(Conversation)
-        .order_by(Conversation.updated_at.desc())
-        .offset(offset)
-        .limit(limit)
+        paginate(
+            select(Conversation),
+            Conversation.updated_at,
+            Conversation.id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
     )
-    conversations = result.scalars().all()
+    conversations = finish_page(result.scalars().all(), response, limit, "updated_at")
     
-    response = []
+    items = []
     for conv in conversations:
         msg_count = await db.execute(
             select(func.count(Message.id)).where(Message.conversation_id == conv.id)
         )
-        response.append(
+        items.append(
             ConversationResponse(
                 id=conv.id,
                 title=conv.title,
@@ -51,7 +65,7 @@ async def list_conversations(
                 message_count=msg_count.scalar() or 0,
             )
         )
-    return response
+    return items
 
 
 @router.post("/conversations", response_model=ConversationResponse)
@@ -109,19 +123,25 @@ async def get_conversation(
 @router.get("/conversations/{conversation_id}/messages", response_model=list[MessageResponse])
 async def list_messages(
     conversation_id: str,
+    response: Response,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """List messages in a conversation."""
+    """List messages in a conversation, oldest first (supports ``cursor``)."""
     result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at.asc())
-        .offset(offset)
-        .limit(limit)
+        paginate(
+            select(Message).where(Message.conversation_id == conversation_id),
+            Message.created_at,
+            Message.id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            descending=False,
+        )
     )
-    messages = result.scalars().all()
+    messages = finish_page(result.scalars().all(), response, limit, "created_at")
     
     return [
         MessageResponse(
@@ -1,6 +1,9 @@
 """Document API routes."""
 
 import io
+import logging
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import Response
 from sqlalchemy import select
@@ -10,27 +13,51 @@ from docx import Document as DocxDocument
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
+from app.api.websocket import manager
 from app.models.database import get_db, Document
-from app.models.schemas import DocumentResponse, ExportRequest
+from app.models.schemas import DocumentResponse, DocumentSummaryResponse, ExportRequest, RegenerateRequest
+from app.api.pagination import paginate, finish_page
+from app.api.projection import DOCUMENT_COLUMNS, DOCUMENT_SUMMARY, parse_fields, project_rows, select_columns
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-@router.get("", response_model=list[DocumentResponse])
+@router.get(
+    "",
+    response_model=list[DocumentResponse | DocumentSummaryResponse],
+    response_model_exclude_unset=True,
+)
 async def list_documents(
+    response: Response,
     doc_type: str = None,
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """List all documents."""
-    query = select(Document).order_by(Document.created_at.desc())
+    """List all documents, newest first (supports ``cursor``).
+
+    ``fields=summary`` or a comma-separated field list returns a projection
+    that skips document bodies; use ``GET /{document_id}`` for the full item.
+    """
+    names = parse_fields(fields, DOCUMENT_COLUMNS, DOCUMENT_SUMMARY)
+    if names is None:
+        query = select(Document)
+    else:
+        query = select(*select_columns(DOCUMENT_COLUMNS, names, "created_at"))
     
     if doc_type:
         query = query.where(Document.doc_type == doc_type)
     
-    result = await db.execute(query.offset(offset).limit(limit))
-    documents = result.scalars().all()
+    result = await db.execute(
+        paginate(query, Document.created_at, Document.id, limit=limit, offset=offset, cursor=cursor)
+    )
+    if names is not None:
+        return project_rows(finish_page(result.all(), response, limit, "created_at"), names)
+
+    documents = finish_page(result.scalars().all(), response, limit, "created_at")
     
     return [
         DocumentResponse(
@@ -71,6 +98,44 @@ async def get_document(
     )
 
 
+@router.post("/{document_id}/regenerate", response_model=DocumentResponse)
+async def regenerate_platform_content(
+    document_id: str,
+    data: RegenerateRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Rewrite one platform's section of a social post, rerunning only scribe and advisor."""
+    from app.agents.orchestrator import regenerate_platform
+
+    result = await db.execute(
+        select(Document).where(Document.id == document_id)
+    )
+    document = result.scalar_one_or_none()
+
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if document.doc_type != "social_post":
+        raise HTTPException(status_code=400, detail="Only social posts can be regenerated per platform")
+
+    try:
+        await regenerate_platform(document, data.platform, data.instruction, manager, db)
+    except Exception as e:
+        logger.error("Platform regeneration failed: %s", e)
+        # Keep the failed trace; get_db rolls back when the HTTPException propagates
+        await db.commit()
+        raise HTTPException(status_code=500, detail=f"Regeneration failed: {e}")
+
+    return DocumentResponse(
+        id=document.id,
+        title=document.title,
+        doc_type=document.doc_type,
+        content=document.content,
+        format=document.format,
+        created_at=document.created_at,
+        metadata=document.metadata_ or {},
+    )
+
+
 @router.post("/{document_id}/export")
 async def export_document(
     document_id: str,
@@ -2,32 +2,44 @@
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.database import get_db, KnowledgeItem, Engagement
 from app.models.schemas import KnowledgeSearchRequest, KnowledgeItemResponse
+from app.api.pagination import paginate, finish_page
 
 router = APIRouter()
 
 
 @router.get("", response_model=list[KnowledgeItemResponse])
 async def list_knowledge(
+    response: Response,
     category: Optional[str] = Query(None),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header"),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all knowledge items with optional filtering."""
+    """List all knowledge items with optional filtering, oldest first."""
     query = select(KnowledgeItem)
     
     if category:
         query = query.where(KnowledgeItem.category == category)
     
-    query = query.offset(offset).limit(limit)
-    result = await db.execute(query)
-    items = result.scalars().all()
+    result = await db.execute(
+        paginate(
+            query,
+            KnowledgeItem.created_at,
+            KnowledgeItem.id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            descending=False,
+        )
+    )
+    items = finish_page(result.scalars().all(), response, limit, "created_at")
     
     return [
         KnowledgeItemResponse(
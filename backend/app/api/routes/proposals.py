@@ -1,33 +1,65 @@
 """Content API routes — social media content generation and retrieval."""
 
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.database import get_db, Document
-from app.models.schemas import ContentRequest, ProposalRequest, ProposalResponse, DocumentResponse
+from app.models.schemas import (
+    ContentRequest,
+    ProposalRequest,
+    ProposalResponse,
+    DocumentResponse,
+    DocumentSummaryResponse,
+)
+from app.api.pagination import paginate, finish_page
+from app.api.projection import DOCUMENT_COLUMNS, DOCUMENT_SUMMARY, parse_fields, project_rows, select_columns
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-@router.get("", response_model=list[DocumentResponse])
+@router.get(
+    "",
+    response_model=list[DocumentResponse | DocumentSummaryResponse],
+    response_model_exclude_unset=True,
+)
 async def list_content(
+    response: Response,
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """List all generated social media content."""
+    """List all generated social media content, newest first (supports ``cursor``).
+
+    ``fields=summary`` returns a projection without post bodies.
+    """
+    names = parse_fields(fields, DOCUMENT_COLUMNS, DOCUMENT_SUMMARY)
+    if names is None:
+        query = select(Document)
+    else:
+        query = select(*select_columns(DOCUMENT_COLUMNS, names, "created_at"))
+
     result = await db.execute(
-        select(Document)
-        .where(Document.doc_type.in_(["social_post", "proposal"]))
-        .order_by(Document.created_at.desc())
-        .offset(offset)
-        .limit(limit)
+        paginate(
+            query.where(Document.doc_type.in_(["social_post", "proposal"])),
+            Document.created_at,
+            Document.id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
     )
-    documents = result.scalars().all()
+    if names is not None:
+        return project_rows(finish_page(result.all(), response, limit, "created_at"), names)
+
+    documents = finish_page(result.scalars().all(), response, limit, "created_at")
 
     return [
         DocumentResponse(
@@ -44,7 +44,7 @@ async def _execute_with_ws(
             await ws_manager.send_agent_tool_call(session_id, agent_name, tool_name, tool_type)
 
     try:
-        result, tokens_used = await run_fn(**run_kwargs)
+        result, tokens_used, *_ = await run_fn(**run_kwargs)  # run_* also return a trace dict
         duration_ms = int((time.time() - start_time) * 1000)
 
         if session_id:
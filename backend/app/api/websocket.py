@@ -1,55 +1,530 @@
-"""WebSocket handler for real-time agent updates."""
+"""WebSocket handler for real-time agent updates.
 
+Each connection owns a bounded outbound queue drained by its own writer task,
+so ``broadcast`` only enqueues: a slow client can never stall delivery to
+other subscribers or the orchestrator that is producing events. When a queue
+fills up, the configured slow-consumer policy decides what gives.
+
+Streamed tokens are coalesced per (conversation, agent) before they reach the
+queues. A batch is flushed after a short interval that stretches with the
+observed delivery latency of the conversation's clients, once enough
+characters pile up, or right before any other event, so ordering holds.
+
+Events travel through an event bus before reaching the queues. With the
+default in-process bus that is a direct call; with a cross-process bus a
+worker subscribes to the conversations its clients watch, so a client may be
+connected to a different worker than the one running its conversation. The
+subscription outlives the last client by the replay window, so a client that
+reconnects to the same worker can still resume.
+
+Every event carries a per-conversation ``seq``. Recent events are kept in a
+bounded replay log so a client that reconnects with ``?last_seq=N`` receives
+exactly what it missed before live delivery resumes.
+
+Clients that offer the ``oneshot.msgpack.v1`` subprotocol get compact
+MessagePack frames instead of JSON text (see ``app.api.framing``). Each event
+is encoded at most once per format, however many connections receive it.
+"""
+
+import asyncio
 import json
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Set
+from typing import Callable, Dict, Optional
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from app.api.framing import (
+    ENCODING_JSON,
+    ENCODING_MSGPACK,
+    MSGPACK_SUBPROTOCOL,
+    encode_compact,
+    negotiate_encoding,
+)
+from app.config import settings
+from app.services import telemetry
+from app.services.event_bus import EventBus, InProcessEventBus, create_event_bus
+
+logger = logging.getLogger(__name__)
+
 websocket_router = APIRouter()
 
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Close code sent to clients disconnected for falling behind ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+_TOKEN_EVENT = "stream.token"
+
+
+_GAP_EVENT = "replay.gap"
+
+# Publishers remember the last seq of this many conversations
+_MAX_TRACKED_SEQUENCES = 10_000
+
+
+def _encode(event_type: str, data: dict, timestamp: str, seq: int = 0) -> str:
+    message = {
+        "event_type": event_type,
+        "timestamp": timestamp,
+        "data": data,
+    }
+    if seq:
+        message["seq"] = seq
+    return json.dumps(message)
+
+
+@dataclass
+class _Outbound:
+    """A queued message; ``data`` is kept so stream tokens can be coalesced."""
+    event_type: str
+    text: str
+    data: Optional[dict] = None
+    timestamp: str = ""
+    created: float = 0.0  # perf_counter() when produced, for delivery latency
+    seq: int = 0
+    packed: Optional[bytes] = None  # MessagePack frame, encoded on first use
+
+    def binary(self) -> bytes:
+        if self.packed is None:
+            self.packed = encode_compact(self.event_type, self.data, self.timestamp, self.seq)
+        return self.packed
+
+
+@dataclass
+class _TokenBuffer:
+    """Tokens from one agent waiting to be sent as a single stream.token."""
+    parts: list[str]
+    size: int = 0
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+@dataclass
+class _ReplayLog:
+    """Recent events of one conversation, oldest first."""
+    events: deque[_Outbound] = field(default_factory=deque)
+    size: int = 0
+    last_seq: int = 0
+    touched: float = 0.0  # perf_counter() of the newest event
+
+
+class ReplayStore:
+    """Bounded per-conversation logs of recent events for resuming clients.
+
+    Each log keeps at most ``max_events`` events and ``max_bytes`` of encoded
+    text, none older than ``max_age`` seconds. Whole logs are evicted, least
+    recently updated first, once they go stale or ``max_total_bytes`` is
+    exceeded.
+    """
+
+    def __init__(self, max_events: int, max_bytes: int, max_total_bytes: int, max_age: float):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_age = max_age
+        self.total_bytes = 0
+        self._logs: OrderedDict[str, _ReplayLog] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_events > 0
+
+    def last_seq(self, conversation_id: str) -> int:
+        log = self._logs.get(conversation_id)
+        return log.last_seq if log is not None else 0
+
+    def record(self, conversation_id: str, item: _Outbound) -> None:
+        if not self.enabled:
+            return
+        log = self._logs.get(conversation_id)
+        if log is None:
+            log = self._logs[conversation_id] = _ReplayLog()
+        else:
+            self._logs.move_to_end(conversation_id)
+        log.events.append(item)
+        log.size += len(item.text)
+        log.last_seq = max(log.last_seq, item.seq)
+        log.touched = item.created
+        self.total_bytes += len(item.text)
+        self._trim(log, item.created)
+        self._evict(item.created)
+
+    def since(self, conversation_id: str, last_seq: int) -> tuple[list[_Outbound], bool]:
+        """Events after ``last_seq``, and whether they cover everything the client missed.
+
+        No log, or a ``last_seq`` ahead of it (the publisher restarted and
+        numbering began again), counts as incomplete; the whole log is
+        returned so the client can resync from the reported gap.
+        """
+        log = self._logs.get(conversation_id)
+        if log is None:
+            return [], False
+        self._trim(log, time.perf_counter())
+        if last_seq > log.last_seq:
+            return list(log.events), False
+        first_seq = log.events[0].seq if log.events else log.last_seq + 1
+        return [item for item in log.events if item.seq > last_seq], first_seq <= last_seq + 1
+
+    def _trim(self, log: _ReplayLog, now: float) -> None:
+        cutoff = now - self.max_age
+        events = log.events
+        while events and (
+            len(events) > self.max_events or log.size > self.max_bytes or events[0].created < cutoff
+        ):
+            dropped = len(events.popleft().text)
+            log.size -= dropped
+            self.total_bytes -= dropped
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.max_age
+        while self._logs:
+            conversation_id, log = next(iter(self._logs.items()))
+            if log.touched >= cutoff and self.total_bytes <= self.max_total_bytes:
+                break
+            del self._logs[conversation_id]
+            self.total_bytes -= log.size
+
+
+# Weight of the newest sample in each connection's delivery-latency average
+_LATENCY_EWMA_ALPHA = 0.2
+
+
+class ClientConnection:
+    """A WebSocket with a bounded send queue and a dedicated writer task."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue_size: int,
+        policy: str,
+        on_close: Callable[["ClientConnection"], None],
+        encoding: str = ENCODING_JSON,
+    ):
+        self.websocket = websocket
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.encoding = encoding
+        self.pending: deque[_Outbound] = deque()
+        self.closed = False
+        self.delivery_ms = 0.0  # Smoothed time from event production to socket write
+        self._backlog = 0  # Replayed events still queued; extra room on top of max_queue_size
+        self._on_close = on_close
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._drain())
+
+    def enqueue(self, item: _Outbound) -> bool:
+        """Queue a message without blocking; False if the connection is gone."""
+        if self.closed:
+            return False
+        if len(self.pending) >= self.max_queue_size + self._backlog and not self._make_room():
+            return False
+        self.pending.append(item)
+        self._wakeup.set()
+        return True
+
+    def replay(self, items: list[_Outbound]) -> None:
+        """Queue missed events ahead of live ones without counting them against the limit."""
+        self.pending.extend(items)
+        self._backlog += len(items)
+        self._wakeup.set()
+
+    def _make_room(self) -> bool:
+        """Apply the slow-consumer policy to a full queue."""
+        if self.policy == "disconnect":
+            telemetry.WS_MESSAGES_DROPPED.inc(len(self.pending), policy=self.policy)
+            logger.warning("Disconnecting slow WebSocket consumer (%d queued)", len(self.pending))
+            self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+            return False
+        if self.policy == "coalesce" and self._coalesce_tokens():
+            return True
+        self._drop_oldest()
+        return True
+
+    def _coalesce_tokens(self) -> bool:
+        """Merge adjacent queued tokens from the same agent; True if room was made."""
+        merged: deque[_Outbound] = deque()
+        for item in self.pending:
+            previous = merged[-1] if merged else None
+            if (
+                previous is not None
+                and item.event_type == _TOKEN_EVENT
+                and previous.event_type == _TOKEN_EVENT
+                and previous.data["agent_name"] == item.data["agent_name"]
+            ):
+                data = {**previous.data, "token": previous.data["token"] + item.data["token"]}
+                merged[-1] = _Outbound(
+                    _TOKEN_EVENT,
+                    _encode(_TOKEN_EVENT, data, previous.timestamp, item.seq),
+                    data,
+                    previous.timestamp,
+                    previous.created,
+                    item.seq,
+                )
+            else:
+                merged.append(item)
+        freed = len(self.pending) - len(merged)
+        if freed:
+            telemetry.WS_MESSAGES_DROPPED.inc(freed, policy=self.policy)
+            self.pending = merged
+        return freed > 0
+
+    def _drop_oldest(self) -> None:
+        """Discard the oldest queued token, or the oldest message if none are tokens."""
+        for index, item in enumerate(self.pending):
+            if item.event_type == _TOKEN_EVENT:
+                del self.pending[index]
+                break
+        else:
+            self.pending.popleft()
+        telemetry.WS_MESSAGES_DROPPED.inc(policy="drop_oldest")
+
+    async def _drain(self) -> None:
+        """Writer task: send queued messages in order until closed."""
+        try:
+            while not self.closed:
+                if not self.pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                item = self.pending.popleft()
+                if self._backlog:
+                    self._backlog -= 1
+                if self.encoding == ENCODING_MSGPACK:
+                    await self.websocket.send_bytes(item.binary())
+                else:
+                    await self.websocket.send_text(item.text)
+                telemetry.WS_MESSAGES_SENT.inc(type=item.event_type)
+                if item.created:
+                    sample_ms = (time.perf_counter() - item.created) * 1000
+                    self.delivery_ms += _LATENCY_EWMA_ALPHA * (sample_ms - self.delivery_ms)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.close()
+
+    def close(self, code: Optional[int] = None) -> None:
+        """Stop the writer and forget the connection (optionally closing the socket)."""
+        if self.closed:
+            return
+        self.closed = True
+        self.pending.clear()
+        self._wakeup.set()
+        if asyncio.current_task() is not self._writer:
+            self._writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+        self._on_close(self)
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
 
 class ConnectionManager:
     """Manage WebSocket connections by conversation."""
 
-    def __init__(self):
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+    def __init__(
+        self,
+        max_queue_size: Optional[int] = None,
+        policy: Optional[str] = None,
+        token_flush_ms: Optional[int] = None,
+        token_max_flush_ms: Optional[int] = None,
+        token_flush_chars: Optional[int] = None,
+        bus: Optional[EventBus] = None,
+        replay: Optional[ReplayStore] = None,
+    ):
+        self.max_queue_size = max_queue_size or settings.ws_send_queue_size
+        self.policy = policy or settings.ws_slow_consumer_policy
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {self.policy}")
+        self.token_flush_ms = token_flush_ms or settings.ws_token_flush_ms
+        self.token_max_flush_ms = max(token_max_flush_ms or settings.ws_token_max_flush_ms, self.token_flush_ms)
+        self.token_flush_chars = token_flush_chars or settings.ws_token_flush_chars
+        self.active_connections: Dict[str, Dict[WebSocket, ClientConnection]] = {}
+        self._token_buffers: Dict[tuple[str, str], _TokenBuffer] = {}
+        self.bus = bus or InProcessEventBus()
+        self.bus.bind(self.deliver)
+        self.replay = replay or ReplayStore(
+            settings.ws_replay_max_events,
+            settings.ws_replay_max_bytes,
+            settings.ws_replay_max_total_bytes,
+            settings.ws_replay_max_age,
+        )
+        self._sequences: OrderedDict[str, int] = OrderedDict()
+        self._unsubscribe_timers: Dict[str, asyncio.TimerHandle] = {}
 
-    async def connect(self, websocket: WebSocket, conversation_id: str):
-        """Accept and track a new connection."""
-        await websocket.accept()
+    async def connect(
+        self,
+        websocket: WebSocket,
+        conversation_id: str,
+        last_seq: Optional[int] = None,
+        encoding: str = ENCODING_JSON,
+    ) -> ClientConnection:
+        """Accept and track a new connection, replaying events after ``last_seq`` if given.
+
+        Replay and registration happen without yielding to the event loop, so
+        no event is missed or sent twice between the two.
+        """
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if encoding == ENCODING_MSGPACK else None)
+        connection = ClientConnection(
+            websocket,
+            self.max_queue_size,
+            self.policy,
+            on_close=lambda conn: self._forget(conn.websocket, conversation_id),
+            encoding=encoding,
+        )
+        if last_seq is not None:
+            missed, complete = self.replay.since(conversation_id, last_seq)
+            if not complete:
+                # Some events are gone; the client should reload state over REST
+                data = {"last_seq": last_seq, "first_seq": missed[0].seq if missed else None}
+                timestamp = datetime.utcnow().isoformat()
+                missed.insert(0, _Outbound(_GAP_EVENT, _encode(_GAP_EVENT, data, timestamp), data, timestamp))
+            connection.replay(missed)
         if conversation_id not in self.active_connections:
-            self.active_connections[conversation_id] = set()
-        self.active_connections[conversation_id].add(websocket)
+            self._subscribe(conversation_id)
+        self.active_connections.setdefault(conversation_id, {})[websocket] = connection
+        return connection
 
     def disconnect(self, websocket: WebSocket, conversation_id: str):
-        """Remove a connection."""
-        if conversation_id in self.active_connections:
-            self.active_connections[conversation_id].discard(websocket)
-            if not self.active_connections[conversation_id]:
+        """Remove a connection and stop its writer."""
+        connection = self.active_connections.get(conversation_id, {}).get(websocket)
+        if connection is not None:
+            connection.close()
+
+    def _forget(self, websocket: WebSocket, conversation_id: str) -> None:
+        connections = self.active_connections.get(conversation_id)
+        if connections is not None:
+            connections.pop(websocket, None)
+            if not connections:
                 del self.active_connections[conversation_id]
+                self._unsubscribe_later(conversation_id)
+
+    def _subscribe(self, conversation_id: str) -> None:
+        timer = self._unsubscribe_timers.pop(conversation_id, None)
+        if timer is not None:
+            timer.cancel()  # Still subscribed from the previous client
+        else:
+            self.bus.subscribe(conversation_id)
+
+    def _unsubscribe_later(self, conversation_id: str) -> None:
+        """Keep receiving events for the replay window, so a returning client can resume."""
+        if not self.replay.enabled:
+            self.bus.unsubscribe(conversation_id)
+            return
+
+        def unsubscribe():
+            del self._unsubscribe_timers[conversation_id]
+            self.bus.unsubscribe(conversation_id)
+
+        self._unsubscribe_timers[conversation_id] = asyncio.get_running_loop().call_later(
+            self.replay.max_age, unsubscribe
+        )
+
+    def connection_count(self) -> int:
+        """Number of open connections across all conversations."""
+        return sum(len(connections) for connections in self.active_connections.values())
+
+    def queue_depth(self) -> int:
+        """Messages waiting to be written across all connections."""
+        return sum(
+            len(connection.pending)
+            for connections in self.active_connections.values()
+            for connection in connections.values()
+        )
 
     async def broadcast(self, conversation_id: str, event_type: str, data: dict):
-        """Broadcast an event to all connections for a conversation."""
-        if conversation_id not in self.active_connections:
+        """Queue an event for every connection on a conversation without waiting on sends.
+
+        Buffered stream tokens for the conversation are flushed first so
+        clients always see them before the event that follows.
+        """
+        self.flush_tokens(conversation_id)
+        self._publish(conversation_id, event_type, data)
+
+    def _has_audience(self, conversation_id: str) -> bool:
+        """Whether an event could reach anyone, now or after a reconnect."""
+        return (
+            self.replay.enabled
+            or not self.bus.local_only
+            or conversation_id in self.active_connections
+        )
+
+    def _next_seq(self, conversation_id: str) -> int:
+        # Continue from the replay log too, so a run picked up by another worker keeps counting
+        seq = max(self._sequences.get(conversation_id, 0), self.replay.last_seq(conversation_id)) + 1
+        self._sequences[conversation_id] = seq
+        self._sequences.move_to_end(conversation_id)
+        if len(self._sequences) > _MAX_TRACKED_SEQUENCES:
+            self._sequences.popitem(last=False)
+        return seq
+
+    def _publish(self, conversation_id: str, event_type: str, data: dict) -> None:
+        if self._has_audience(conversation_id):
+            self.bus.publish(
+                conversation_id,
+                event_type,
+                data,
+                datetime.utcnow().isoformat(),
+                self._next_seq(conversation_id),
+            )
+
+    def deliver(self, conversation_id: str, event_type: str, data: dict, timestamp: str, seq: int) -> None:
+        """Record an event received from the bus and queue it on this worker's connections."""
+        item = _Outbound(
+            event_type, _encode(event_type, data, timestamp, seq), data, timestamp, time.perf_counter(), seq
+        )
+        self.replay.record(conversation_id, item)
+
+        connections = self.active_connections.get(conversation_id)
+        if not connections:
             return
+        for connection in list(connections.values()):
+            connection.enqueue(item)
 
-        message = json.dumps({
-            "event_type": event_type,
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": data,
-        })
+    def _flush_interval(self, conversation_id: str) -> float:
+        """Seconds to hold tokens: the floor, stretched to the slowest client's delivery latency."""
+        connections = self.active_connections.get(conversation_id, {})
+        slowest_ms = max((c.delivery_ms for c in connections.values()), default=0.0)
+        return min(max(self.token_flush_ms, slowest_ms), self.token_max_flush_ms) / 1000
+
+    def _buffer_token(self, conversation_id: str, agent: str, token: str) -> None:
+        key = (conversation_id, agent)
+        buffer = self._token_buffers.get(key)
+        if buffer is None:
+            buffer = self._token_buffers[key] = _TokenBuffer(parts=[])
+        buffer.parts.append(token)
+        buffer.size += len(token)
 
-        dead_connections = set()
-        for connection in self.active_connections[conversation_id]:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                dead_connections.add(connection)
+        if buffer.size >= self.token_flush_chars:
+            self._flush_buffer(key)
+        elif buffer.timer is None:
+            buffer.timer = asyncio.get_running_loop().call_later(
+                self._flush_interval(conversation_id), self._flush_buffer, key
+            )
 
-        # Clean up dead connections
-        for conn in dead_connections:
-            self.active_connections[conversation_id].discard(conn)
+    def _flush_buffer(self, key: tuple[str, str]) -> None:
+        buffer = self._token_buffers.pop(key, None)
+        if buffer is None:
+            return
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+        conversation_id, agent = key
+        self._publish(conversation_id, "stream.token", {
+            "agent_name": agent,
+            "token": "".join(buffer.parts),
+        })
+
+    def flush_tokens(self, conversation_id: str, agent: Optional[str] = None) -> None:
+        """Send buffered tokens now (for one agent, or every agent in the conversation)."""
+        for key in [k for k in self._token_buffers if k[0] == conversation_id]:
+            if agent is None or key[1] == agent:
+                self._flush_buffer(key)
 
     async def send_agent_started(self, conversation_id: str, agent: str, task: str):
         """Send agent.started event."""
@@ -91,10 +566,24 @@ class ConnectionManager:
         })
 
     async def send_stream_token(self, conversation_id: str, agent: str, token: str):
-        """Send stream.token event for streaming responses."""
-        await self.broadcast(conversation_id, "stream.token", {
+        """Send stream.token event for streaming responses (coalesced per agent)."""
+        if token and self._has_audience(conversation_id):
+            self._buffer_token(conversation_id, agent, token)
+
+    async def send_agent_draft(self, conversation_id: str, agent: str, platform: str, content: str):
+        """Send agent.draft event with one platform's finished draft."""
+        await self.broadcast(conversation_id, "agent.draft", {
             "agent_name": agent,
-            "token": token,
+            "platform": platform,
+            "content": content,
+        })
+
+    async def send_agent_review(self, conversation_id: str, agent: str, platform: str, content: str):
+        """Send agent.review event with the review of one platform's draft."""
+        await self.broadcast(conversation_id, "agent.review", {
+            "agent_name": agent,
+            "platform": platform,
+            "content": content,
         })
 
     async def send_document_generated(self, conversation_id: str, document_id: str, doc_type: str, title: str):
@@ -120,19 +609,30 @@ class ConnectionManager:
 
 
 # Global connection manager instance
-manager = ConnectionManager()
+manager = ConnectionManager(bus=create_event_bus())
+telemetry.WS_CONNECTIONS.set_function(manager.connection_count)
+telemetry.WS_SEND_QUEUE_DEPTH.set_function(manager.queue_depth)
+telemetry.WS_REPLAY_BYTES.set_function(lambda: manager.replay.total_bytes)
 
 
 @websocket_router.websocket("/ws/agents/{conversation_id}")
-async def agent_updates(websocket: WebSocket, conversation_id: str):
-    """WebSocket endpoint for real-time agent updates."""
-    await manager.connect(websocket, conversation_id)
+async def agent_updates(websocket: WebSocket, conversation_id: str, last_seq: Optional[int] = None):
+    """WebSocket endpoint for real-time agent updates.
+
+    Reconnecting clients pass the ``seq`` of the last event they received as
+    ``last_seq`` to have the events they missed replayed first.
+    """
+    encoding = negotiate_encoding(websocket.scope)
+    connection = await manager.connect(websocket, conversation_id, last_seq, encoding)
     try:
         while True:
             # Keep connection alive, handle any client messages
             data = await websocket.receive_text()
             # Could handle ping/pong or client commands here
             if data == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                # Goes through the queue so it never interleaves with the writer task
+                connection.enqueue(_Outbound("pong", json.dumps({"type": "pong"}), {}))
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, conversation_id)
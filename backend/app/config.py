@@ -19,6 +19,29 @@ class Settings(BaseSettings):
     azure_openai_codex_deployment_name: str = "gpt-4o-mini"  # Code tasks fallback when codex access is unavailable
     azure_openai_textembedding_deployment_name: str = "text-embedding-3-small"
 
+    # USD per 1M [prompt, completion] tokens, keyed by deployment name; unlisted deployments cost 0
+    llm_pricing: dict[str, tuple[float, float]] = {
+        "gpt-4o": (2.50, 10.00),
+        "gpt-4o-mini": (0.15, 0.60),
+        "gpt-5.1": (1.25, 10.00),
+        "gpt-5.1-codex-max": (1.25, 10.00),
+        "gpt-5.2-chat": (1.75, 14.00),
+        "text-embedding-3-small": (0.02, 0.0),
+    }
+
+    # Model routing: "<agent>:<task>" or "<agent>" -> deployments tried in order, moving on after a
+    # 429 or timeout. Deployment names, or primary / secondary / codex; unlisted routes use "default"
+    model_routes: dict[str, list[str]] = {
+        "default": ["primary", "secondary"],
+        "orchestrator:intent": ["secondary", "primary"],  # Short structured output
+        "memory": ["secondary", "primary"],  # Summarizes brand data
+        "advisor:review": ["secondary", "primary"],  # Per-platform first pass on streamed drafts
+        "scribe": ["primary", "secondary"],
+        "orchestrator:synthesis": ["primary", "secondary"],
+    }
+    model_route_timeout: float = 120.0  # Seconds before falling back to the next deployment (a stream's first chunk)
+    model_route_cooldown: float = 30.0  # Seconds a rate-limited deployment goes last on every route
+
     # Database
     database_url: str = "sqlite+aiosqlite:///./data/oneshot.db"
 
@@ -32,6 +55,45 @@ class Settings(BaseSettings):
     agentflow_max_steps: int = 10
     agentflow_max_time: int = 300
     agentflow_verbose: bool = True
+    agent_mcp_enabled: bool = True  # Spawn MCP stdio servers (npx); off for offline benchmarks
+
+    # Local intent classifier (python setup_db.py train-intent); the LLM classifies when it is unsure
+    intent_classifier_enabled: bool = True
+    intent_model_path: str = "./data/intent_model.json"
+    intent_confidence_threshold: float = 0.15  # Cosine margin between the best and second-best intent
+    speculative_agents: list[str] = ["researcher", "memory"]  # Started while the LLM classifies intent; [] disables
+    progressive_synthesis: bool = False  # Stream section by section as agents finish; up to five synthesis calls
+    local_assembly_intents: list[str] = ["trend_research", "content_review"]  # Stitched without a synthesis call; [] disables
+
+    # Semantic response cache; entries match on intent, platforms and brand-data version
+    response_cache_enabled: bool = True
+    response_cache_ttl: int = 86400  # Seconds an entry can be reused
+    response_cache_hit_threshold: float = 0.97  # Cosine similarity to return the stored response as-is
+    response_cache_warm_threshold: float = 0.90  # Similarity to reuse the stored Wave 1 context only
+    response_cache_max_candidates: int = 200  # Most recent entries compared per lookup
+
+    # Wave 1 context memoized per topic; keys include a time bucket as wide as the agent's TTL
+    context_cache_enabled: bool = True
+    context_cache_ttl: dict[str, int] = {  # Seconds, per agent; agents not listed always run
+        "researcher": 900,  # Live trends go stale quickly
+        "analyst": 6 * 3600,
+        "memory": 7 * 86400,  # Brand data changes are caught by the brand-data version
+    }
+
+    # WebSocket fan-out
+    ws_send_queue_size: int = 256  # Outbound messages buffered per connection
+    ws_slow_consumer_policy: str = "drop_oldest"  # drop_oldest, coalesce, disconnect
+    ws_token_flush_ms: int = 40  # Minimum interval between coalesced stream.token frames
+    ws_token_max_flush_ms: int = 250  # Upper bound when slow clients stretch the interval
+    ws_token_flush_chars: int = 200  # Flush early once this many characters are buffered
+    ws_replay_max_events: int = 2000  # Recent events kept per conversation for reconnects (0 disables)
+    ws_replay_max_bytes: int = 512 * 1024  # Encoded size cap per conversation
+    ws_replay_max_total_bytes: int = 64 * 1024 * 1024  # Cap across conversations; least recent evicted
+    ws_replay_max_age: int = 900  # Seconds an event stays replayable
+
+    # Cross-worker event bus
+    event_bus_backend: str = "memory"  # memory (single worker), unix (broker on a Unix socket)
+    event_bus_socket: str = "./data/event_bus.sock"
 
     # CORS
     allowed_origins: list[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
@@ -4,13 +4,15 @@ import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.models.database import init_db
 from app.api.routes import chat, proposals, research, documents, knowledge, analytics
-from app.api.websocket import websocket_router
+from app.api.websocket import manager as ws_manager, websocket_router
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.services import telemetry
 
 logger = logging.getLogger(__name__)
 
@@ -60,8 +62,10 @@ async def lifespan(app: FastAPI):
     _enable_otel_tracing()
     await init_db()
     print("✓ Database initialized")
+    await ws_manager.bus.start()
     yield
     # Shutdown
+    await ws_manager.bus.stop()
     print("✓ Shutting down")
 
 
@@ -80,6 +84,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # REST Routes
@@ -100,6 +105,16 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus scrape endpoint (OpenMetrics when the scraper asks for it)."""
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    return Response(
+        content=telemetry.render(openmetrics),
+        media_type=telemetry.OPENMETRICS_CONTENT_TYPE if openmetrics else telemetry.PROMETHEUS_CONTENT_TYPE,
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
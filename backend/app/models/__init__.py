@@ -9,6 +9,8 @@ from app.models.database import (
     KnowledgeItem,
     Engagement,
     Metric,
+    AgentRollup,
+    LatencyHistogram,
     init_db,
     get_db,
 )
@@ -22,6 +24,8 @@ __all__ = [
     "KnowledgeItem",
     "Engagement",
     "Metric",
+    "AgentRollup",
+    "LatencyHistogram",
     "init_db",
     "get_db",
 ]
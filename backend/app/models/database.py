@@ -1,14 +1,17 @@
 """SQLAlchemy database models for OneShot."""
 
+import time
 import uuid
 from datetime import datetime
 from typing import AsyncGenerator
 
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON, Float, Integer, text
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON, Float, Integer, Index, event, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import relationship, DeclarativeBase
 
 from app.config import settings
+from app.services import telemetry
+from app.services.waterfall import record_query
 
 
 class Base(DeclarativeBase):
@@ -28,6 +31,9 @@ class Conversation(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     metadata_ = Column("metadata", JSON, default=dict)
 
+    # Keyset pagination: (sort key, id)
+    __table_args__ = (Index("ix_conversations_updated_at_id", "updated_at", "id"),)
+
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
 
 
@@ -42,6 +48,8 @@ class Message(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     metadata_ = Column("metadata", JSON, default=dict)
 
+    __table_args__ = (Index("ix_messages_conversation_created_at_id", "conversation_id", "created_at", "id"),)
+
     conversation = relationship("Conversation", back_populates="messages")
     agent_traces = relationship("AgentTrace", back_populates="message", cascade="all, delete-orphan")
 
@@ -69,6 +77,9 @@ class AgentTrace(Base):
     tool_calls = Column(JSON, default=list)      # Tool invocation log with inputs/outputs
     duration_ms = Column(Integer, nullable=True)  # Execution time in milliseconds
     parent_trace_id = Column(String, ForeignKey("agent_traces.id"), nullable=True)
+    waterfall = Column(JSON, nullable=True)      # Compact latency waterfall (root traces only)
+
+    __table_args__ = (Index("ix_agent_traces_started_at_id", "started_at", "id"),)
 
     message = relationship("Message", back_populates="agent_traces")
     parent_trace = relationship("AgentTrace", remote_side=[id], backref="child_traces")
@@ -89,6 +100,8 @@ class Document(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     metadata_ = Column("metadata", JSON, default=dict)
 
+    __table_args__ = (Index("ix_documents_created_at_id", "created_at", "id"),)
+
 
 # ============ Knowledge Base ============
 
@@ -104,8 +117,11 @@ class KnowledgeItem(Base):
     tags = Column(JSON, default=list)
     embedding = Column(JSON, nullable=True)  # Stored as list of floats
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     metadata_ = Column("metadata", JSON, default=dict)
 
+    __table_args__ = (Index("ix_knowledge_items_created_at_id", "created_at", "id"),)
+
 
 class Engagement(Base):
     """Past engagement record for reference."""
@@ -139,6 +155,85 @@ class Metric(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
 
+class AgentRollup(Base):
+    """Pre-aggregated per-agent trace totals for one hourly or daily bucket.
+
+    Maintained incrementally by the rollup service as traces finish, so the
+    analytics dashboard reads a few rows instead of scanning agent_traces.
+    """
+    __tablename__ = "agent_rollups"
+
+    granularity = Column(String, primary_key=True)  # hour, day
+    bucket_start = Column(DateTime, primary_key=True)
+    agent_name = Column(String, primary_key=True)
+    executions = Column(Integer, nullable=False, default=0)
+    successes = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    timed_executions = Column(Integer, nullable=False, default=0)  # Runs with a completion time
+    duration_ms_sum = Column(Integer, nullable=False, default=0)
+    completed_duration_ms_sum = Column(Integer, nullable=False, default=0)
+
+
+class LatencyHistogram(Base):
+    """Log-scale latency histogram bin for one series and rollup bucket.
+
+    Series are ``agent:<name>`` (``agent:orchestrator`` is the end-to-end run)
+    and ``wave:<wave>``. Only non-empty bins are stored, so a bucket is a few
+    dozen small rows and percentiles never need the raw traces.
+    """
+    __tablename__ = "latency_histograms"
+
+    series = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)  # hour, day
+    bucket_start = Column(DateTime, primary_key=True)
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# ============ Caches ============
+
+class ResponseCacheEntry(Base):
+    """A completed orchestrator run, reusable for semantically similar requests.
+
+    Entries only match requests with the same ``cache_key``: intent, platform
+    set and brand-data version. ``context`` holds the Wave 1 outputs, so a
+    near miss can warm-start and rerun only Wave 2 and synthesis.
+    """
+    __tablename__ = "response_cache"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    cache_key = Column(String, nullable=False, index=True)  # intent|platforms|brand version
+    message = Column(Text, nullable=False)
+    embedding = Column(JSON, nullable=False)
+    response = Column(Text, nullable=False)
+    context = Column(JSON, default=dict)           # Wave 1 agent -> output
+    citations = Column(JSON, default=list)
+    document_id = Column(String, nullable=True)
+    document_title = Column(String, nullable=True)
+    trace_id = Column(String, nullable=True)        # Orchestrator trace that produced it
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class ContextCacheEntry(Base):
+    """A Wave 1 agent's output, reusable for the same topic across messages.
+
+    ``cache_key`` combines the agent, normalized topic entities, platforms,
+    brand-data version and a time bucket as wide as the agent's TTL.
+    """
+    __tablename__ = "context_cache"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    cache_key = Column(String, nullable=False, index=True)
+    agent = Column(String, nullable=False)
+    result = Column(Text, nullable=False)
+    citations = Column(JSON, default=list)
+    tokens_used = Column(Integer, nullable=False, default=0)  # Spent producing it; saved on each reuse
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
 # ============ Database Setup ============
 
 engine = create_async_engine(
@@ -153,6 +248,24 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+# Start times live on the execution context, so a failed statement (no
+# after_cursor_execute) leaves nothing behind on the pooled connection
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _observe_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    ended = time.perf_counter()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    telemetry.DB_QUERY_DURATION.observe(ended - started, operation=operation)
+    record_query(statement, started, ended)
+
+
 async def init_db():
     """Initialize database tables and migrate schema for new columns."""
     async with engine.begin() as conn:
@@ -164,6 +277,7 @@ async def init_db():
             ("tool_calls", "TEXT DEFAULT '[]'"),
             ("duration_ms", "INTEGER"),
             ("parent_trace_id", "VARCHAR REFERENCES agent_traces(id)"),
+            ("waterfall", "TEXT"),
         ]
         for col_name, col_type in migrate_columns:
             try:
@@ -173,6 +287,17 @@ async def init_db():
             except Exception:
                 pass  # Column already exists
 
+        # Migrate: edit time of knowledge items, part of the brand data version
+        try:
+            await conn.execute(text("ALTER TABLE knowledge_items ADD COLUMN updated_at DATETIME"))
+        except Exception:
+            pass  # Column already exists
+
+        # Migrate: keyset pagination indexes for tables created before they existed
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                await conn.run_sync(lambda sync_conn, idx=index: idx.create(sync_conn, checkfirst=True))
+
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency for getting database sessions."""
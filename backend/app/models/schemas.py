@@ -91,6 +91,22 @@ class AgentTraceResponse(BaseModel):
         from_attributes = True
 
 
+class AgentTraceSummaryResponse(BaseModel):
+    """Sparse trace projection for list views (``fields=``)."""
+    id: str
+    agent_name: Optional[str] = None
+    task_type: Optional[str] = None
+    status: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    tokens_used: Optional[int] = None
+    error: Optional[str] = None
+    citations: Optional[list[dict[str, Any]]] = None
+    tool_calls: Optional[list[dict[str, Any]]] = None
+    duration_ms: Optional[int] = None
+    parent_trace_id: Optional[str] = None
+
+
 # ============ Document Schemas ============
 
 class DocumentCreate(BaseModel):
@@ -116,11 +132,34 @@ class DocumentResponse(BaseModel):
         from_attributes = True
 
 
+class DocumentSummaryResponse(BaseModel):
+    """Sparse document projection for list views (``fields=``).
+
+    ``size`` is the content length in characters and ``preview`` its opening
+    characters, both computed in SQL so the body is never loaded.
+    """
+    id: str
+    title: Optional[str] = None
+    doc_type: Optional[str] = None
+    content: Optional[str] = None
+    format: Optional[str] = None
+    created_at: Optional[datetime] = None
+    metadata: Optional[dict[str, Any]] = None
+    size: Optional[int] = None
+    preview: Optional[str] = None
+
+
 class ExportRequest(BaseModel):
     """Schema for document export request."""
     format: str = Field(..., pattern="^(pdf|docx|markdown|html)$")
 
 
+class RegenerateRequest(BaseModel):
+    """Schema for regenerating one platform's content in a social post."""
+    platform: str = Field(..., pattern="^(linkedin|twitter|instagram)$")
+    instruction: str = Field(..., min_length=1, max_length=2000)
+
+
 # ============ Knowledge Schemas ============
 
 class KnowledgeSearchRequest(BaseModel):
@@ -0,0 +1,41 @@
+"""Version fingerprint of the brand data agents ground their output in.
+
+Brand guidelines, past post performance and the content calendar are files
+under ``backend/data``. Brand knowledge lives in ``knowledge_items``. Caches
+of agent output include ``brand_data_version`` in their keys, so editing any
+of these stops earlier entries from matching. Knowledge edits are noticed
+through ``updated_at``, which the ORM sets; raw SQL updates must set it too.
+"""
+
+import hashlib
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import KnowledgeItem
+
+BRAND_DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+BRAND_FILES = ("brand_guidelines.md", "past_posts.json", "content_calendar.json")
+
+
+async def brand_data_version(db: AsyncSession) -> str:
+    """Short hash over brand file sizes/mtimes and the knowledge base's size and latest edit."""
+    digest = hashlib.sha1()
+    for name in BRAND_FILES:
+        try:
+            stat = (BRAND_DATA_DIR / name).stat()
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        except OSError:
+            digest.update(f"{name}:missing;".encode())
+    result = await db.execute(
+        select(
+            func.count(KnowledgeItem.id),
+            # Rows from before updated_at existed fall back to their creation time
+            func.max(func.coalesce(KnowledgeItem.updated_at, KnowledgeItem.created_at)),
+            func.sum(func.length(KnowledgeItem.content)),
+        )
+    )
+    count, latest, length = result.one()
+    digest.update(f"knowledge:{count}:{latest}:{length}".encode())
+    return digest.hexdigest()[:12]
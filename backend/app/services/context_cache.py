@@ -0,0 +1,169 @@
+"""Memoized Wave 1 context across messages and conversations.
+
+Researcher, memory and analyst outputs depend mostly on the topic, the target
+platforms and the brand data, not on the exact wording of a request. Without
+this cache, every follow-up ("make the twitter one shorter") gathers the same
+context again. Each output is stored under a key made of:
+
+    agent | normalized topic entities | platforms | brand-data version | time bucket
+
+The time bucket is ``created // ttl``, using the agent's
+``settings.context_cache_ttl``. Entries therefore go stale quickly for live
+trend research and slowly for brand memory. Brand edits change the version
+and invalidate every entry at once. A follow-up with no entities of its own
+inherits the topic of the conversation's previous request.
+"""
+
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.database import AgentTrace, ContextCacheEntry, Message
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_entities(entities: list[str]) -> str:
+    """Order- and case-insensitive form of topic entities ("#AI Launch" == "ai launch")."""
+    normalized = {_NON_WORD.sub(" ", entity.lower()).strip() for entity in entities or []}
+    return ",".join(sorted(e for e in normalized if e))
+
+
+def context_key(agent: str, entities: list[str], platforms: list[str], brand_version: str,
+                now: Optional[float] = None) -> Optional[str]:
+    """Cache key for an agent's output, or None if the agent isn't memoized."""
+    ttl = settings.context_cache_ttl.get(agent)
+    if not ttl:
+        return None
+    bucket = int((now if now is not None else time.time()) // ttl)
+    return (
+        f"{agent}|{normalize_entities(entities)}|{','.join(sorted(set(platforms or [])))}"
+        f"|{brand_version}|{bucket}"
+    )
+
+
+async def conversation_topic(db: AsyncSession, conversation_id: str,
+                             exclude_message_id: Optional[str] = None) -> list[str]:
+    """Key entities of the latest earlier request in a conversation, for topic-less follow-ups."""
+    query = (
+        select(AgentTrace.output_data)
+        .join(Message, AgentTrace.message_id == Message.id)
+        .where(Message.conversation_id == conversation_id)
+        .where(AgentTrace.agent_name == "orchestrator")
+        .where(AgentTrace.status == "completed")
+        .order_by(AgentTrace.started_at.desc())
+        .limit(5)
+    )
+    if exclude_message_id:
+        query = query.where(Message.id != exclude_message_id)
+    for output_data in (await db.execute(query)).scalars():
+        entities = ((output_data or {}).get("intent") or {}).get("key_entities")
+        if entities:
+            return list(entities)
+    return []
+
+
+class ContextCache:
+    """Looks up and stores Wave 1 agent outputs by topic."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    def enabled_for(self, message_metadata: Optional[dict]) -> bool:
+        """Whether a request may reuse context; ``{"cache": false}`` opts out."""
+        return settings.context_cache_enabled and (message_metadata or {}).get("cache", True) is not False
+
+    async def lookup(self, db: AsyncSession, agents: list[str], entities: list[str], platforms: list[str],
+                     brand_version: str) -> dict[str, ContextCacheEntry]:
+        """Fresh cached outputs for those of ``agents`` that have one."""
+        keys = {agent: key for agent in agents if (key := context_key(agent, entities, platforms, brand_version))}
+        if not keys:
+            return {}
+        try:
+            result = await db.execute(
+                select(ContextCacheEntry)
+                .where(ContextCacheEntry.cache_key.in_(keys.values()))
+                .order_by(ContextCacheEntry.created_at.desc())
+            )
+            found: dict[str, ContextCacheEntry] = {}
+            for entry in result.scalars():
+                found.setdefault(entry.agent, entry)  # Concurrent runs may store twice; newest wins
+        except Exception as e:
+            logger.warning("Context cache lookup failed: %s", e)
+            return {}
+        for agent in keys:
+            entry = found.get(agent)
+            telemetry.record_cache(f"context:{agent}", entry is not None)
+            if entry is None:
+                self.misses += 1
+                continue
+            self.hits += 1
+            self.tokens_saved += entry.tokens_used or 0
+            entry.hits = (entry.hits or 0) + 1
+        if found:
+            await db.flush()
+        return found
+
+    async def store(self, db: AsyncSession, outputs: dict[str, tuple[str, int, dict]], entities: list[str],
+                    platforms: list[str], brand_version: str) -> None:
+        """Save fresh Wave 1 ``outputs`` (agent -> result, tokens, trace data); prune stale entries."""
+        now = time.time()
+        entries = [
+            ContextCacheEntry(
+                cache_key=key,
+                agent=agent,
+                result=result,
+                citations=trace_data.get("citations", []),
+                tokens_used=tokens,
+            )
+            for agent, (result, tokens, trace_data) in outputs.items()
+            if not result.startswith("Error from")
+            and (key := context_key(agent, entities, platforms, brand_version, now))
+        ]
+        if not entries:
+            return
+        oldest = datetime.utcnow() - timedelta(seconds=max(settings.context_cache_ttl.values()))
+        try:
+            await db.execute(
+                delete(ContextCacheEntry).where(
+                    (ContextCacheEntry.created_at < oldest)
+                    | ~ContextCacheEntry.cache_key.contains(f"|{brand_version}|")
+                )
+            )
+            db.add_all(entries)
+            await db.flush()
+        except Exception as e:
+            logger.warning("Context cache store failed: %s", e)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.context_cache_enabled,
+            "ttl": settings.context_cache_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+_context_cache: ContextCache | None = None
+
+
+def get_context_cache() -> ContextCache:
+    """Get or create the context cache singleton."""
+    global _context_cache
+    if _context_cache is None:
+        _context_cache = ContextCache()
+    return _context_cache
@@ -1,5 +1,6 @@
 """Document generation service."""
 
+import re
 import uuid
 from datetime import datetime
 from typing import Optional
@@ -81,6 +82,105 @@ class DocumentService:
         return buffer.read()
 
 
+# ============ Platform sections ============
+
+PLATFORM_LABELS = {"linkedin": "LinkedIn", "twitter": "Twitter/X", "instagram": "Instagram"}
+_PLATFORM_NAMES = {
+    "linkedin": re.compile(r"linked\s*in", re.I),
+    "twitter": re.compile(r"twitter|(?<![\w-])x(?![\w-])", re.I),
+    "instagram": re.compile(r"instagram", re.I),
+}
+_PREVIEW_TAGS = {"linkedin": ("linkedin",), "twitter": ("twitter", "x"), "instagram": ("instagram",)}
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def _lines(content: str) -> list[tuple[int, str, bool]]:
+    """(offset, line, inside a fenced block) for each line, fence lines counting as inside."""
+    lines, offset, fenced = [], 0, False
+    for line in content.splitlines(keepends=True):
+        fence = bool(_FENCE.match(line))
+        lines.append((offset, line.rstrip("\n"), fenced or fence))
+        if fence:
+            fenced = not fenced
+        offset += len(line)
+    return lines
+
+
+def _preview_opening(line: str, platform: str) -> bool:
+    match = re.match(r"^\s*(?:```|~~~)platform-([\w-]+)", line)
+    return bool(match) and match.group(1).lower() in _PREVIEW_TAGS[platform]
+
+
+def find_platform_section(content: str, platform: str) -> Optional[tuple[int, int, str]]:
+    """Locate one platform's content in a social post document.
+
+    Returns ``(start, end, kind)`` character offsets, where ``kind`` is
+    ``"section"`` for a heading naming only that platform (up to the next
+    heading of the same or a higher level), or ``"preview"`` for its fenced
+    ``platform-*`` preview card. Returns None if the document has neither.
+    """
+    lines = _lines(content)
+    others = [p for p in _PLATFORM_NAMES if p != platform]
+    for index, (offset, line, fenced) in enumerate(lines):
+        heading = None if fenced else _HEADING.match(line)
+        if not heading or not _PLATFORM_NAMES[platform].search(heading.group(2)):
+            continue
+        if any(_PLATFORM_NAMES[other].search(heading.group(2)) for other in others):
+            continue
+        level = len(heading.group(1))
+        end = len(content)
+        for next_offset, next_line, next_fenced in lines[index + 1:]:
+            next_heading = None if next_fenced else _HEADING.match(next_line)
+            if next_heading and len(next_heading.group(1)) <= level:
+                end = next_offset
+                break
+        return offset, end, "section"
+    for index, (offset, line, _) in enumerate(lines):
+        if _preview_opening(line, platform):
+            end = len(content)
+            for next_offset, next_line, _ in lines[index + 1:]:
+                if _FENCE.match(next_line):
+                    end = next_offset + len(next_line) + 1
+                    break
+            return offset, min(end, len(content)), "preview"
+    return None
+
+
+def patch_platform_section(content: str, platform: str, new_content: str) -> tuple[str, str]:
+    """Replace one platform's section with ``new_content``; returns (document, how it was patched).
+
+    A heading section keeps its heading and gets ``new_content`` as its body.
+    A lone preview card is swapped for the preview card in ``new_content``.
+    With neither, a new section is appended ("appended").
+    """
+    new_content = new_content.strip()
+    found = find_platform_section(content, platform)
+    if found is None:
+        return f"{content.rstrip()}\n\n## {PLATFORM_LABELS[platform]}\n\n{new_content}\n", "appended"
+    start, end, kind = found
+    if kind == "section":
+        heading, _, _ = content[start:end].partition("\n")
+        body_lines = new_content.splitlines()
+        if body_lines and _HEADING.match(body_lines[0]):
+            body_lines = body_lines[1:]  # The section keeps its own heading
+        replacement = f"{heading}\n\n" + "\n".join(body_lines).strip() + "\n"
+    else:
+        lines = _lines(new_content)
+        card = next((i for i, (_, line, _) in enumerate(lines) if _preview_opening(line, platform)), None)
+        if card is None:
+            replacement = new_content + "\n"
+        else:
+            card_end = next(
+                (offset + len(line) for offset, line, _ in lines[card + 1:] if _FENCE.match(line)),
+                len(new_content),
+            )
+            replacement = new_content[lines[card][0]:card_end] + "\n"
+    if kind == "section" and end < len(content):
+        replacement += "\n"
+    return content[:start] + replacement + content[end:], kind
+
+
 # Singleton
 _document_service: DocumentService | None = None
 
@@ -0,0 +1,329 @@
+"""Pub/sub transport for agent events across uvicorn workers.
+
+The WebSocket ``ConnectionManager`` publishes every event through a bus and
+delivers whatever the bus hands back to its local connections. The default
+in-process bus simply loops events back, which is all a single worker needs.
+
+With ``EVENT_BUS_BACKEND=unix`` every worker connects to a small broker on a
+Unix domain socket. The first worker to start (or a standalone
+``python -m app.services.event_bus``) hosts the broker, elected through a lock
+file. Workers subscribe to the conversations their clients are watching, and
+the broker relays each frame to the sender and to the workers subscribed to
+its conversation, in the order it received them. Each worker publishes over a
+single ordered stream, so all workers see a conversation's events in the
+same order. The broker also keeps each conversation's ``seq`` increasing
+when a run moves to a worker that has not seen its earlier events.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# deliver(conversation_id, event_type, data, timestamp, seq)
+Deliver = Callable[[str, str, dict, str, int], None]
+
+EVENT_BUS_BACKENDS = ("memory", "unix")
+
+# Drop a broker subscriber whose unsent backlog exceeds this many bytes
+_SUBSCRIBER_BUFFER_LIMIT = 8 * 1024 * 1024
+
+# Seconds between reconnect attempts when the broker goes away
+_RECONNECT_DELAY = 0.5
+
+# Conversations whose last relayed seq the broker remembers
+_MAX_TRACKED_SEQUENCES = 10_000
+
+
+class EventBus:
+    """Base class: fan events out to every worker's local connections."""
+
+    # True when every subscriber lives in this process
+    local_only = True
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    def bind(self, deliver: Deliver) -> None:
+        """Set the callback that hands received events to local connections."""
+        self._deliver = deliver
+
+    def subscribe(self, conversation_id: str) -> None:
+        """Receive events other workers publish for a conversation."""
+
+    def unsubscribe(self, conversation_id: str) -> None:
+        """Stop receiving another worker's events for a conversation."""
+
+    async def start(self) -> None:
+        """Open any network connections (no-op for in-process delivery)."""
+
+    async def stop(self) -> None:
+        """Close network connections."""
+
+    def publish(
+        self, conversation_id: str, event_type: str, data: dict, timestamp: str, seq: int
+    ) -> None:
+        """Send an event to all workers without blocking."""
+        raise NotImplementedError
+
+
+class InProcessEventBus(EventBus):
+    """Deliver events straight back to this process's connections."""
+
+    def publish(
+        self, conversation_id: str, event_type: str, data: dict, timestamp: str, seq: int
+    ) -> None:
+        if self._deliver is not None:
+            self._deliver(conversation_id, event_type, data, timestamp, seq)
+
+
+class UnixSocketBroker:
+    """Relay newline-delimited JSON frames to subscribed workers, in arrival order.
+
+    Besides event frames, workers send ``{"subscribe": id}`` and
+    ``{"unsubscribe": id}`` to choose the conversations they receive. A
+    frame always goes back to its sender too, whose own clients and replay
+    log need it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: dict[asyncio.StreamWriter, set[str]] = {}
+        self._topics: dict[str, set[asyncio.StreamWriter]] = {}
+        self._sequences: OrderedDict[str, int] = OrderedDict()
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Stale socket from a dead broker; we hold the lock
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info("Event bus broker listening on %s", self.path)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._subscribers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._subscribers[writer] = set()
+        try:
+            while line := await reader.readline():
+                self._dispatch(writer, line)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._drop(writer)
+
+    def _dispatch(self, sender: asyncio.StreamWriter, line: bytes) -> None:
+        try:
+            frame = json.loads(line)
+        except ValueError:
+            logger.warning("Discarding malformed event bus frame")
+            return
+        topics = self._subscribers.get(sender)
+        if topics is None:
+            return  # Sender was dropped for falling behind
+        if "subscribe" in frame:
+            topics.add(frame["subscribe"])
+            self._topics.setdefault(frame["subscribe"], set()).add(sender)
+        elif "unsubscribe" in frame:
+            self._leave(sender, frame["unsubscribe"])
+        else:
+            conversation_id = frame["conversation_id"]
+            if self._stamp(frame):
+                line = json.dumps(frame).encode("utf-8") + b"\n"
+            self._fan_out(line, self._topics.get(conversation_id, set()) | {sender})
+
+    def _stamp(self, frame: dict) -> bool:
+        """Keep a conversation's seq increasing across publishers; True if the frame changed."""
+        conversation_id = frame["conversation_id"]
+        last = self._sequences.get(conversation_id, 0)
+        changed = frame["seq"] <= last
+        if changed:
+            frame["seq"] = last + 1
+        self._sequences[conversation_id] = frame["seq"]
+        self._sequences.move_to_end(conversation_id)
+        if len(self._sequences) > _MAX_TRACKED_SEQUENCES:
+            self._sequences.popitem(last=False)
+        return changed
+
+    def _fan_out(self, line: bytes, writers: set[asyncio.StreamWriter]) -> None:
+        for writer in writers:
+            if writer.transport.get_write_buffer_size() > _SUBSCRIBER_BUFFER_LIMIT:
+                logger.warning("Dropping event bus subscriber that stopped reading")
+                self._drop(writer)
+                continue
+            writer.write(line)
+
+    def _leave(self, writer: asyncio.StreamWriter, conversation_id: str) -> None:
+        self._subscribers.get(writer, set()).discard(conversation_id)
+        writers = self._topics.get(conversation_id)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self._topics[conversation_id]
+
+    def _drop(self, writer: asyncio.StreamWriter) -> None:
+        for conversation_id in list(self._subscribers.get(writer, ())):
+            self._leave(writer, conversation_id)
+        self._subscribers.pop(writer, None)
+        writer.close()
+
+
+class UnixSocketEventBus(EventBus):
+    """Publish to and receive from a :class:`UnixSocketBroker`, hosting it if none is running."""
+
+    local_only = False
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.broker: Optional[UnixSocketBroker] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._topics: set[str] = set()
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lock_file = None
+
+    async def start(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.create_task(self._run())
+        await self._connected.wait()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.broker is not None:
+            await self.broker.stop()
+            self.broker = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def subscribe(self, conversation_id: str) -> None:
+        self._topics.add(conversation_id)
+        self._send({"subscribe": conversation_id})
+
+    def unsubscribe(self, conversation_id: str) -> None:
+        self._topics.discard(conversation_id)
+        self._send({"unsubscribe": conversation_id})
+
+    def _send(self, frame: dict) -> None:
+        # While disconnected, subscriptions are replayed on reconnect
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(json.dumps(frame).encode("utf-8") + b"\n")
+
+    def publish(
+        self, conversation_id: str, event_type: str, data: dict, timestamp: str, seq: int
+    ) -> None:
+        if self._writer is None or self._writer.is_closing():
+            # Broker unreachable: local clients still get the event
+            logger.warning("Event bus disconnected; delivering %s locally only", event_type)
+            if self._deliver is not None:
+                self._deliver(conversation_id, event_type, data, timestamp, seq)
+            return
+        frame = json.dumps({
+            "conversation_id": conversation_id,
+            "event_type": event_type,
+            "timestamp": timestamp,
+            "seq": seq,
+            "data": data,
+        })
+        self._writer.write(frame.encode("utf-8") + b"\n")
+
+    async def _run(self) -> None:
+        """Connect (electing a broker host if needed), read frames, reconnect on loss."""
+        while True:
+            try:
+                reader, self._writer = await self._connect()
+            except OSError as e:
+                logger.warning("Event bus connect failed: %s", e)
+                await asyncio.sleep(_RECONNECT_DELAY)
+                continue
+
+            for conversation_id in self._topics:
+                self._send({"subscribe": conversation_id})
+            self._connected.set()
+            try:
+                while line := await reader.readline():
+                    self._receive(line)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            self._writer.close()
+            self._writer = None
+            logger.warning("Event bus broker connection lost; reconnecting")
+            await asyncio.sleep(_RECONNECT_DELAY)
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        try:
+            return await asyncio.open_unix_connection(self.path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if self.broker is None and self._acquire_broker_lock():
+                self.broker = UnixSocketBroker(self.path)
+                await self.broker.start()
+            return await asyncio.open_unix_connection(self.path)
+
+    def _acquire_broker_lock(self) -> bool:
+        """Become the broker host if no other live process holds the lock."""
+        lock_file = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _receive(self, line: bytes) -> None:
+        try:
+            frame = json.loads(line)
+        except ValueError:
+            logger.warning("Discarding malformed event bus frame")
+            return
+        if self._deliver is not None:
+            self._deliver(
+                frame["conversation_id"],
+                frame["event_type"],
+                frame["data"],
+                frame["timestamp"],
+                frame["seq"],
+            )
+
+
+def create_event_bus() -> EventBus:
+    """Build the event bus selected by ``EVENT_BUS_BACKEND``."""
+    backend = settings.event_bus_backend
+    if backend == "memory":
+        return InProcessEventBus()
+    if backend == "unix":
+        return UnixSocketEventBus(settings.event_bus_socket)
+    raise ValueError(f"Unknown event bus backend: {backend}")
+
+
+if __name__ == "__main__":
+    # Run a standalone broker so no web worker has to host it
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(UnixSocketBroker(settings.event_bus_socket).serve_forever())
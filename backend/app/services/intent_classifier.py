@@ -0,0 +1,352 @@
+"""Local intent classifier for chat messages.
+
+Each ``process_message`` run used to start with an ``INTENT_SCHEMA``
+structured-output call, a full model round trip before any agent could
+start. This service answers most of those locally, in microseconds, with a
+TF-IDF nearest-centroid model trained offline on the intents the LLM
+assigned to earlier messages. The orchestrator records each intent on its
+trace, and ``python setup_db.py train-intent`` trains a model from those
+traces.
+
+``primary_intent`` comes from the model. ``target_platforms`` and
+``key_entities`` come from the message text, and ``required_agents`` is the
+set the LLM most often chose for that intent. A prediction is used only when
+its confidence (the cosine-similarity margin between the best and
+second-best centroid) reaches ``settings.intent_confidence_threshold``.
+Below that, or with no model, the orchestrator falls back to the LLM.
+"""
+
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.database import AgentTrace
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION = 1
+MIN_TRAINING_EXAMPLES = 20
+_FOLDS = 5
+_MAX_FEATURES = 20000
+
+ALL_PLATFORMS = ["linkedin", "twitter", "instagram"]
+_PLATFORM_PATTERNS = {
+    "linkedin": re.compile(r"\blinked\s?in\b", re.I),
+    "twitter": re.compile(r"\b(twitter|tweets?|x\.com|x thread|on x)\b", re.I),
+    "instagram": re.compile(r"\b(instagram|insta|ig|reels?)\b", re.I),
+}
+_TOKEN = re.compile(r"[a-z0-9']+")
+_ENTITY = re.compile(r"#\w+|\"([^\"]{2,60})\"|\b([A-Z][\w&'-]*(?:\s+[A-Z][\w&'-]*)*)")
+_ENTITY_STOPWORDS = frozenset(
+    "I A An The Write Create Draft Plan Review Research What How Why When Can Could Please Give Make Help "
+    "Show Tell List Find Generate Analyze Summarize LinkedIn Twitter Instagram".split()
+)
+
+
+# ============ Features ============
+
+
+def _terms(message: str) -> list[str]:
+    words = _TOKEN.findall(message.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def detect_platforms(message: str) -> list[str]:
+    """Platforms named in the message; all of them when none are."""
+    found = [platform for platform, pattern in _PLATFORM_PATTERNS.items() if pattern.search(message)]
+    return found or list(ALL_PLATFORMS)
+
+
+def extract_entities(message: str, limit: int = 8) -> list[str]:
+    """Hashtags, quoted phrases and capitalized names, in order of appearance."""
+    entities: list[str] = []
+    for match in _ENTITY.finditer(message):
+        words = (match.group(1) or match.group(2) or match.group(0)).split()
+        while words and words[0] in _ENTITY_STOPWORDS:
+            words.pop(0)  # "Write LinkedIn" -> nothing, "Review Contoso" -> "Contoso"
+        entity = " ".join(words)
+        if not entity or entity in _ENTITY_STOPWORDS or entity in entities:
+            continue
+        entities.append(entity)
+        if len(entities) == limit:
+            break
+    return entities
+
+
+# ============ Model ============
+
+
+@dataclass
+class IntentPrediction:
+    """One local classification; ``intent`` matches ``INTENT_SCHEMA``."""
+    intent: dict
+    confidence: float
+    confident: bool
+    elapsed_us: float
+
+
+class IntentModel:
+    """TF-IDF vectors with one L2-normalized centroid per intent."""
+
+    def __init__(self, vocabulary: dict[str, int], idf: np.ndarray, labels: list[str],
+                 centroids: np.ndarray, agents: dict[str, list[str]], metrics: Optional[dict] = None,
+                 trained_at: Optional[str] = None):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.labels = labels
+        self.centroids = centroids
+        self.agents = agents
+        self.metrics = metrics or {}
+        self.trained_at = trained_at
+
+    @classmethod
+    def fit(cls, messages: list[str], labels: list[str], agents: Optional[dict[str, list[str]]] = None) -> "IntentModel":
+        document_frequency: Counter = Counter()
+        for message in messages:
+            document_frequency.update(set(_terms(message)))
+        # Terms seen in one message only add noise; keep the most common up to the cap
+        common = [term for term, count in document_frequency.most_common(_MAX_FEATURES) if count > 1]
+        vocabulary = {term: index for index, term in enumerate(common)}
+        idf = np.array(
+            [math.log((1 + len(messages)) / (1 + document_frequency[term])) + 1 for term in common]
+        )
+        model = cls(vocabulary, idf, sorted(set(labels)), np.zeros((0, len(common))), agents or {})
+        vectors = np.vstack([model.vectorize(message) for message in messages]) if messages else np.zeros((0, 0))
+        centroids = []
+        for label in model.labels:
+            centroid = vectors[[i for i, value in enumerate(labels) if value == label]].mean(axis=0)
+            norm = np.linalg.norm(centroid)
+            centroids.append(centroid / norm if norm else centroid)
+        model.centroids = np.vstack(centroids)
+        return model
+
+    def vectorize(self, message: str) -> np.ndarray:
+        vector = np.zeros(len(self.vocabulary))
+        for term, count in Counter(_terms(message)).items():
+            index = self.vocabulary.get(term)
+            if index is not None:
+                vector[index] = (1 + math.log(count)) * self.idf[index]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def scores(self, message: str) -> np.ndarray:
+        """Cosine similarity of the message to each intent centroid."""
+        return self.centroids @ self.vectorize(message)
+
+    def predict(self, message: str) -> tuple[str, float]:
+        """Best intent and its confidence: the margin over the runner-up."""
+        scores = self.scores(message)
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        runner_up = float(scores[order[1]]) if len(order) > 1 else 0.0
+        return self.labels[order[0]], max(best - runner_up, 0.0)
+
+    def to_dict(self) -> dict:
+        return {
+            "v": MODEL_VERSION,
+            "trained_at": self.trained_at,
+            "labels": self.labels,
+            "vocabulary": sorted(self.vocabulary, key=self.vocabulary.get),
+            "idf": [round(float(value), 6) for value in self.idf],
+            "centroids": [[round(float(value), 6) for value in row] for row in self.centroids],
+            "agents": self.agents,
+            "metrics": self.metrics,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IntentModel":
+        if data.get("v") != MODEL_VERSION:
+            raise ValueError(f"Unsupported intent model version: {data.get('v')}")
+        return cls(
+            vocabulary={term: index for index, term in enumerate(data["vocabulary"])},
+            idf=np.array(data["idf"]),
+            labels=data["labels"],
+            centroids=np.array(data["centroids"]),
+            agents=data["agents"],
+            metrics=data.get("metrics"),
+            trained_at=data.get("trained_at"),
+        )
+
+
+# ============ Training ============
+
+
+def evaluate(messages: list[str], labels: list[str], threshold: float, folds: int = _FOLDS) -> dict:
+    """Cross-validated accuracy overall and on the predictions confident enough to use."""
+    predictions: list[tuple[str, float]] = []
+    truths: list[str] = []
+    for fold in range(folds):
+        train = [i for i in range(len(messages)) if i % folds != fold]
+        test = [i for i in range(len(messages)) if i % folds == fold]
+        if not test or len({labels[i] for i in train}) < 2:
+            continue
+        model = IntentModel.fit([messages[i] for i in train], [labels[i] for i in train])
+        for i in test:
+            predictions.append(model.predict(messages[i]))
+            truths.append(labels[i])
+    confident = [(p, t) for (p, c), t in zip(predictions, truths) if c >= threshold]
+    total = len(predictions)
+    return {
+        "examples": len(messages),
+        "threshold": threshold,
+        "accuracy": round(sum(p == t for (p, _), t in zip(predictions, truths)) / total, 4) if total else None,
+        "coverage": round(len(confident) / total, 4) if total else None,
+        "accuracy_when_confident": round(sum(p == t for p, t in confident) / len(confident), 4) if confident else None,
+        "by_intent": dict(Counter(labels)),
+    }
+
+
+def train(examples: list[tuple[str, dict]], threshold: Optional[float] = None) -> IntentModel:
+    """Fit a model on (message, LLM intent) pairs and attach cross-validated metrics."""
+    if len(examples) < MIN_TRAINING_EXAMPLES:
+        raise ValueError(f"Need at least {MIN_TRAINING_EXAMPLES} labelled messages, have {len(examples)}")
+    messages = [message for message, _ in examples]
+    labels = [intent["primary_intent"] for _, intent in examples]
+    if len(set(labels)) < 2:
+        raise ValueError("Need examples of at least two intents")
+
+    agent_sets: dict[str, Counter] = {}
+    for _, intent in examples:
+        agent_sets.setdefault(intent["primary_intent"], Counter())[tuple(intent.get("required_agents") or ())] += 1
+    agents = {label: list(counter.most_common(1)[0][0]) for label, counter in agent_sets.items()}
+
+    threshold = settings.intent_confidence_threshold if threshold is None else threshold
+    model = IntentModel.fit(messages, labels, agents)
+    model.metrics = evaluate(messages, labels, threshold)
+    model.trained_at = datetime.utcnow().isoformat()
+    return model
+
+
+async def load_training_examples(db: AsyncSession, limit: int = 5000) -> list[tuple[str, dict]]:
+    """(message, intent) pairs from orchestrator traces whose intent the LLM decided."""
+    result = await db.execute(
+        select(AgentTrace.input_data, AgentTrace.output_data)
+        .where(AgentTrace.agent_name == "orchestrator", AgentTrace.status == "completed")
+        .order_by(AgentTrace.started_at.desc())
+        .limit(limit)
+    )
+    examples = []
+    for input_data, output_data in result.all():
+        message = (input_data or {}).get("message")
+        intent = (output_data or {}).get("intent")
+        if message and intent and (output_data or {}).get("intent_source") == "llm":
+            examples.append((message, intent))
+    return examples
+
+
+# ============ Service ============
+
+
+class IntentClassifier:
+    """Serves the trained model and tracks how often it avoids the LLM."""
+
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = Path(model_path or settings.intent_model_path)
+        self.model: Optional[IntentModel] = None
+        self._loaded_mtime: Optional[float] = None
+        self.local = 0          # Answered locally
+        self.fallbacks = 0      # Sent to the LLM (no model or low confidence)
+        self.fallback_agreed = 0  # ...where the local guess matched the LLM anyway
+
+    def _load(self) -> None:
+        """(Re)load the model file if it changed since the last load."""
+        try:
+            mtime = self.model_path.stat().st_mtime
+        except OSError:
+            self.model = None
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            self.model = IntentModel.from_dict(json.loads(self.model_path.read_text()))
+            self._loaded_mtime = mtime
+            logger.info("Loaded intent model trained %s (%s)", self.model.trained_at, self.model.metrics)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not load intent model %s: %s", self.model_path, e)
+            self.model = None
+
+    def save(self, model: IntentModel) -> None:
+        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        self.model_path.write_text(json.dumps(model.to_dict(), separators=(",", ":")))
+        self.model, self._loaded_mtime = model, self.model_path.stat().st_mtime
+
+    def classify(self, message: str) -> Optional[IntentPrediction]:
+        """Classify locally; ``None`` when disabled or no model is trained."""
+        if not settings.intent_classifier_enabled:
+            return None
+        self._load()
+        if self.model is None:
+            return None
+        started = time.perf_counter()
+        label, confidence = self.model.predict(message)
+        intent = {
+            "primary_intent": label,
+            "target_platforms": detect_platforms(message),
+            "required_agents": list(self.model.agents.get(label, [])),
+            "key_entities": extract_entities(message),
+            "task_description": message.strip(),
+        }
+        return IntentPrediction(
+            intent=intent,
+            confidence=round(confidence, 4),
+            confident=confidence >= settings.intent_confidence_threshold,
+            elapsed_us=round((time.perf_counter() - started) * 1e6, 1),
+        )
+
+    def record(self, prediction: Optional[IntentPrediction], llm_intent: Optional[dict] = None) -> None:
+        """Count a local answer, or a fallback with the intent the LLM returned."""
+        if llm_intent is None:
+            self.local += 1
+            telemetry.INTENT_CLASSIFICATIONS.inc(source="local")
+            return
+        self.fallbacks += 1
+        telemetry.INTENT_CLASSIFICATIONS.inc(source="llm")
+        if prediction is not None and prediction.intent["primary_intent"] == llm_intent.get("primary_intent"):
+            self.fallback_agreed += 1
+
+    def stats(self) -> dict:
+        self._load()
+        total = self.local + self.fallbacks
+        return {
+            "enabled": settings.intent_classifier_enabled,
+            "threshold": settings.intent_confidence_threshold,
+            "model": {
+                "trained_at": self.model.trained_at,
+                "labels": self.model.labels,
+                "features": len(self.model.vocabulary),
+                **self.model.metrics,
+            } if self.model else None,
+            "live": {
+                "requests": total,
+                "local": self.local,
+                "llm": self.fallbacks,
+                "hit_rate": round(self.local / total, 4) if total else None,
+                # How often the LLM agreed with a guess too unsure to use; high means the threshold is too strict
+                "fallback_agreement": round(self.fallback_agreed / self.fallbacks, 4) if self.fallbacks else None,
+            },
+        }
+
+
+# Singleton instance
+_intent_classifier: IntentClassifier | None = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Get or create the intent classifier singleton."""
+    global _intent_classifier
+    if _intent_classifier is None:
+        _intent_classifier = IntentClassifier()
+    return _intent_classifier
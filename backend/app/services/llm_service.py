@@ -1,18 +1,30 @@
 """Azure OpenAI LLM Service wrapper."""
 
+import asyncio
+import contextlib
 import json
-from typing import AsyncIterator, Any
+import time
+from typing import AsyncIterator, Any, Optional
 
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from openai import AsyncAzureOpenAI
 
 from app.config import settings
+from app.services import telemetry
+from app.services.model_router import FALLBACK_ERRORS, get_model_router
+from app.services.token_usage import TokenUsage, record_usage
 
 _AZURE_COGSERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
 
 
 def _build_azure_openai_client() -> AsyncAzureOpenAI:
-    """Build an AsyncAzureOpenAI client using DefaultAzureCredential."""
+    """Build an AsyncAzureOpenAI client using the API key if set, else DefaultAzureCredential."""
+    if settings.azure_openai_api_key:
+        return AsyncAzureOpenAI(
+            azure_endpoint=settings.azure_openai_endpoint,
+            api_key=settings.azure_openai_api_key,
+            api_version=settings.azure_openai_api_version,
+        )
     credential = DefaultAzureCredential()
     token_provider = get_bearer_token_provider(credential, _AZURE_COGSERVICES_SCOPE)
     return AsyncAzureOpenAI(
@@ -24,9 +36,41 @@ def _build_azure_openai_client() -> AsyncAzureOpenAI:
 
 class LLMResponse:
     """Response wrapper that includes content and token usage."""
-    def __init__(self, content: str, tokens_used: int = 0):
+    def __init__(self, content: str, tokens_used: int = 0, usage: TokenUsage | None = None):
         self.content = content
         self.tokens_used = tokens_used
+        self.usage = usage or TokenUsage()
+
+
+def _record_usage(deployment: str, response) -> TokenUsage:
+    """Account for the prompt/completion tokens in a response's (or final stream chunk's) usage block."""
+    usage = getattr(response, "usage", None)
+    if not usage:
+        return TokenUsage()
+    return record_usage(
+        deployment,
+        getattr(usage, "prompt_tokens", None),
+        getattr(usage, "completion_tokens", None),
+    )
+
+
+async def _first_chunk(stream) -> AsyncIterator:
+    """Wait for a stream's first chunk; returns an iterator that still yields it."""
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BaseException:
+        await stream.close()  # Timed out or failed before the first chunk; drop the connection
+        raise
+
+    async def chunks():
+        if first is not None:
+            yield first
+        async for chunk in stream:
+            yield chunk
+
+    return chunks()
 
 
 class LLMService:
@@ -39,8 +83,55 @@ class LLMService:
         self.gpt5_deployment = settings.azure_openai_gpt5_deployment_name  # gpt-5.1
         self.codex_deployment = settings.azure_openai_codex_deployment_name  # gpt-5.1-codex-max
         self.embedding_deployment = settings.azure_openai_textembedding_deployment_name
-        # Track total tokens for current session
-        self.last_tokens_used = 0
+
+    async def _create(
+        self, method: str, route: Optional[str], model: Optional[str], **kwargs
+    ) -> tuple[str, Any, TokenUsage]:
+        """One chat completion on ``route``'s deployments, moving on after a fallback error.
+
+        An explicit ``model`` bypasses the routing policy. Returns the
+        deployment that answered, its response and, except for streams (whose
+        usage arrives with the last chunk), the recorded token usage. A
+        stream is returned once its first chunk has arrived, so the route
+        timeout covers time to first token.
+        """
+        router = get_model_router()
+        deployments = [model] if model else router.deployments(route)
+        streaming = kwargs.get("stream", False)
+
+        async def call(client, deployment: str):
+            response = await client.chat.completions.create(model=deployment, **kwargs)
+            return await _first_chunk(response) if streaming else response
+
+        for index, deployment in enumerate(deployments):
+            last = index == len(deployments) - 1
+            # The client's own retries (429, 5xx, connection) would only delay moving to the next deployment
+            client = self.client if last else self.client.with_options(max_retries=0)
+            started = time.perf_counter()
+            try:
+                # A stream's call is timed by stream() until it is drained
+                with contextlib.nullcontext() if streaming else telemetry.llm_call(deployment, method):
+                    # Only time out when there's a deployment left to try; the last one gets the client's own timeout
+                    response = await asyncio.wait_for(
+                        call(client, deployment), None if last else settings.model_route_timeout
+                    )
+            except Exception as e:
+                if streaming:
+                    telemetry.LLM_CALLS.inc(deployment=deployment, method=method, status="error")
+                fallback = not last and isinstance(e, FALLBACK_ERRORS)
+                if isinstance(e, FALLBACK_ERRORS):
+                    router.failed(route, deployment, e)
+                router.observe(route, deployment, time.perf_counter() - started,
+                               outcome="fallback" if fallback else "error")
+                if not fallback:
+                    raise
+                continue
+            if streaming:
+                return deployment, response, TokenUsage()
+            usage = _record_usage(deployment, response)
+            router.observe(route, deployment, time.perf_counter() - started, usage)
+            return deployment, response, usage
+        raise RuntimeError(f"No deployments configured for route {route!r}")
 
     async def complete(
         self,
@@ -49,6 +140,7 @@ class LLMService:
         temperature: float = 1.0,  # GPT-5.x only supports temperature=1
         max_tokens: int = 4096,
         model: str = None,
+        route: str = None,
         **kwargs,
     ) -> str:
         """Generate a completion from the LLM."""
@@ -57,19 +149,12 @@ class LLMService:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
 
-        deployment = model or self.chat_deployment
-
-        response = await self.client.chat.completions.create(
-            model=deployment,
+        _, response, _ = await self._create(
+            "complete", route, model,
             messages=messages,
             max_completion_tokens=max_tokens,  # GPT-5.x uses max_completion_tokens
             **kwargs,
         )
-
-        # Track token usage
-        if response.usage:
-            self.last_tokens_used = response.usage.total_tokens
-        
         return response.choices[0].message.content
 
     async def complete_with_usage(
@@ -79,6 +164,7 @@ class LLMService:
         temperature: float = 1.0,
         max_tokens: int = 4096,
         model: str = None,
+        route: str = None,
         **kwargs,
     ) -> LLMResponse:
         """Generate a completion and return with token usage."""
@@ -87,19 +173,13 @@ class LLMService:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
 
-        deployment = model or self.chat_deployment
-
-        response = await self.client.chat.completions.create(
-            model=deployment,
+        _, response, usage = await self._create(
+            "complete_with_usage", route, model,
             messages=messages,
             max_completion_tokens=max_tokens,
             **kwargs,
         )
-
-        tokens = response.usage.total_tokens if response.usage else 0
-        self.last_tokens_used = tokens
-        
-        return LLMResponse(response.choices[0].message.content, tokens)
+        return LLMResponse(response.choices[0].message.content, usage.total_tokens, usage)
 
     async def complete_messages(
         self,
@@ -107,18 +187,16 @@ class LLMService:
         temperature: float = 1.0,  # GPT-5.x only supports temperature=1
         max_tokens: int = 4096,
         model: str = None,
+        route: str = None,
         **kwargs,
     ) -> str:
         """Generate a completion from a list of messages."""
-        deployment = model or self.chat_deployment
-
-        response = await self.client.chat.completions.create(
-            model=deployment,
+        _, response, _ = await self._create(
+            "complete_messages", route, model,
             messages=messages,
             max_completion_tokens=max_tokens,  # GPT-5.x uses max_completion_tokens
             **kwargs,
         )
-
         return response.choices[0].message.content
 
     async def stream(
@@ -126,26 +204,40 @@ class LLMService:
         prompt: str,
         system_prompt: str = None,
         model: str = None,
+        route: str = None,
         **kwargs,
     ) -> AsyncIterator[str]:
-        """Stream a completion token by token."""
+        """Stream a completion token by token.
+
+        Asks for ``include_usage`` so the final chunk carries the token counts,
+        which are recorded once the stream is drained. Routing falls back to
+        another deployment only before the stream starts.
+        """
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
 
-        deployment = model or self.chat_deployment
-
-        stream = await self.client.chat.completions.create(
-            model=deployment,
+        started = time.perf_counter()
+        deployment, stream, _ = await self._create(
+            "stream", route, model,
             messages=messages,
             stream=True,
+            stream_options={"include_usage": True},
             **kwargs,
         )
-
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        usage: Optional[TokenUsage] = None
+        outcome = "error"
+        try:
+            with telemetry.llm_call(deployment, "stream", started):
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    elif getattr(chunk, "usage", None):
+                        usage = _record_usage(deployment, chunk)
+            outcome = "ok"
+        finally:
+            get_model_router().observe(route, deployment, time.perf_counter() - started, usage, outcome)
 
     async def stream_with_callback(
         self,
@@ -175,18 +267,22 @@ class LLMService:
 
     async def embed(self, text: str) -> list[float]:
         """Generate embeddings for text."""
-        response = await self.client.embeddings.create(
-            model=self.embedding_deployment,
-            input=text,
-        )
+        with telemetry.llm_call(self.embedding_deployment, "embed"):
+            response = await self.client.embeddings.create(
+                model=self.embedding_deployment,
+                input=text,
+            )
+        _record_usage(self.embedding_deployment, response)
         return response.data[0].embedding
 
     async def embed_batch(self, texts: list[str]) -> list[list[float]]:
         """Generate embeddings for multiple texts."""
-        response = await self.client.embeddings.create(
-            model=self.embedding_deployment,
-            input=texts,
-        )
+        with telemetry.llm_call(self.embedding_deployment, "embed_batch"):
+            response = await self.client.embeddings.create(
+                model=self.embedding_deployment,
+                input=texts,
+            )
+        _record_usage(self.embedding_deployment, response)
         return [item.embedding for item in response.data]
 
     async def structured_output(
@@ -195,6 +291,7 @@ class LLMService:
         output_schema: dict,
         system_prompt: str = None,
         model: str = None,
+        route: str = None,
     ) -> dict:
         """Get structured JSON output using response_format."""
         messages = []
@@ -202,21 +299,14 @@ class LLMService:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
 
-        deployment = model or self.chat_deployment
-
-        response = await self.client.chat.completions.create(
-            model=deployment,
+        _, response, _ = await self._create(
+            "structured_output", route, model,
             messages=messages,
             response_format={
                 "type": "json_schema",
                 "json_schema": output_schema,
             },
         )
-
-        # Track token usage
-        if response.usage:
-            self.last_tokens_used = response.usage.total_tokens
-
         return json.loads(response.choices[0].message.content)
 
     async def complete_with_tools(
@@ -224,16 +314,12 @@ class LLMService:
         messages: list[dict],
         tools: list[dict],
         model: str = None,
+        route: str = None,
         **kwargs,
     ) -> dict:
         """Generate completion with tool calling support."""
-        deployment = model or self.chat_deployment
-
-        response = await self.client.chat.completions.create(
-            model=deployment,
-            messages=messages,
-            tools=tools,
-            **kwargs,
+        _, response, _ = await self._create(
+            "complete_with_tools", route, model, messages=messages, tools=tools, **kwargs
         )
 
         choice = response.choices[0]
@@ -0,0 +1,186 @@
+"""Config-driven choice of model deployment per agent and task.
+
+``settings.model_routes`` maps a route to the deployments to try, in order.
+A route is ``"<agent>:<task>"`` or ``"<agent>"``, e.g.
+``"orchestrator:intent"``, ``"advisor:review"`` or ``"scribe"``. A call
+uses the most specific route configured, then its agent's route, then
+``"default"``. Entries are deployment names, or ``primary``, ``secondary``
+and ``codex`` for the configured chat, GPT-5 and codex deployments.
+
+A call answered with 429 or a 5xx, that can't connect, or that gets no
+response (for a stream, no first chunk) within
+``settings.model_route_timeout`` while another deployment remains, moves
+on to the route's next deployment.
+The failing deployment is also moved to the back of every route for
+``settings.model_route_cooldown`` seconds (or its ``Retry-After``), so
+concurrent calls don't keep hitting it. ``stats`` reports calls,
+fallbacks, latency, tokens and cost per route, for tuning the policy
+against real traffic.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+import openai
+
+from app.config import settings
+from app.services import telemetry
+from app.services.token_usage import TokenUsage, cost_usd
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean "try another deployment" rather than "this request is wrong".
+# Non-last attempts run without client retries, so transient 5xx and
+# connection errors must fall back too. APIConnectionError covers APITimeoutError.
+FALLBACK_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    asyncio.TimeoutError,
+)
+
+_LATENCY_WINDOW = 500  # Recent calls per route kept for latency percentiles
+
+
+def deployment_aliases() -> dict[str, str]:
+    return {
+        "primary": settings.azure_openai_deployment_name,
+        "secondary": settings.azure_openai_gpt5_deployment_name,
+        "codex": settings.azure_openai_codex_deployment_name,
+    }
+
+
+def is_fallback_error(error: BaseException) -> bool:
+    """Whether an error (or one it was raised from, e.g. inside MAF) means trying another deployment."""
+    seen = 0
+    while error is not None and seen < 5:
+        if isinstance(error, FALLBACK_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+        seen += 1
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class _RouteStats:
+    def __init__(self):
+        self.calls = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self.latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.usage: dict[str, TokenUsage] = {}
+        self.deployment_calls: dict[str, int] = {}
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        total = sum(self.usage.values(), TokenUsage())
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+            },
+            "prompt_tokens": total.prompt_tokens,
+            "completion_tokens": total.completion_tokens,
+            "cost_usd": round(sum(cost_usd(d, u) for d, u in self.usage.items()), 6),
+            "by_deployment": {
+                deployment: {
+                    "calls": calls,
+                    "cost_usd": round(cost_usd(deployment, self.usage.get(deployment, TokenUsage())), 6),
+                }
+                for deployment, calls in sorted(self.deployment_calls.items())
+            },
+        }
+
+
+class ModelRouter:
+    """Resolves routes to deployments and keeps per-route call statistics."""
+
+    def __init__(self):
+        self.cooling: dict[str, float] = {}  # deployment -> monotonic time it may lead again
+        self.routes: dict[str, _RouteStats] = {}
+
+    def configured(self, route: Optional[str]) -> tuple[str, list[str]]:
+        """The config key that applies to ``route`` and its deployments, aliases resolved."""
+        route = route or "default"
+        for key in (route, route.split(":")[0], "default"):
+            if key in settings.model_routes:
+                break
+        else:
+            key = "default"
+        aliases = deployment_aliases()
+        names = settings.model_routes.get(key) or ["primary"]
+        return key, list(dict.fromkeys(aliases.get(name, name) for name in names))
+
+    def deployments(self, route: Optional[str]) -> list[str]:
+        """Deployments to try for a call on ``route``; ones cooling down after a 429 go last."""
+        _, deployments = self.configured(route)
+        now = time.monotonic()
+        return sorted(deployments, key=lambda deployment: self.cooling.get(deployment, 0) > now)
+
+    def failed(self, route: Optional[str], deployment: str, error: BaseException) -> None:
+        """A call on ``deployment`` hit a fallback error; let it cool down."""
+        cooldown = _retry_after(error) or settings.model_route_cooldown
+        self.cooling[deployment] = max(self.cooling.get(deployment, 0), time.monotonic() + cooldown)
+        logger.warning("Deployment %s unavailable for route %s (%s); cooling down %.0fs",
+                       deployment, route or "default", type(error).__name__, cooldown)
+
+    def observe(self, route: Optional[str], deployment: str, seconds: float,
+                usage: Optional[TokenUsage] = None, outcome: str = "ok") -> None:
+        """Record one call: ``ok``, ``fallback`` (moved on to another deployment) or ``error``."""
+        route = route or "default"
+        stats = self.routes.setdefault(route, _RouteStats())
+        telemetry.MODEL_ROUTE_CALLS.inc(route=route, deployment=deployment, outcome=outcome)
+        stats.deployment_calls[deployment] = stats.deployment_calls.get(deployment, 0) + 1
+        if outcome == "fallback":
+            stats.fallbacks += 1
+            return
+        stats.calls += 1
+        stats.latencies.append(seconds)
+        if outcome == "error":
+            stats.errors += 1
+        if usage is not None:
+            stats.usage[deployment] = stats.usage.get(deployment, TokenUsage()) + usage
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "routes": {
+                route: {"deployments": self.configured(route)[1], **stats.summary()}
+                for route, stats in sorted(self.routes.items())
+            },
+            "policy": {key: self.configured(key)[1] for key in settings.model_routes},
+            "cooling_down": {
+                deployment: round(until - now, 1) for deployment, until in self.cooling.items() if until > now
+            },
+        }
+
+
+_model_router: ModelRouter | None = None
+
+
+def get_model_router() -> ModelRouter:
+    """Get or create the model router singleton."""
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
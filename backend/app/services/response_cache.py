@@ -0,0 +1,173 @@
+"""Semantic cache of whole orchestrator runs.
+
+Users often send the same request again with slightly different wording
+("write a LinkedIn post about our AI launch" and "LinkedIn post on the AI
+launch"), and each one pays for every agent wave again. This cache embeds
+each request. It only compares entries with the same intent, target
+platforms and brand-data version (the ``cache_key``), created within
+``settings.response_cache_ttl``, and ranks them by cosine similarity:
+
+- ``hit`` (>= ``response_cache_hit_threshold``): the stored response and
+  document are returned immediately.
+- ``warm`` (>= ``response_cache_warm_threshold``): the stored Wave 1 context
+  is reused, so only Wave 2 (scribe, advisor) and synthesis run again.
+
+Brand data is part of the key, so editing it invalidates existing entries,
+and they are pruned on the next store. Embedding failures and lookup
+errors never fail a request; the run just goes uncached. Send
+``{"cache": false}`` in the message metadata to bypass the cache.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.database import ResponseCacheEntry
+from app.services import telemetry
+from app.services.llm_service import get_llm_service
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_INTENTS = ("content_creation", "content_strategy", "trend_research")  # Reviews depend on the exact draft
+
+
+@dataclass
+class CacheMatch:
+    """The closest stored run for a request and how it can be reused."""
+    entry: ResponseCacheEntry
+    similarity: float
+    kind: str  # "hit" or "warm"
+
+    def summary(self) -> dict:
+        return {
+            "status": self.kind,
+            "similarity": round(self.similarity, 4),
+            "source_trace_id": self.entry.trace_id,
+            "reused_agents": sorted(self.entry.context or {}),
+        }
+
+
+def cache_key(intent: str, platforms: list[str], brand_version: str) -> str:
+    return f"{intent}|{','.join(sorted(set(platforms or [])))}|{brand_version}"
+
+
+class ResponseCache:
+    """Looks up and stores orchestrator runs by request embedding."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.outcomes = {"hit": 0, "warm": 0, "miss": 0}
+
+    def enabled_for(self, message_metadata: Optional[dict]) -> bool:
+        """Whether a request may use the cache; ``{"cache": false}`` opts out."""
+        return settings.response_cache_enabled and (message_metadata or {}).get("cache", True) is not False
+
+    async def embed(self, message: str) -> Optional[list[float]]:
+        """The request's embedding, or None if it can't be computed."""
+        try:
+            return await get_llm_service().embed(message)
+        except Exception as e:
+            logger.warning("Response cache disabled for this request, embedding failed: %s", e)
+            return None
+
+    async def lookup(self, db: AsyncSession, embedding: list[float], intent: str,
+                     platforms: list[str], brand_version: str) -> Optional[CacheMatch]:
+        """Best reusable entry for a request, or None on a miss."""
+        if intent not in CACHEABLE_INTENTS:
+            return None
+        try:
+            match = await self._best_match(db, embedding, cache_key(intent, platforms, brand_version))
+        except Exception as e:
+            logger.warning("Response cache lookup failed: %s", e)
+            return None
+        kind = match.kind if match else "miss"
+        self.lookups += 1
+        self.outcomes[kind] += 1
+        telemetry.CACHE_REQUESTS.inc(cache="response", result=kind)
+        return match
+
+    async def _best_match(self, db: AsyncSession, embedding: list[float], key: str) -> Optional[CacheMatch]:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.response_cache_ttl)
+        result = await db.execute(
+            select(ResponseCacheEntry)
+            .where(ResponseCacheEntry.cache_key == key)
+            .where(ResponseCacheEntry.created_at >= cutoff)
+            .order_by(ResponseCacheEntry.created_at.desc())
+            .limit(settings.response_cache_max_candidates)
+        )
+        entries = [e for e in result.scalars().all() if len(e.embedding or []) == len(embedding)]
+        if not entries:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        matrix = np.asarray([e.embedding for e in entries], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        similarities = matrix @ query / np.where(norms == 0, 1.0, norms)
+        best = int(np.argmax(similarities))
+        entry, similarity = entries[best], float(similarities[best])
+        if similarity >= settings.response_cache_hit_threshold:
+            match = CacheMatch(entry, similarity, "hit")
+        elif similarity >= settings.response_cache_warm_threshold and entry.context:
+            match = CacheMatch(entry, similarity, "warm")
+        else:
+            return None
+        entry.hits = (entry.hits or 0) + 1
+        await db.flush()
+        return match
+
+    async def store(self, db: AsyncSession, *, embedding: list[float], message: str, intent: str,
+                    platforms: list[str], brand_version: str, response: str, context: dict[str, str],
+                    citations: list[dict], document_id: Optional[str] = None,
+                    document_title: Optional[str] = None, trace_id: Optional[str] = None) -> None:
+        """Save a completed run and prune expired or outdated entries."""
+        if intent not in CACHEABLE_INTENTS:
+            return
+        if any(text.startswith("Error from") for text in context.values()):
+            return  # Don't replay a degraded run
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.response_cache_ttl)
+        try:
+            await db.execute(
+                delete(ResponseCacheEntry).where(
+                    (ResponseCacheEntry.created_at < cutoff)
+                    | ~ResponseCacheEntry.cache_key.endswith(f"|{brand_version}")
+                )
+            )
+            db.add(ResponseCacheEntry(
+                cache_key=cache_key(intent, platforms, brand_version),
+                message=message,
+                embedding=list(embedding),
+                response=response,
+                context=context,
+                citations=citations,
+                document_id=document_id,
+                document_title=document_title,
+                trace_id=trace_id,
+            ))
+            await db.flush()
+        except Exception as e:
+            logger.warning("Response cache store failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.response_cache_enabled,
+            "lookups": self.lookups,
+            **self.outcomes,
+            "hit_rate": round(self.outcomes["hit"] / self.lookups, 4) if self.lookups else None,
+            "warm_rate": round(self.outcomes["warm"] / self.lookups, 4) if self.lookups else None,
+        }
+
+
+_response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the response cache singleton."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,433 @@
+"""Incremental analytics rollups over agent traces.
+
+Finished traces are folded into hourly and daily per-agent buckets as they
+complete. Analytics queries then read a handful of pre-aggregated rows for
+closed buckets and only scan raw traces for the partial bucket at the start
+of the requested period and the live window at its end.
+
+Latency distributions are kept the same way as HDR-style log-scale
+histograms: each bin is 10% wider than the last, so p50/p90/p99 come from a
+few dozen stored bins with roughly 5% relative error.
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.database import AgentRollup, AgentTrace, LatencyHistogram
+
+GRANULARITIES = ("hour", "day")
+
+# Statuses of traces folded into rollups; running traces only show up in the live window
+FINISHED_STATUSES = ("completed", "failed")
+
+# Counter columns shared by rollup rows and the raw-trace aggregate
+_COUNTERS = (
+    "executions",
+    "successes",
+    "failures",
+    "total_tokens",
+    "timed_executions",
+    "duration_ms_sum",
+    "completed_duration_ms_sum",
+)
+
+# Ratio between consecutive latency bin boundaries
+_BIN_GROWTH = 1.1
+
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Start of the hourly or daily bucket containing ``ts``."""
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil(ts: datetime, granularity: str) -> datetime:
+    """Smallest bucket boundary at or after ``ts``."""
+    start = bucket_start(ts, granularity)
+    if start == ts:
+        return start
+    return start + (timedelta(hours=1) if granularity == "hour" else timedelta(days=1))
+
+
+def _trace_duration_ms(trace: AgentTrace) -> Optional[int]:
+    """Wall-clock duration of a finished trace, matching the raw-scan query."""
+    if trace.started_at is None or trace.completed_at is None:
+        return None
+    return max(int((trace.completed_at - trace.started_at).total_seconds() * 1000), 0)
+
+
+def _trace_counters(trace: AgentTrace) -> dict[str, int]:
+    """Counter deltas contributed by one finished trace."""
+    duration_ms = _trace_duration_ms(trace)
+    completed = trace.status == "completed"
+    return {
+        "executions": 1,
+        "successes": 1 if completed else 0,
+        "failures": 1 if trace.status == "failed" else 0,
+        "total_tokens": trace.tokens_used or 0,
+        "timed_executions": 1 if duration_ms is not None else 0,
+        "duration_ms_sum": duration_ms or 0,
+        "completed_duration_ms_sum": (duration_ms or 0) if completed else 0,
+    }
+
+
+def trace_contribution(trace: AgentTrace) -> Optional[tuple[dict[str, int], Optional[int]]]:
+    """What ``record_trace`` added for a trace as it stands: counters and latency sample.
+
+    None for traces that aren't finished (and so aren't in the rollups).
+    Taken before a finished trace is finished again, so ``record_trace`` can
+    apply the difference.
+    """
+    if trace.status not in FINISHED_STATUSES or trace.started_at is None:
+        return None
+    return _trace_counters(trace), trace_latency_ms(trace) if trace.status == "completed" else None
+
+
+def trace_latency_ms(trace: AgentTrace) -> Optional[int]:
+    """Latency of a trace: the measured run time if recorded, else wall clock.
+
+    Child agent traces are written after their wave finishes, so their
+    timestamps are only milliseconds apart and ``duration_ms`` is the real
+    figure.
+    """
+    if trace.duration_ms is not None:
+        return trace.duration_ms
+    return _trace_duration_ms(trace)
+
+
+def latency_bin(latency_ms: float) -> int:
+    """Histogram bin for a latency; bin 0 holds sub-millisecond values."""
+    if latency_ms < 1:
+        return 0
+    return int(math.log(latency_ms) / math.log(_BIN_GROWTH)) + 1
+
+
+def bin_upper_ms(bin_index: int) -> float:
+    """Exclusive upper bound of a histogram bin in milliseconds."""
+    return _BIN_GROWTH ** bin_index if bin_index else 1.0
+
+
+def _bin_value_ms(bin_index: int) -> float:
+    """Representative latency for a bin (geometric midpoint of its bounds)."""
+    if bin_index == 0:
+        return 0.0
+    return math.sqrt(bin_upper_ms(bin_index - 1) * bin_upper_ms(bin_index))
+
+
+def latency_summary(bins: dict[int, int]) -> dict:
+    """Percentiles and non-empty histogram buckets for one series."""
+    total = sum(bins.values())
+    summary: dict = {"count": total}
+    ordered = sorted(bins.items())
+    for pct in PERCENTILES:
+        value = 0.0
+        if total:
+            rank = max(math.ceil(total * pct / 100), 1)
+            seen = 0
+            for bin_index, count in ordered:
+                seen += count
+                if seen >= rank:
+                    value = _bin_value_ms(bin_index)
+                    break
+        summary[f"p{pct}_ms"] = round(value, 1)
+    summary["histogram"] = [
+        {"le_ms": round(bin_upper_ms(bin_index), 1), "count": count}
+        for bin_index, count in ordered
+    ]
+    return summary
+
+
+def _bucket_window(model, start: datetime, end: Optional[datetime]):
+    """Filter selecting rollup rows that cover ``[start, end)`` exactly once.
+
+    ``start`` (and ``end``, when given) must be hour-aligned. Whole days use
+    daily rows; the partial days at either edge use hourly rows.
+    """
+    day_start = _ceil(start, "day")
+    day_end = bucket_start(end or datetime.utcnow(), "day")
+
+    def _hours(lo: datetime, hi: Optional[datetime]):
+        clauses = [model.granularity == "hour", model.bucket_start >= lo]
+        if hi is not None:
+            clauses.append(model.bucket_start < hi)
+        return and_(*clauses)
+
+    if day_start >= day_end:
+        return _hours(start, end)
+    return or_(
+        and_(
+            model.granularity == "day",
+            model.bucket_start >= day_start,
+            model.bucket_start < day_end,
+        ),
+        _hours(start, day_start),
+        _hours(day_end, end),
+    )
+
+
+class RollupService:
+    """Service for maintaining and querying trace rollups and latency histograms."""
+
+    async def record_trace(
+        self,
+        db: AsyncSession,
+        trace: AgentTrace,
+        replaces: Optional[tuple[dict[str, int], Optional[int]]] = None,
+    ) -> None:
+        """Fold a finished trace into its hourly and daily buckets.
+
+        ``replaces`` is the trace's ``trace_contribution`` from before it was
+        finished again (e.g. failed after completing); only the difference is
+        applied, so each trace is counted once, under its latest status.
+
+        Uses an atomic upsert so concurrent requests never lose increments.
+        """
+        if trace.started_at is None:
+            return
+        counters = _trace_counters(trace)
+        latency_ms = trace_latency_ms(trace) if trace.status == "completed" else None
+        previous_latency_ms = None
+        if replaces is not None:
+            previous, previous_latency_ms = replaces
+            counters = {name: counters[name] - previous[name] for name in _COUNTERS}
+
+        if any(counters.values()):
+            for granularity in GRANULARITIES:
+                stmt = sqlite_insert(AgentRollup).values(
+                    granularity=granularity,
+                    bucket_start=bucket_start(trace.started_at, granularity),
+                    agent_name=trace.agent_name,
+                    **counters,
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["granularity", "bucket_start", "agent_name"],
+                    set_={
+                        name: getattr(AgentRollup, name) + getattr(stmt.excluded, name)
+                        for name in _COUNTERS
+                    },
+                )
+                await db.execute(stmt)
+
+        def _bin(ms: Optional[int]) -> Optional[int]:
+            return latency_bin(ms) if ms is not None else None
+
+        if _bin(latency_ms) != _bin(previous_latency_ms):  # Only completed traces have a latency sample
+            series = f"agent:{trace.agent_name}"
+            if previous_latency_ms is not None:
+                await self.record_latency(db, series, previous_latency_ms, trace.started_at, count=-1)
+            if latency_ms is not None:
+                await self.record_latency(db, series, latency_ms, trace.started_at)
+
+    async def record_latency(
+        self,
+        db: AsyncSession,
+        series: str,
+        latency_ms: float,
+        at: datetime,
+        count: int = 1,
+    ) -> None:
+        """Add one latency sample (or ``count``, negative to remove) to a series' hourly and daily histograms."""
+        bin_index = latency_bin(latency_ms)
+        for granularity in GRANULARITIES:
+            stmt = sqlite_insert(LatencyHistogram).values(
+                series=series,
+                granularity=granularity,
+                bucket_start=bucket_start(at, granularity),
+                bin=bin_index,
+                count=count,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["series", "granularity", "bucket_start", "bin"],
+                set_={"count": LatencyHistogram.count + stmt.excluded.count},
+            )
+            await db.execute(stmt)
+
+    async def backfill(self, db: AsyncSession, since: Optional[datetime] = None) -> int:
+        """Rebuild rollups from raw traces (all history, or from ``since``).
+
+        Existing rollup rows in the rebuilt range are replaced, so the command
+        is safe to re-run. Wave histograms are not derivable from traces and
+        are left untouched. Returns the number of traces folded in.
+        """
+        start = bucket_start(since, "day") if since else None
+
+        clear = delete(AgentRollup)
+        clear_latency = delete(LatencyHistogram).where(LatencyHistogram.series.like("agent:%"))
+        traces = select(AgentTrace).where(AgentTrace.status.in_(FINISHED_STATUSES))
+        if start is not None:
+            clear = clear.where(AgentRollup.bucket_start >= start)
+            clear_latency = clear_latency.where(LatencyHistogram.bucket_start >= start)
+            traces = traces.where(AgentTrace.started_at >= start)
+        await db.execute(clear)
+        await db.execute(clear_latency)
+
+        buckets: dict[tuple[str, datetime, str], dict[str, int]] = {}
+        histograms: dict[tuple[str, str, datetime, int], int] = {}
+        count = 0
+        result = await db.execute(traces)
+        for trace in result.scalars():
+            if trace.started_at is None:
+                continue
+            count += 1
+            counters = _trace_counters(trace)
+            for granularity in GRANULARITIES:
+                key = (granularity, bucket_start(trace.started_at, granularity), trace.agent_name)
+                totals = buckets.setdefault(key, dict.fromkeys(_COUNTERS, 0))
+                for name, value in counters.items():
+                    totals[name] += value
+
+            latency_ms = trace_latency_ms(trace)
+            if trace.status == "completed" and latency_ms is not None:
+                bin_index = latency_bin(latency_ms)
+                for granularity in GRANULARITIES:
+                    key = (
+                        f"agent:{trace.agent_name}",
+                        granularity,
+                        bucket_start(trace.started_at, granularity),
+                        bin_index,
+                    )
+                    histograms[key] = histograms.get(key, 0) + 1
+
+        if buckets:
+            await db.execute(
+                sqlite_insert(AgentRollup),
+                [
+                    {"granularity": g, "bucket_start": b, "agent_name": a, **totals}
+                    for (g, b, a), totals in buckets.items()
+                ],
+            )
+        if histograms:
+            await db.execute(
+                sqlite_insert(LatencyHistogram),
+                [
+                    {"series": series, "granularity": g, "bucket_start": b, "bin": bin_index, "count": n}
+                    for (series, g, b, bin_index), n in histograms.items()
+                ],
+            )
+        await db.flush()
+        return count
+
+    async def agent_totals(
+        self,
+        db: AsyncSession,
+        since: datetime,
+        now: Optional[datetime] = None,
+    ) -> dict[str, dict[str, int]]:
+        """Per-agent counters for traces started in ``[since, now]``.
+
+        Closed buckets come from rollups (daily where a whole day fits, hourly
+        at the edges). Raw traces are scanned only for the partial hour after
+        ``since`` and the live window, which starts ``agentflow_max_time``
+        before the current hour so runs still in flight are never missed.
+        """
+        now = now or datetime.utcnow()
+        head_end = _ceil(since, "hour")
+        live_start = bucket_start(now - timedelta(seconds=settings.agentflow_max_time), "hour")
+
+        totals: dict[str, dict[str, int]] = {}
+
+        def _merge(agent_name: str, values: dict[str, int]) -> None:
+            row = totals.setdefault(agent_name, dict.fromkeys(_COUNTERS, 0))
+            for name in _COUNTERS:
+                row[name] += int(values.get(name) or 0)
+
+        if head_end >= live_start:
+            raw_window = AgentTrace.started_at >= since
+        else:
+            raw_window = or_(
+                # Count the head like the rollups beside it: finished traces only
+                and_(
+                    AgentTrace.started_at >= since,
+                    AgentTrace.started_at < head_end,
+                    AgentTrace.status.in_(FINISHED_STATUSES),
+                ),
+                AgentTrace.started_at >= live_start,
+            )
+            for agent_name, values in await self._read_rollups(db, head_end, live_start):
+                _merge(agent_name, values)
+
+        for agent_name, values in await self._scan_traces(db, raw_window):
+            _merge(agent_name, values)
+
+        return totals
+
+    async def _read_rollups(
+        self, db: AsyncSession, start: datetime, end: datetime
+    ) -> list[tuple[str, dict[str, int]]]:
+        """Sum rollup rows covering the hour-aligned range ``[start, end)``."""
+        result = await db.execute(
+            select(
+                AgentRollup.agent_name,
+                *[func.sum(getattr(AgentRollup, name)).label(name) for name in _COUNTERS],
+            )
+            .where(_bucket_window(AgentRollup, start, end))
+            .group_by(AgentRollup.agent_name)
+        )
+        return [(row.agent_name, row._asdict()) for row in result.all()]
+
+    async def latency_histograms(
+        self, db: AsyncSession, since: datetime
+    ) -> dict[str, dict[int, int]]:
+        """Merged latency bins per series for samples since ``since``.
+
+        Histograms are written synchronously when a run finishes, so unlike
+        :meth:`agent_totals` there is no live window to scan; the period is
+        widened to the start of the hour containing ``since``.
+        """
+        result = await db.execute(
+            select(
+                LatencyHistogram.series,
+                LatencyHistogram.bin,
+                func.sum(LatencyHistogram.count).label("count"),
+            )
+            .where(_bucket_window(LatencyHistogram, bucket_start(since, "hour"), None))
+            .group_by(LatencyHistogram.series, LatencyHistogram.bin)
+        )
+        histograms: dict[str, dict[int, int]] = {}
+        for row in result.all():
+            histograms.setdefault(row.series, {})[row.bin] = int(row.count)
+        return histograms
+
+    async def _scan_traces(self, db: AsyncSession, window) -> list[tuple[str, dict[str, int]]]:
+        """Aggregate raw traces in ``window`` into rollup counters."""
+        duration_ms = (
+            func.julianday(AgentTrace.completed_at) - func.julianday(AgentTrace.started_at)
+        ) * 86400000
+        completed = AgentTrace.status == "completed"
+
+        result = await db.execute(
+            select(
+                AgentTrace.agent_name,
+                func.count(AgentTrace.id).label("executions"),
+                func.sum(case((completed, 1), else_=0)).label("successes"),
+                func.sum(case((AgentTrace.status == "failed", 1), else_=0)).label("failures"),
+                func.sum(AgentTrace.tokens_used).label("total_tokens"),
+                func.count(AgentTrace.completed_at).label("timed_executions"),
+                func.sum(duration_ms).label("duration_ms_sum"),
+                func.sum(case((completed, duration_ms), else_=0)).label("completed_duration_ms_sum"),
+            )
+            .where(window)
+            .group_by(AgentTrace.agent_name)
+        )
+        return [(row.agent_name, row._asdict()) for row in result.all()]
+
+
+# Singleton
+_rollup_service: RollupService | None = None
+
+
+def get_rollup_service() -> RollupService:
+    """Get or create rollup service singleton."""
+    global _rollup_service
+    if _rollup_service is None:
+        _rollup_service = RollupService()
+    return _rollup_service
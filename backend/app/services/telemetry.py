@@ -0,0 +1,342 @@
+"""In-process Prometheus/OpenMetrics instrumentation.
+
+A deliberately small metrics registry: recording a sample is a dict lookup
+and an add, so the hot paths (LLM calls, DB queries, WebSocket sends) stay
+instrumented in production. ``render()`` produces the Prometheus text format
+or, when the scraper asks for it, OpenMetrics.
+"""
+
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond DB reads to multi-minute runs
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 25.0, 60.0, 120.0, 300.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for a metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _header(self, family: str) -> list[str]:
+        return [
+            f"# HELP {family} {self.documentation}",
+            f"# TYPE {family} {self.kind}",
+        ]
+
+    def samples(self, openmetrics: bool) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count. ``name`` excludes the ``_total`` suffix."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self, openmetrics: bool) -> list[str]:
+        lines = self._header(self.name if openmetrics else f"{self.name}_total")
+        for key, value in sorted(self._values.items()):
+            lines.append(
+                f"{self.name}_total{_format_labels(self.label_names, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float | dict[tuple[str, ...], float]]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float | dict[tuple[str, ...], float]]) -> None:
+        """Compute the gauge on scrape; return a number, or a dict keyed by label values."""
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        return self._collect().get(self._key(labels), 0.0)
+
+    def _collect(self) -> dict[tuple[str, ...], float]:
+        if self._function is None:
+            return self._values
+        result = self._function()
+        if isinstance(result, dict):
+            return result
+        return {(): float(result)}
+
+    def samples(self, openmetrics: bool) -> list[str]:
+        lines = self._header(self.name)
+        for key, value in sorted(self._collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with running sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [non-cumulative bucket counts..., +Inf count], sum
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall-clock seconds spent in the ``with`` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self, openmetrics: bool) -> list[str]:
+        lines = self._header(self.name)
+        for key in sorted(self._counts):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), self._counts[key]):
+                cumulative += count
+                le = 'le="' + ("+Inf" if bound == math.inf else repr(float(bound))) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Ordered collection of metric families."""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, openmetrics: bool = False) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.samples(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ============ LLM ============
+
+LLM_CALLS = REGISTRY.register(Counter(
+    "oneshot_llm_calls",
+    "LLM API calls by deployment, method and outcome.",
+    ("deployment", "method", "status"),
+))
+LLM_CALL_DURATION = REGISTRY.register(Histogram(
+    "oneshot_llm_call_duration_seconds",
+    "LLM API call latency (full stream for streaming calls).",
+    ("deployment", "method"),
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "oneshot_llm_tokens",
+    "Tokens sent to (in) and generated by (out) the LLM.",
+    ("deployment", "direction"),
+))
+LLM_COST = REGISTRY.register(Counter(
+    "oneshot_llm_cost_usd",
+    "Estimated LLM spend in USD, priced from settings.llm_pricing.",
+    ("deployment",),
+))
+MODEL_ROUTE_CALLS = REGISTRY.register(Counter(
+    "oneshot_model_route_calls",
+    "LLM calls by route and deployment; outcome fallback means the next deployment was tried.",
+    ("route", "deployment", "outcome"),
+))
+
+# ============ Agents & tools ============
+
+INTENT_CLASSIFICATIONS = REGISTRY.register(Counter(
+    "oneshot_intent_classifications",
+    "Chat intents decided by the local classifier or the LLM.",
+    ("source",),
+))
+SPECULATIVE_AGENTS = REGISTRY.register(Counter(
+    "oneshot_speculative_agents",
+    "Agents started before intent was known, by outcome (adopted, cancelled, discarded).",
+    ("agent", "outcome"),
+))
+SPECULATIVE_WASTED_TOKENS = REGISTRY.register(Counter(
+    "oneshot_speculative_wasted_tokens",
+    "Tokens spent by speculative agent runs that were not used.",
+    ("agent",),
+))
+HANDOFF_TOKENS = REGISTRY.register(Counter(
+    "oneshot_handoff_tokens",
+    "Tokens of earlier agents' output handed to a consumer, before (raw) and after (sent) budgeting.",
+    ("consumer", "stage"),
+))
+
+AGENT_DURATION = REGISTRY.register(Histogram(
+    "oneshot_agent_duration_seconds",
+    "Agent run duration by agent and final status.",
+    ("agent", "status"),
+))
+TOOL_CALL_DURATION = REGISTRY.register(Histogram(
+    "oneshot_tool_call_duration_seconds",
+    "Agent tool invocation latency by tool name and outcome.",
+    ("tool", "status"),
+))
+
+# ============ WebSocket ============
+
+WS_CONNECTIONS = REGISTRY.register(Gauge(
+    "oneshot_websocket_connections",
+    "Open WebSocket connections.",
+))
+WS_SEND_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "oneshot_websocket_send_queue_depth",
+    "Messages waiting in per-connection WebSocket send queues.",
+))
+WS_REPLAY_BYTES = REGISTRY.register(Gauge(
+    "oneshot_websocket_replay_bytes",
+    "Encoded size of events held in WebSocket replay logs.",
+))
+WS_MESSAGES_DROPPED = REGISTRY.register(Counter(
+    "oneshot_websocket_messages_dropped",
+    "Messages discarded or merged for slow WebSocket consumers, by policy.",
+    ("policy",),
+))
+WS_MESSAGES_SENT = REGISTRY.register(Counter(
+    "oneshot_websocket_messages_sent",
+    "WebSocket messages delivered to clients by event type.",
+    ("type",),
+))
+
+# ============ Database ============
+
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "oneshot_db_query_duration_seconds",
+    "Database statement latency by SQL operation.",
+    ("operation",),
+))
+
+# ============ Caches ============
+
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "oneshot_cache_requests",
+    "Cache lookups by cache name and result (hit, miss, or warm for the response cache).",
+    ("cache", "result"),
+))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup; hit rate is hits / (hits + misses)."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_usage(deployment: str, prompt_tokens: int | None, completion_tokens: int | None) -> None:
+    """Count the input and output tokens reported for one LLM call."""
+    if isinstance(prompt_tokens, int) and prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, deployment=deployment, direction="in")
+    if isinstance(completion_tokens, int) and completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, deployment=deployment, direction="out")
+
+
+@contextmanager
+def llm_call(deployment: str, method: str, started: float | None = None) -> Iterator[None]:
+    """Time and count one LLM call, labelling failures by outcome; ``started`` backdates it."""
+    started = time.perf_counter() if started is None else started
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        LLM_CALL_DURATION.observe(time.perf_counter() - started, deployment=deployment, method=method)
+        LLM_CALLS.inc(deployment=deployment, method=method, status=status)
+
+
+def render(openmetrics: bool = False) -> str:
+    """Render every registered metric in the requested exposition format."""
+    return REGISTRY.render(openmetrics)
@@ -0,0 +1,125 @@
+"""Per-call and per-request token accounting.
+
+Every LLM call reports its prompt and completion tokens through
+``record_usage``. That exports them to Prometheus, costs them with
+``settings.llm_pricing`` and adds them to the current ``UsageLedger``.
+Ledgers live in a context variable, so concurrent requests, and concurrent
+agents within one request, each count only their own calls. A ledger opened
+inside another rolls its totals up into the parent. An agent's ledger
+therefore shows what that agent spent, and the request's ledger shows
+everything.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from app.config import settings
+from app.services import telemetry
+
+
+@dataclass
+class TokenUsage:
+    """Prompt and completion tokens for one call or a sum of calls."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def __add__(self, other: "TokenUsage") -> "TokenUsage":
+        return TokenUsage(
+            self.prompt_tokens + other.prompt_tokens,
+            self.completion_tokens + other.completion_tokens,
+        )
+
+
+def cost_usd(deployment: str, usage: TokenUsage) -> float:
+    """Price tokens with the per-million rates configured for a deployment (0 if unpriced)."""
+    prompt_rate, completion_rate = settings.llm_pricing.get(deployment, (0.0, 0.0))
+    return (usage.prompt_tokens * prompt_rate + usage.completion_tokens * completion_rate) / 1_000_000
+
+
+def _summarize(by_deployment: dict[str, TokenUsage]) -> dict:
+    total = sum(by_deployment.values(), TokenUsage())
+    return {
+        "prompt_tokens": total.prompt_tokens,
+        "completion_tokens": total.completion_tokens,
+        "total_tokens": total.total_tokens,
+        "cost_usd": round(sum(cost_usd(d, u) for d, u in by_deployment.items()), 6),
+        "by_deployment": {
+            deployment: {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "cost_usd": round(cost_usd(deployment, usage), 6),
+            }
+            for deployment, usage in sorted(by_deployment.items())
+        },
+    }
+
+
+class UsageLedger:
+    """Token usage accumulated by one request or one agent run."""
+
+    def __init__(self, name: str, parent: Optional["UsageLedger"] = None):
+        self.name = name
+        self.parent = parent
+        self.calls = 0
+        self.own: dict[str, TokenUsage] = {}    # Calls made directly in this scope
+        self.total: dict[str, TokenUsage] = {}  # Including nested ledgers
+
+    def add(self, deployment: str, usage: TokenUsage) -> None:
+        self.own[deployment] = self.own.get(deployment, TokenUsage()) + usage
+        ledger: Optional[UsageLedger] = self
+        while ledger is not None:
+            ledger.calls += 1
+            ledger.total[deployment] = ledger.total.get(deployment, TokenUsage()) + usage
+            ledger = ledger.parent
+
+    @property
+    def own_usage(self) -> TokenUsage:
+        return sum(self.own.values(), TokenUsage())
+
+    @property
+    def total_usage(self) -> TokenUsage:
+        return sum(self.total.values(), TokenUsage())
+
+    def summary(self, own: bool = False) -> dict:
+        """Token counts and cost, overall and per deployment."""
+        return {"calls": self.calls, **_summarize(self.own if own else self.total)}
+
+
+_ledger: ContextVar[Optional[UsageLedger]] = ContextVar("usage_ledger", default=None)
+
+
+def current_ledger() -> Optional[UsageLedger]:
+    return _ledger.get()
+
+
+@contextmanager
+def usage_ledger(name: str) -> Iterator[UsageLedger]:
+    """Count the LLM usage of the enclosed block, rolling it up into any enclosing ledger."""
+    ledger = UsageLedger(name, parent=_ledger.get())
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+def record_usage(deployment: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> TokenUsage:
+    """Account for one LLM call: metrics, cost and the current ledger."""
+    usage = TokenUsage(
+        prompt_tokens if isinstance(prompt_tokens, int) else 0,
+        completion_tokens if isinstance(completion_tokens, int) else 0,
+    )
+    telemetry.record_llm_usage(deployment, usage.prompt_tokens, usage.completion_tokens)
+    cost = cost_usd(deployment, usage)
+    if cost:
+        telemetry.LLM_COST.inc(cost, deployment=deployment)
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.add(deployment, usage)
+    return usage
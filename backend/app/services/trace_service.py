@@ -7,6 +7,15 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.database import AgentTrace
+from app.services import telemetry
+from app.services.rollup_service import get_rollup_service, trace_contribution, trace_latency_ms
+
+
+def _observe_duration(trace: AgentTrace) -> None:
+    """Export a finished trace's run time to the agent duration histogram."""
+    latency_ms = trace_latency_ms(trace)
+    if latency_ms is not None:
+        telemetry.AGENT_DURATION.observe(latency_ms / 1000, agent=trace.agent_name, status=trace.status)
 
 
 class TraceService:
@@ -44,8 +53,10 @@ class TraceService:
         tool_calls: list | None = None,
         duration_ms: int | None = None,
         parent_trace_id: str | None = None,
+        waterfall: dict | None = None,
     ) -> AgentTrace:
-        """Mark a trace as completed with optional citation and tool call data."""
+        """Mark a trace as completed with optional citation, tool call and timing data."""
+        previous = trace_contribution(trace)  # Set if the trace already finished once
         trace.output_data = output_data
         trace.completed_at = datetime.utcnow()
         trace.status = "completed"
@@ -59,8 +70,13 @@ class TraceService:
             trace.duration_ms = duration_ms
         if parent_trace_id is not None:
             trace.parent_trace_id = parent_trace_id
+        if waterfall is not None:
+            trace.waterfall = waterfall
 
         await db.flush()
+        await get_rollup_service().record_trace(db, trace, replaces=previous)
+        if previous is None:  # A histogram sample can't be taken back; observe the first finish only
+            _observe_duration(trace)
         return trace
 
     async def fail_trace(
@@ -69,11 +85,15 @@ class TraceService:
         trace: AgentTrace,
         error: str,
     ) -> AgentTrace:
-        """Mark a trace as failed."""
+        """Mark a trace as failed, e.g. when sending its result fails after completion."""
+        previous = trace_contribution(trace)  # Set if the trace already finished once
         trace.completed_at = datetime.utcnow()
         trace.status = "failed"
         trace.error = error
         await db.flush()
+        await get_rollup_service().record_trace(db, trace, replaces=previous)
+        if previous is None:  # A histogram sample can't be taken back; observe the first finish only
+            _observe_duration(trace)
         return trace
 
 
@@ -0,0 +1,196 @@
+"""Per-request latency waterfall for orchestrator runs.
+
+``process_message`` opens a ``Waterfall`` and spans are recorded against it
+from anywhere in the same task tree through a context variable. That covers
+intent classification, waves, each agent's queue wait and execution, tool
+and model calls made by MAF agents, DB writes, and synthesis. The finished
+waterfall is stored on the root trace as a compact, column-oriented dict::
+
+    {"v": 1, "total_ms": 8123.4,
+     "fields": ["name", "kind", "agent", "start_ms", "duration_ms", "parent"],
+     "spans": [["intent", "intent", "orchestrator", 1.2, 640.5, null], ...]}
+
+``parent`` is the index of the enclosing span. ``expand`` turns this back
+into span dicts with a per-kind summary for the waterfall endpoint.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+WATERFALL_VERSION = 1
+_FIELDS = ["name", "kind", "agent", "start_ms", "duration_ms", "parent"]
+
+# Statements recorded as "db" spans; reads are left to the query histogram
+_WRITE_OPERATIONS = frozenset({"INSERT", "UPDATE", "DELETE"})
+
+
+@dataclass
+class Span:
+    """One timed step, in perf_counter() seconds."""
+    name: str
+    kind: str
+    agent: Optional[str]
+    start: float
+    end: Optional[float] = None
+    parent: Optional[int] = None
+
+
+class Waterfall:
+    """Collects the spans of one request."""
+
+    def __init__(self, agent: str = "orchestrator"):
+        self.origin = time.perf_counter()
+        self.agent = agent
+        self.spans: list[Span] = []
+
+    def open(self, name: str, kind: str, agent: Optional[str] = None,
+             parent: Optional[int] = None, start: Optional[float] = None) -> int:
+        """Start a span and return its index."""
+        if agent is None:
+            agent = self.spans[parent].agent if parent is not None else self.agent
+        self.spans.append(Span(name, kind, agent, start if start is not None else time.perf_counter(), parent=parent))
+        return len(self.spans) - 1
+
+    def close(self, index: int, end: Optional[float] = None) -> None:
+        self.spans[index].end = end if end is not None else time.perf_counter()
+
+    def add(self, name: str, kind: str, start: float, end: float,
+            agent: Optional[str] = None, parent: Optional[int] = None) -> int:
+        """Record a span that has already finished."""
+        index = self.open(name, kind, agent, parent, start)
+        self.close(index, end)
+        return index
+
+    def to_compact(self) -> dict:
+        """Serialize for storage on the root trace; unfinished spans end now."""
+        now = time.perf_counter()
+
+        def ms(moment: float) -> float:
+            return round((moment - self.origin) * 1000, 1)
+
+        return {
+            "v": WATERFALL_VERSION,
+            "total_ms": ms(now),
+            "fields": _FIELDS,
+            "spans": [
+                [span.name, span.kind, span.agent, ms(span.start),
+                 round(((span.end or now) - span.start) * 1000, 1), span.parent]
+                for span in self.spans
+            ],
+        }
+
+
+_current: ContextVar[Optional[Waterfall]] = ContextVar("waterfall", default=None)
+_parent: ContextVar[Optional[int]] = ContextVar("waterfall_parent", default=None)
+
+
+def current_waterfall() -> Optional[Waterfall]:
+    """The waterfall of the request running in this context, if any."""
+    return _current.get()
+
+
+@contextmanager
+def start_waterfall(agent: str = "orchestrator") -> Iterator[Waterfall]:
+    """Make a new waterfall current for this context and the tasks it spawns."""
+    waterfall = Waterfall(agent)
+    token = _current.set(waterfall)
+    parent_token = _parent.set(None)
+    try:
+        yield waterfall
+    finally:
+        _parent.reset(parent_token)
+        _current.reset(token)
+
+
+@contextmanager
+def record_span(
+    name: str, kind: str, agent: Optional[str] = None, start: Optional[float] = None
+) -> Iterator[Optional[int]]:
+    """Time the enclosed block as a span nested under the current one.
+
+    ``start`` backdates the span (a perf_counter() reading), e.g. to when
+    work was queued. A no-op outside a waterfall, so shared code can always
+    call it.
+    """
+    waterfall = _current.get()
+    if waterfall is None:
+        yield None
+        return
+    index = waterfall.open(name, kind, agent, _parent.get(), start)
+    token = _parent.set(index)
+    try:
+        yield index
+    finally:
+        _parent.reset(token)
+        waterfall.close(index)
+
+
+def add_span(name: str, kind: str, start: float, end: float, agent: Optional[str] = None) -> None:
+    """Record an already-timed span under the current one, if a waterfall is open."""
+    waterfall = _current.get()
+    if waterfall is not None:
+        waterfall.add(name, kind, start, end, agent, _parent.get())
+
+
+def record_query(statement: str, started: float, ended: float) -> None:
+    """Record a DB write as a span (called from the engine's cursor hooks)."""
+    if _current.get() is None:
+        return
+    words = statement.split(None, 3)
+    operation = words[0].upper() if words else ""
+    if operation not in _WRITE_OPERATIONS or len(words) < 2:
+        return
+    table = words[1] if operation == "UPDATE" else (words[2] if len(words) > 2 else "")
+    add_span(f"{operation} {table.strip(chr(34))}", "db", started, ended)
+
+
+# ============ Reading ============
+
+
+def _union_ms(intervals: list[tuple[float, float]]) -> float:
+    """Wall time covered by possibly-overlapping intervals."""
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return round(total, 1)
+
+
+def expand(compact: dict) -> dict:
+    """Turn a stored waterfall into span dicts plus a per-kind summary.
+
+    ``wall_ms`` per kind counts overlapping spans once, so parallel agents
+    don't add up to more than the request took.
+    """
+    fields = compact.get("fields", _FIELDS)
+    spans = []
+    for index, row in enumerate(compact.get("spans", [])):
+        span = dict(zip(fields, row))
+        span["id"] = index
+        span["end_ms"] = round(span["start_ms"] + span["duration_ms"], 1)
+        spans.append(span)
+
+    by_kind: dict[str, dict] = {}
+    for span in spans:
+        entry = by_kind.setdefault(span["kind"], {"count": 0, "total_ms": 0.0, "intervals": []})
+        entry["count"] += 1
+        entry["total_ms"] += span["duration_ms"]
+        entry["intervals"].append((span["start_ms"], span["end_ms"]))
+    summary = {
+        kind: {
+            "count": entry["count"],
+            "total_ms": round(entry["total_ms"], 1),
+            "wall_ms": _union_ms(entry["intervals"]),
+        }
+        for kind, entry in by_kind.items()
+    }
+    return {"total_ms": compact.get("total_ms"), "spans": spans, "summary": summary}
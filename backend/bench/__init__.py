@@ -0,0 +1 @@
+"""Offline benchmarks. Run modules from backend/, e.g. ``python -m bench.framing``."""
@@ -0,0 +1,570 @@
+"""Deterministic stand-in for the Azure OpenAI endpoints the backend calls.
+
+Serves chat completions (plain, streamed and ``json_schema`` structured
+output), embeddings and the Responses API used by the agents. Point the
+backend at it with ``AZURE_OPENAI_ENDPOINT=https://127.0.0.1:<port>`` and any
+``AZURE_OPENAI_API_KEY``.
+
+Latency is modelled as a log-normal time to first token plus a fixed token
+rate, and a fraction of requests can fail with an injected status. Output
+text, vectors, latencies and failures are all derived from the request body
+and the seed, so repeated runs see the same behaviour. Every call is logged
+as a ``CallRecord`` so benchmarks can break time down per agent.
+
+The Agent Framework only accepts ``https`` endpoints, so the server uses TLS
+with a throwaway self-signed certificate. Clients trust it through
+``SSL_CERT_FILE``.
+
+    python -m bench.fake_azure_openai --port 8765 --ttft-ms 300 --tokens-per-second 80
+"""
+
+import argparse
+import asyncio
+import base64
+import datetime
+import hashlib
+import ipaddress
+import json
+import math
+import random
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_WORDS = (
+    "brand audience engagement campaign content strategy launch platform post thread "
+    "carousel hashtag insight trend growth community voice story creator reach metric "
+    "schedule calendar review tone authentic value update team product customer"
+).split()
+
+# z-score of the 99th percentile, for deriving a log-normal sigma from p50/p99
+_Z99 = 2.326
+
+
+@dataclass
+class LatencyProfile:
+    """Log-normal latency described by its median and 99th percentile in milliseconds."""
+    median_ms: float
+    p99_ms: float
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        sigma = math.log(max(self.p99_ms, self.median_ms) / self.median_ms) / _Z99
+        return rng.lognormvariate(math.log(self.median_ms), sigma)
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour of the fake server."""
+    ttft: LatencyProfile = field(default_factory=lambda: LatencyProfile(300, 1200))
+    embedding_latency: LatencyProfile = field(default_factory=lambda: LatencyProfile(40, 150))
+    tokens_per_second: float = 80.0
+    output_tokens: int = 200
+    error_rate: float = 0.0  # Fraction of requests answered with error_status
+    error_status: int = 429
+    time_scale: float = 1.0  # Multiplies every delay; 0 answers immediately
+    embedding_dimensions: int = 1536
+    seed: int = 7
+    # Fixed structured outputs by json_schema name, e.g. {"intent_analysis": {...}}
+    structured_overrides: dict[str, dict] = field(default_factory=dict)
+
+
+@dataclass
+class CallRecord:
+    """One request served by the fake, with timing in perf_counter() seconds."""
+    api: str  # chat, chat_stream, structured, responses, responses_stream, embeddings
+    deployment: str
+    system: str  # System prompt / instructions, used to attribute calls to agents
+    started: float
+    ended: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    status: int = 200
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.ended - self.started) * 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def _text_of(content: Any) -> str:
+    """Flatten chat/Responses message content (string or list of parts) to text."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _system_and_prompt(messages: list[dict]) -> tuple[str, str]:
+    system = "".join(_text_of(m.get("content")) for m in messages if m.get("role") in ("system", "developer"))
+    prompt = "".join(_text_of(m.get("content")) for m in messages if m.get("role") not in ("system", "developer"))
+    return system, prompt
+
+
+def _sample_schema(schema: dict, rng: random.Random) -> Any:
+    """Build a value matching a JSON schema: first enum value, every enum item for arrays."""
+    kind = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {name: _sample_schema(sub, rng) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        items = schema.get("items", {})
+        if "enum" in items:
+            return list(items["enum"])
+        return [_sample_schema(items, rng)]
+    if kind == "integer":
+        return rng.randint(1, 100)
+    if kind == "number":
+        return round(rng.uniform(0, 100), 2)
+    if kind == "boolean":
+        return True
+    return " ".join(rng.choice(_WORDS) for _ in range(6))
+
+
+def write_self_signed_cert(directory: str) -> tuple[str, str]:
+    """Write a localhost certificate and key (PEM) into ``directory``; returns their paths."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([
+                x509.DNSName("localhost"),
+                x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+            ]),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = Path(directory) / "fake-azure-openai.pem"
+    key_path = Path(directory) / "fake-azure-openai.key"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ))
+    return str(cert_path), str(key_path)
+
+
+class FakeAzureOpenAI:
+    """ASGI app plus an in-thread runner; see the module docstring."""
+
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self.calls: list[CallRecord] = []
+        self.cert_file: Optional[str] = None  # Set by serve(); point SSL_CERT_FILE here
+        self.app = self._build_app()
+
+    # ============ Behaviour ============
+
+    def _rng(self, body: bytes) -> random.Random:
+        return random.Random(f"{self.config.seed}:{hashlib.sha1(body).hexdigest()}")
+
+    async def _sleep(self, ms: float) -> None:
+        if ms > 0 and self.config.time_scale > 0:
+            await asyncio.sleep(ms * self.config.time_scale / 1000)
+
+    def _tokens(self, rng: random.Random) -> list[str]:
+        return [rng.choice(_WORDS) + " " for _ in range(self.config.output_tokens)]
+
+    def _injected_error(self, rng: random.Random, record: CallRecord) -> Optional[JSONResponse]:
+        if rng.random() >= self.config.error_rate:
+            return None
+        record.status = self.config.error_status
+        record.ended = time.perf_counter()
+        retry_ms = str(int(1000 * self.config.time_scale))
+        return JSONResponse(
+            {"error": {"code": str(record.status), "message": "Injected failure from the fake Azure OpenAI server."}},
+            status_code=record.status,
+            headers={"retry-after-ms": retry_ms} if record.status == 429 else None,
+        )
+
+    def _start(self, api: str, deployment: str, system: str, prompt: str) -> CallRecord:
+        record = CallRecord(
+            api=api,
+            deployment=deployment,
+            system=system,
+            started=time.perf_counter(),
+            prompt_tokens=estimate_tokens(system + prompt),
+        )
+        self.calls.append(record)
+        return record
+
+    # ============ Chat completions ============
+
+    async def chat_completions(self, request: Request, deployment: Optional[str] = None):
+        raw = await request.body()
+        body = json.loads(raw)
+        deployment = deployment or body.get("model", "")
+        rng = self._rng(raw)
+        system, prompt = _system_and_prompt(body.get("messages", []))
+        response_format = body.get("response_format") or {}
+        structured = response_format.get("type") == "json_schema"
+        api = "structured" if structured else ("chat_stream" if body.get("stream") else "chat")
+        record = self._start(api, deployment, system, prompt)
+
+        if (error := self._injected_error(rng, record)) is not None:
+            return error
+
+        completion_id = f"chatcmpl-{uuid.UUID(int=rng.getrandbits(128)).hex}"
+        ttft_ms = self.config.ttft.sample(rng)
+
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(
+                self._stream_chat(record, rng, completion_id, deployment, ttft_ms, include_usage),
+                media_type="text/event-stream",
+            )
+
+        if structured:
+            json_schema = response_format.get("json_schema", {})
+            value = self.config.structured_overrides.get(json_schema.get("name", "")) or _sample_schema(
+                json_schema.get("schema", {}), rng
+            )
+            content = json.dumps(value)
+            completion_tokens = estimate_tokens(content)
+        else:
+            tokens = self._tokens(rng)
+            content = "".join(tokens)
+            completion_tokens = len(tokens)
+
+        await self._sleep(ttft_ms + completion_tokens * 1000 / self.config.tokens_per_second)
+        record.completion_tokens = completion_tokens
+        record.ended = time.perf_counter()
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": self._chat_usage(record),
+        }
+
+    @staticmethod
+    def _chat_usage(record: CallRecord) -> dict:
+        return {
+            "prompt_tokens": record.prompt_tokens,
+            "completion_tokens": record.completion_tokens,
+            "total_tokens": record.prompt_tokens + record.completion_tokens,
+        }
+
+    async def _stream_chat(
+        self,
+        record: CallRecord,
+        rng: random.Random,
+        completion_id: str,
+        deployment: str,
+        ttft_ms: float,
+        include_usage: bool,
+    ) -> AsyncIterator[bytes]:
+        def chunk(delta: dict, finish_reason: Optional[str] = None, usage: Optional[dict] = None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": deployment,
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n".encode()
+
+        await self._sleep(ttft_ms)
+        yield chunk({"role": "assistant", "content": ""})
+        for token in self._tokens(rng):
+            yield chunk({"content": token})
+            record.completion_tokens += 1
+            await self._sleep(1000 / self.config.tokens_per_second)
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk({}, usage=self._chat_usage(record))
+        yield b"data: [DONE]\n\n"
+        record.ended = time.perf_counter()
+
+    # ============ Embeddings ============
+
+    async def embeddings(self, request: Request, deployment: Optional[str] = None):
+        raw = await request.body()
+        body = json.loads(raw)
+        deployment = deployment or body.get("model", "")
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        rng = self._rng(raw)
+        record = self._start("embeddings", deployment, "", "".join(map(str, inputs)))
+
+        if (error := self._injected_error(rng, record)) is not None:
+            return error
+
+        await self._sleep(self.config.embedding_latency.sample(rng))
+        data = []
+        for index, text in enumerate(inputs):
+            vector = self._embedding(str(text))
+            if body.get("encoding_format") == "base64":
+                encoded: Any = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+            else:
+                encoded = vector
+            data.append({"object": "embedding", "index": index, "embedding": encoded})
+        record.ended = time.perf_counter()
+        return {
+            "object": "list",
+            "data": data,
+            "model": deployment,
+            "usage": {"prompt_tokens": record.prompt_tokens, "total_tokens": record.prompt_tokens},
+        }
+
+    def _embedding(self, text: str) -> list[float]:
+        """Unit vector seeded by the text, so equal texts embed identically."""
+        rng = random.Random(f"{self.config.seed}:embedding:{text}")
+        vector = [rng.gauss(0, 1) for _ in range(self.config.embedding_dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    # ============ Responses API ============
+
+    async def responses(self, request: Request):
+        raw = await request.body()
+        body = json.loads(raw)
+        deployment = body.get("model", "")
+        rng = self._rng(raw)
+        items = body.get("input", [])
+        if isinstance(items, str):
+            items = [{"role": "user", "content": items}]
+        system, prompt = _system_and_prompt([i for i in items if isinstance(i, dict)])
+        system = body.get("instructions") or system
+        record = self._start("responses_stream" if body.get("stream") else "responses", deployment, system, prompt)
+
+        if (error := self._injected_error(rng, record)) is not None:
+            return error
+
+        response_id = f"resp_{uuid.UUID(int=rng.getrandbits(128)).hex}"
+        message_id = f"msg_{uuid.UUID(int=rng.getrandbits(128)).hex}"
+        ttft_ms = self.config.ttft.sample(rng)
+        tokens = self._tokens(rng)
+
+        if body.get("stream"):
+            return StreamingResponse(
+                self._stream_responses(record, response_id, message_id, deployment, ttft_ms, tokens),
+                media_type="text/event-stream",
+            )
+
+        await self._sleep(ttft_ms + len(tokens) * 1000 / self.config.tokens_per_second)
+        record.completion_tokens = len(tokens)
+        record.ended = time.perf_counter()
+        return self._response_object(record, response_id, message_id, deployment, "".join(tokens), "completed")
+
+    @staticmethod
+    def _response_object(
+        record: CallRecord, response_id: str, message_id: str, deployment: str, text: Optional[str], status: str
+    ) -> dict:
+        output = []
+        if text is not None:
+            output.append({
+                "type": "message",
+                "id": message_id,
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            })
+        return {
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": status,
+            "model": deployment,
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": record.prompt_tokens,
+                "output_tokens": record.completion_tokens,
+                "total_tokens": record.prompt_tokens + record.completion_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+    async def _stream_responses(
+        self,
+        record: CallRecord,
+        response_id: str,
+        message_id: str,
+        deployment: str,
+        ttft_ms: float,
+        tokens: list[str],
+    ) -> AsyncIterator[bytes]:
+        sequence = 0
+
+        def event(payload: dict) -> bytes:
+            nonlocal sequence
+            payload["sequence_number"] = sequence
+            sequence += 1
+            return f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n".encode()
+
+        part = {"type": "output_text", "text": "", "annotations": []}
+        item = {"type": "message", "id": message_id, "status": "in_progress", "role": "assistant", "content": []}
+        position = {"item_id": message_id, "output_index": 0, "content_index": 0}
+
+        yield event({
+            "type": "response.created",
+            "response": self._response_object(record, response_id, message_id, deployment, None, "in_progress"),
+        })
+        await self._sleep(ttft_ms)
+        yield event({"type": "response.output_item.added", "output_index": 0, "item": item})
+        yield event({"type": "response.content_part.added", **position, "part": part})
+        for token in tokens:
+            yield event({"type": "response.output_text.delta", **position, "delta": token})
+            record.completion_tokens += 1
+            await self._sleep(1000 / self.config.tokens_per_second)
+        text = "".join(tokens)
+        yield event({"type": "response.output_text.done", **position, "text": text})
+        yield event({"type": "response.content_part.done", **position, "part": {**part, "text": text}})
+        yield event({
+            "type": "response.output_item.done",
+            "output_index": 0,
+            "item": {**item, "status": "completed", "content": [{**part, "text": text}]},
+        })
+        record.ended = time.perf_counter()
+        yield event({
+            "type": "response.completed",
+            "response": self._response_object(record, response_id, message_id, deployment, text, "completed"),
+        })
+
+    # ============ App & runner ============
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Azure OpenAI")
+
+        @app.post("/openai/deployments/{deployment}/chat/completions")
+        async def deployment_chat(deployment: str, request: Request):
+            return await self.chat_completions(request, deployment)
+
+        @app.post("/openai/deployments/{deployment}/embeddings")
+        async def deployment_embeddings(deployment: str, request: Request):
+            return await self.embeddings(request, deployment)
+
+        @app.post("/openai/deployments/{deployment}/responses")
+        async def deployment_responses(deployment: str, request: Request):
+            return await self.responses(request)
+
+        # v1-style routes take the deployment from the body's "model"
+        app.add_api_route("/openai/v1/chat/completions", self.chat_completions, methods=["POST"])
+        app.add_api_route("/openai/v1/embeddings", self.embeddings, methods=["POST"])
+        app.add_api_route("/openai/responses", self.responses, methods=["POST"])
+        app.add_api_route("/openai/v1/responses", self.responses, methods=["POST"])
+        return app
+
+    @contextmanager
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> Iterator[str]:
+        """Run the server over TLS in a background thread; yields its endpoint URL."""
+        with tempfile.TemporaryDirectory(prefix="fake-aoai") as directory:
+            self.cert_file, key_file = write_self_signed_cert(directory)
+            config = uvicorn.Config(
+                self.app,
+                host=host,
+                port=port,
+                log_level="warning",
+                lifespan="off",
+                ssl_certfile=self.cert_file,
+                ssl_keyfile=key_file,
+            )
+            server = uvicorn.Server(config)
+            thread = threading.Thread(target=server.run, name="fake-azure-openai", daemon=True)
+            thread.start()
+            while not server.started:
+                if not thread.is_alive():
+                    raise RuntimeError("Fake Azure OpenAI server failed to start")
+                time.sleep(0.01)
+            bound_port = server.servers[0].sockets[0].getsockname()[1]
+            try:
+                yield f"https://{host}:{bound_port}"
+            finally:
+                server.should_exit = True
+                thread.join(timeout=5)
+
+
+def add_fake_arguments(parser: argparse.ArgumentParser) -> None:
+    """Register the latency/error options shared by every benchmark."""
+    group = parser.add_argument_group("fake Azure OpenAI")
+    group.add_argument("--ttft-ms", type=float, default=300, help="Median time to first token")
+    group.add_argument("--ttft-p99-ms", type=float, default=1200, help="99th percentile time to first token")
+    group.add_argument("--tokens-per-second", type=float, default=80, help="Generation rate after the first token")
+    group.add_argument("--output-tokens", type=int, default=200, help="Tokens generated per completion")
+    group.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    group.add_argument("--error-status", type=int, default=429, help="HTTP status of injected failures")
+    group.add_argument("--time-scale", type=float, default=1.0, help="Multiply every delay (0 = no waiting)")
+    group.add_argument("--seed", type=int, default=7)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        ttft=LatencyProfile(args.ttft_ms, args.ttft_p99_ms),
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+    fake = FakeAzureOpenAI(config_from_args(args))
+    with tempfile.TemporaryDirectory(prefix="fake-aoai") as directory:
+        cert_file, key_file = write_self_signed_cert(directory)
+        print(f"Fake Azure OpenAI on https://{args.host}:{args.port}")
+        print(f"  export AZURE_OPENAI_ENDPOINT=https://{args.host}:{args.port} AZURE_OPENAI_API_KEY=fake")
+        print(f"  export SSL_CERT_FILE={cert_file}")
+        uvicorn.run(
+            fake.app,
+            host=args.host,
+            port=args.port,
+            log_level="warning",
+            ssl_certfile=cert_file,
+            ssl_keyfile=key_file,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare WebSocket framing: JSON text vs compact MessagePack, with and without deflate.
+
+Replays a synthetic event stream shaped like one orchestrator run (lifecycle
+events for each agent, citations and a long run of coalesced stream tokens)
+through both encoders. It reports bytes on the wire per event and encode CPU
+time per event. permessage-deflate is simulated the way browsers and
+uvicorn's ``websockets`` negotiate it by default (RFC 7692, raw deflate with
+context takeover and a sync flush per message).
+
+    python -m bench.framing [--runs 5] [--tokens 400] [--json]
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timezone
+
+from app.api.framing import encode_compact
+from app.api.websocket import _encode
+
+AGENTS = ("researcher", "memory", "strategist", "scribe", "advisor")
+
+
+def sample_events(tokens: int, seed: int = 7) -> list[tuple[str, dict, str, int]]:
+    """Build (event_type, data, timestamp, seq) tuples for one simulated run."""
+    rng = random.Random(seed)
+    words = "the brand voice should stay consistent across every platform and campaign".split()
+    events: list[tuple[str, dict]] = [("agent.started", {"agent_name": "orchestrator", "task": "Processing request"})]
+    for agent in AGENTS:
+        events += [
+            ("agent.handoff", {"from_agent": "orchestrator", "to_agent": agent, "context": f"Wave task for {agent}"}),
+            ("agent.started", {"agent_name": agent, "task": f"Running {agent}"}),
+            ("agent.tool_call", {"agent_name": agent, "tool": "web_search", "tool_type": "tool"}),
+            ("agent.thinking", {"agent_name": agent, "thought": "Gathering context...", "progress": 0.5}),
+            ("agent.citations", {"agent_name": agent, "citations": [
+                {"url": f"https://example.com/{agent}/{i}", "source_tool": "web_search", "type": "url"}
+                for i in range(3)
+            ]}),
+            ("agent.completed", {"agent_name": agent, "result_summary": "Done", "duration_ms": rng.randint(800, 9000)}),
+        ]
+    for _ in range(tokens):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+        events.append(("stream.token", {"agent_name": "orchestrator", "token": text + " "}))
+    events.append(("agent.completed", {"agent_name": "orchestrator", "result_summary": "Done", "duration_ms": 42000}))
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+    return [(event_type, data, now, seq) for seq, (event_type, data) in enumerate(events, start=1)]
+
+
+def _deflated_size(frames: list[bytes]) -> int:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    total = 0
+    for frame in frames:
+        chunk = compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        total += len(chunk) - 4  # RFC 7692 strips the trailing 00 00 ff ff
+    return total
+
+
+def _time_per_event(encode, events, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        for event in events:
+            encode(*event)
+        best = min(best, time.perf_counter() - started)
+    return best / len(events) * 1e6
+
+
+def run(runs: int, tokens: int) -> dict:
+    events = sample_events(tokens)
+    encoders = {
+        "json": lambda *e: _encode(e[0], e[1], e[2], e[3]).encode("utf-8"),
+        "msgpack": lambda *e: encode_compact(*e),
+    }
+    results = {}
+    for name, encode in encoders.items():
+        frames = [encode(*event) for event in events]
+        raw = sum(len(frame) for frame in frames)
+        deflated = _deflated_size(frames)
+        deflate_started = time.perf_counter()
+        _deflated_size(frames)
+        deflate_us = (time.perf_counter() - deflate_started) / len(events) * 1e6
+        results[name] = {
+            "bytes_per_event": round(raw / len(events), 1),
+            "deflate_bytes_per_event": round(deflated / len(events), 1),
+            "encode_us_per_event": round(_time_per_event(encode, events, runs), 2),
+            "deflate_us_per_event": round(deflate_us, 2),
+        }
+    return {
+        "events": len(events),
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Timing repetitions (best is kept)")
+    parser.add_argument("--tokens", type=int, default=400, help="stream.token events in the run")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    report = run(args.runs, args.tokens)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['events']} events")
+    print(f"{'encoding':<10}{'B/event':>10}{'deflated':>10}{'encode µs':>12}{'deflate µs':>12}")
+    for name, row in report["results"].items():
+        print(
+            f"{name:<10}{row['bytes_per_event']:>10}{row['deflate_bytes_per_event']:>10}"
+            f"{row['encode_us_per_event']:>12}{row['deflate_us_per_event']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""Load-test a running backend over real HTTP and WebSocket connections.
+
+Opens ``--sessions`` chat sessions, each holding a WebSocket subscription to
+``/ws/agents/{conversation_id}``. Requests arrive at ``--rate`` per second
+(Poisson by default) for ``--duration`` seconds and wait in a queue until a
+session is free. Measuring latency from arrival, not from when a session
+picks the request up, keeps a saturated server from hiding its queueing
+delay.
+
+Scenarios:
+
+- ``chat``: ``POST /api/chat/conversations/{id}/messages``
+- ``research``: ``POST /api/research/query?session_id={id}``
+- ``briefing``: ``POST /api/research/briefing?session_id={id}``
+- ``export``: ``POST /api/documents/{id}/export`` (HTML), HTTP only
+- ``analytics``: dashboard polling of ``/api/analytics/metrics``, ``/social``
+  and ``/traces``, HTTP only
+
+Per request it records the HTTP status, total latency, queue wait, time to
+the first WebSocket event and first ``stream.token``, and event loss. Loss is
+measured from ``seq`` gaps, ``replay.gap`` frames and runs whose final
+orchestrator ``agent.completed`` never arrived.
+
+    python -m bench.load --base-url http://localhost:8000 --scenario chat --sessions 20 --rate 2 --duration 60
+    python -m bench.load --spawn --scenario all --output load.json   # own backend on the fake Azure OpenAI
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+import httpx
+from websockets.asyncio.client import connect as ws_connect
+from websockets.exceptions import ConnectionClosed
+
+from bench.fake_azure_openai import FakeAzureOpenAI, add_fake_arguments, config_from_args
+
+SCENARIOS = ("chat", "research", "briefing", "export", "analytics")
+WS_SCENARIOS = {"chat", "research", "briefing"}
+
+_MESSAGES = (
+    "Write a LinkedIn post announcing our new analytics dashboard",
+    "Research the latest trends in B2B social media marketing",
+    "Review this tweet for brand voice: shipping faster than ever, try it today",
+    "Plan a week of posts for our product launch across all platforms",
+)
+_ANALYTICS_PATHS = (
+    "/api/analytics/metrics?period=day",
+    "/api/analytics/social?period=week",
+    "/api/analytics/traces?limit=20&fields=summary",
+)
+
+
+@dataclass
+class RequestRecord:
+    """Outcome of one request; times in milliseconds from its arrival."""
+    scenario: str
+    index: int
+    status: Optional[int] = None  # HTTP status, None on a transport error
+    error: Optional[str] = None
+    latency_ms: float = 0.0
+    queue_ms: float = 0.0
+    first_event_ms: Optional[float] = None
+    first_token_ms: Optional[float] = None
+    events: int = 0
+    events_lost: int = 0
+    replay_gaps: int = 0
+    completed_event: Optional[bool] = None  # Final orchestrator event seen (WebSocket scenarios)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and self.status < 400
+
+
+class Session:
+    """One conversation with a live WebSocket subscription."""
+
+    def __init__(self, base_url: str):
+        self.conversation_id = str(uuid.uuid4())
+        self.ws_url = base_url.replace("http", "ws", 1) + f"/ws/agents/{self.conversation_id}"
+        self.connection = None
+        self.reader: Optional[asyncio.Task] = None
+        self.last_seq = 0
+        self.record: Optional[RequestRecord] = None
+        self.arrived = 0.0
+        self.completed = asyncio.Event()
+
+    async def open(self) -> None:
+        self.connection = await ws_connect(self.ws_url, compression=None, max_size=None)
+        self.reader = asyncio.create_task(self._read())
+
+    async def close(self) -> None:
+        if self.connection is not None:
+            await self.connection.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+
+    def begin(self, record: RequestRecord, arrived: float) -> None:
+        self.record, self.arrived = record, arrived
+        self.completed.clear()
+
+    async def _read(self) -> None:
+        try:
+            async for frame in self.connection:
+                self._observe(json.loads(frame))
+        except ConnectionClosed:
+            pass
+
+    def _observe(self, event: dict) -> None:
+        seq = event.get("seq") or 0
+        record = self.record
+        if seq:
+            if record is not None and seq > self.last_seq + 1 and self.last_seq:
+                record.events_lost += seq - self.last_seq - 1
+            self.last_seq = max(self.last_seq, seq)
+        if record is None:
+            return
+        elapsed = (time.perf_counter() - self.arrived) * 1000
+        event_type, data = event.get("event_type"), event.get("data") or {}
+        record.events += 1
+        if record.first_event_ms is None:
+            record.first_event_ms = elapsed
+        if event_type == "stream.token" and record.first_token_ms is None:
+            record.first_token_ms = elapsed
+        elif event_type == "replay.gap":
+            record.replay_gaps += 1
+        elif event_type == "agent.completed" and data.get("agent_name") == "orchestrator":
+            self.completed.set()
+
+
+class Scenario:
+    """How to issue one request of a named scenario."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.uses_ws = name in WS_SCENARIOS
+        self.document_ids: list[str] = []
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        if self.name != "export":
+            return
+        response = await client.get("/api/documents", params={"limit": 50, "fields": "summary"})
+        self.document_ids = [doc["id"] for doc in response.json()] if response.status_code == 200 else []
+        if not self.document_ids:
+            # Fresh database: generate one document to export
+            response = await client.post("/api/proposals/generate", json={"topic": "Load test launch"})
+            response.raise_for_status()
+            self.document_ids = [response.json()["id"]]
+
+    async def send(self, client: httpx.AsyncClient, index: int, conversation_id: str) -> httpx.Response:
+        if self.name == "chat":
+            return await client.post(
+                f"/api/chat/conversations/{conversation_id}/messages",
+                json={"content": _MESSAGES[index % len(_MESSAGES)]},
+            )
+        if self.name == "research":
+            return await client.post(
+                "/api/research/query",
+                params={"session_id": conversation_id},
+                json={"query": f"Social media trends for load test {index}", "research_type": "quick"},
+            )
+        if self.name == "briefing":
+            return await client.post(
+                "/api/research/briefing",
+                params={"session_id": conversation_id},
+                json={"company_name": f"Load Corp {index}", "industry": "software"},
+            )
+        if self.name == "export":
+            document_id = self.document_ids[index % len(self.document_ids)]
+            return await client.post(f"/api/documents/{document_id}/export", json={"format": "html"})
+        return await client.get(_ANALYTICS_PATHS[index % len(_ANALYTICS_PATHS)])
+
+
+def arrival_times(rate: float, duration: float, poisson: bool, seed: int) -> list[float]:
+    """Offsets in seconds at which requests arrive."""
+    rng = random.Random(seed)
+    times, now = [], 0.0
+    while True:
+        now += rng.expovariate(rate) if poisson else 1.0 / rate
+        if now >= duration:
+            return times
+        times.append(now)
+
+
+async def _serve(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    session: Optional[Session],
+    index: int,
+    arrived: float,
+    completion_grace: float,
+) -> RequestRecord:
+    record = RequestRecord(scenario=scenario.name, index=index)
+    record.queue_ms = (time.perf_counter() - arrived) * 1000
+    if session is not None:
+        session.begin(record, arrived)
+    conversation_id = session.conversation_id if session else str(uuid.uuid4())
+    try:
+        response = await scenario.send(client, index, conversation_id)
+        record.status = response.status_code
+        body = response.json() if "json" in response.headers.get("content-type", "") else None
+        if record.status >= 400:
+            record.error = f"HTTP {record.status}"
+        elif isinstance(body, dict) and body.get("status") == "error":
+            record.error = str(body.get("message", "error"))[:200]
+    except httpx.HTTPError as e:
+        record.error = f"{type(e).__name__}: {e}"[:200]
+    record.latency_ms = (time.perf_counter() - arrived) * 1000
+    if session is not None:
+        # The final events can trail the HTTP response slightly
+        try:
+            await asyncio.wait_for(session.completed.wait(), completion_grace)
+            record.completed_event = True
+        except asyncio.TimeoutError:
+            record.completed_event = False
+        session.record = None
+    return record
+
+
+async def run_scenario(base_url: str, name: str, args: argparse.Namespace) -> dict:
+    """Drive one scenario at the target arrival rate and summarise it."""
+    scenario = Scenario(name)
+    limits = httpx.Limits(max_connections=args.sessions + 8, max_keepalive_connections=args.sessions)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await scenario.setup(client)
+        sessions: list[Session] = []
+        if scenario.uses_ws:
+            sessions = [Session(base_url) for _ in range(args.sessions)]
+            await asyncio.gather(*(session.open() for session in sessions))
+        idle: asyncio.Queue = asyncio.Queue()
+        for slot in sessions or [None] * args.sessions:
+            idle.put_nowait(slot)
+
+        async def handle(index: int, arrived: float) -> RequestRecord:
+            slot = await idle.get()
+            try:
+                return await _serve(client, scenario, slot, index, arrived, args.completion_grace)
+            finally:
+                idle.put_nowait(slot)
+
+        started = time.perf_counter()
+        tasks = []
+        for index, offset in enumerate(arrival_times(args.rate, args.duration, not args.constant, args.seed)):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(handle(index, time.perf_counter())))
+        records = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(session.close() for session in sessions))
+
+    return {"summary": summarize(records, elapsed, scenario.uses_ws), "requests": records}
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(pct: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))], 1)
+
+    return {
+        "p50": pick(50),
+        "p90": pick(90),
+        "p99": pick(99),
+        "mean": round(statistics.fmean(ordered), 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+def summarize(records: list[RequestRecord], elapsed: float, uses_ws: bool) -> dict:
+    """Aggregate request records into the comparable numbers for one scenario."""
+    ok = [record for record in records if record.ok]
+    errors: dict[str, int] = {}
+    for record in records:
+        if not record.ok:
+            key = str(record.status) if record.status else "transport"
+            errors[key] = errors.get(key, 0) + 1
+    summary = {
+        "requests": len(records),
+        "succeeded": len(ok),
+        "error_rate": round(1 - len(ok) / len(records), 4) if records else 0.0,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else None,
+        "latency_ms": _percentiles([record.latency_ms for record in ok]),
+        "queue_ms": _percentiles([record.queue_ms for record in records]),
+    }
+    if uses_ws:
+        events = sum(record.events for record in records)
+        lost = sum(record.events_lost for record in records)
+        summary.update(
+            first_event_ms=_percentiles([r.first_event_ms for r in ok if r.first_event_ms is not None]),
+            first_token_ms=_percentiles([r.first_token_ms for r in ok if r.first_token_ms is not None]),
+            events=events,
+            events_lost=lost,
+            event_loss_rate=round(lost / (events + lost), 4) if events + lost else 0.0,
+            replay_gaps=sum(record.replay_gaps for record in records),
+            missing_completion=sum(1 for record in ok if record.completed_event is False),
+        )
+    return summary
+
+
+# ============ Self-hosted backend ============
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def spawn_backend(args: argparse.Namespace) -> Iterator[str]:
+    """Start the fake Azure OpenAI and a uvicorn backend pointed at it; yields the base URL."""
+    fake = FakeAzureOpenAI(config_from_args(args))
+    with ExitStack() as stack:
+        data_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="oneshot-load"))
+        endpoint = stack.enter_context(fake.serve())
+        port = _free_port()
+        env = {
+            **os.environ,
+            "AZURE_OPENAI_ENDPOINT": endpoint,
+            "AZURE_OPENAI_API_KEY": "load",
+            "SSL_CERT_FILE": fake.cert_file,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{data_dir}/load.db",
+            "AGENT_MCP_ENABLED": "false",
+            "APP_DEBUG": "false",
+        }
+        command = [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ]
+        process = subprocess.Popen(command, env=env)
+        stack.callback(process.wait, 10)
+        stack.callback(process.terminate)
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("Backend failed to start")
+            time.sleep(0.2)
+        yield base_url
+
+
+# ============ CLI ============
+
+
+async def _run_all(base_url: str, scenarios: list[str], args: argparse.Namespace) -> dict:
+    return {name: await run_scenario(base_url, name, args) for name in scenarios}
+
+
+def _print_summary(name: str, summary: dict) -> None:
+    latency = summary["latency_ms"]
+    print(
+        f"{name:<10} {summary['succeeded']}/{summary['requests']} ok  "
+        f"{summary['throughput_rps']} req/s  error rate {summary['error_rate']:.1%}  "
+        f"latency p50 {latency['p50']} p99 {latency['p99']} ms  queue p99 {summary['queue_ms']['p99']} ms"
+    )
+    if "events" in summary:
+        print(
+            f"{'':<10} first token p50 {summary['first_token_ms']['p50']} p99 {summary['first_token_ms']['p99']} ms  "
+            f"events {summary['events']} lost {summary['events_lost']} ({summary['event_loss_rate']:.2%})  "
+            f"gaps {summary['replay_gaps']}  missing completion {summary['missing_completion']}"
+        )
+    if summary["errors"]:
+        print(f"{'':<10} errors {summary['errors']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Backend to load")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="chat")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions (WebSocket subscriptions)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Target arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals per scenario")
+    parser.add_argument("--constant", action="store_true", help="Evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request HTTP timeout (s)")
+    parser.add_argument("--completion-grace", type=float, default=2.0,
+                        help="Seconds to wait after the response for the final WebSocket event")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--raw", action="store_true", help="Include per-request records in the report")
+    parser.add_argument("--spawn", action="store_true",
+                        help="Start a backend on the fake Azure OpenAI instead of using --base-url")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    with ExitStack() as stack:
+        base_url = stack.enter_context(spawn_backend(args)) if args.spawn else args.base_url.rstrip("/")
+        results = asyncio.run(_run_all(base_url, scenarios, args))
+
+    report: dict[str, Any] = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "target": "spawned" if args.spawn else base_url,
+        "config": {
+            key: getattr(args, key)
+            for key in ("sessions", "rate", "duration", "constant", "seed", "workers")
+        },
+        "scenarios": {},
+    }
+    if args.spawn:
+        report["config"]["fake"] = {"ttft_ms": args.ttft_ms, "tokens_per_second": args.tokens_per_second,
+                                    "error_rate": args.error_rate}
+    for name, result in results.items():
+        entry: dict[str, Any] = {"summary": result["summary"]}
+        if args.raw:
+            entry["requests"] = [asdict(record) for record in result["requests"]]
+        report["scenarios"][name] = entry
+        _print_summary(name, result["summary"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
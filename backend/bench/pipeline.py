@@ -0,0 +1,307 @@
+"""Benchmark the agent pipeline end to end against the fake Azure OpenAI server.
+
+Starts ``bench.fake_azure_openai`` in a background thread, points the backend
+at it (API key auth, MCP servers off, a throwaway SQLite database) and drives
+the real routes in-process through ``httpx.ASGITransport``:
+
+- ``chat``: ``POST /api/chat/conversations/{id}/messages`` (``process_message``)
+- ``briefing``: ``POST /api/research/briefing``
+- ``proposal``: ``POST /api/proposals/generate``
+
+For each scenario it reports throughput, p50/p99/mean latency, time to first
+WebSocket event and first ``stream.token``, and a per-stage breakdown of model
+time, attributed to agents by their system prompt.
+
+    python -m bench.pipeline [--scenario all] [--requests 20] [--concurrency 4] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from bench.fake_azure_openai import CallRecord, FakeAzureOpenAI, add_fake_arguments, config_from_args
+
+SCENARIOS = ("chat", "briefing", "proposal")
+
+_CHAT_MESSAGES = (
+    "Write a LinkedIn post announcing our new analytics dashboard",
+    "Research the latest trends in B2B social media marketing",
+    "Review this tweet for brand voice: shipping faster than ever, try it today",
+    "Plan a week of posts for our product launch across all platforms",
+)
+
+
+@dataclass
+class RequestResult:
+    """Timings for one benchmarked request, in milliseconds from submission."""
+    scenario: str
+    latency_ms: float
+    ok: bool
+    first_event_ms: Optional[float] = None
+    first_token_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class _Timeline:
+    started: float
+    first_event: Optional[float] = None
+    first_token: Optional[float] = None
+
+
+@dataclass
+class _EventClock:
+    """Stamps the first event and first stream.token per conversation."""
+    timelines: dict[str, _Timeline] = field(default_factory=dict)
+
+    def observe(self, conversation_id: str, event_type: str) -> None:
+        timeline = self.timelines.get(conversation_id)
+        if timeline is None:
+            return
+        now = time.perf_counter()
+        if timeline.first_event is None:
+            timeline.first_event = now
+        if event_type == "stream.token" and timeline.first_token is None:
+            timeline.first_token = now
+
+
+def _configure_environment(endpoint: str, cert_file: str, data_dir: str) -> None:
+    """Point the backend at the fake server; must run before ``app`` is imported."""
+    os.environ.update(
+        AZURE_OPENAI_ENDPOINT=endpoint,
+        AZURE_OPENAI_API_KEY="bench",
+        SSL_CERT_FILE=cert_file,
+        DATABASE_URL=f"sqlite+aiosqlite:///{data_dir}/bench.db",
+        AGENT_MCP_ENABLED="false",
+        APP_DEBUG="false",
+    )
+
+
+def _install_event_clock(clock: _EventClock) -> None:
+    from app.api.websocket import manager
+    from app.services.event_bus import InProcessEventBus
+
+    class RecordingBus(InProcessEventBus):
+        local_only = False  # Keep events flowing with no sockets attached
+
+        def publish(self, conversation_id, event_type, data, timestamp, seq) -> None:
+            clock.observe(conversation_id, event_type)
+            super().publish(conversation_id, event_type, data, timestamp, seq)
+
+    bus = RecordingBus()
+    bus.bind(manager.deliver)
+    manager.bus = bus
+
+
+def _request_for(scenario: str, index: int, conversation_id: str) -> tuple[str, dict, dict]:
+    """Return (path, params, json body) for one request of a scenario."""
+    if scenario == "chat":
+        message = _CHAT_MESSAGES[index % len(_CHAT_MESSAGES)]
+        # The messages repeat; bypass the response cache so every request runs the pipeline
+        body = {"content": message, "metadata": {"cache": False}}
+        return f"/api/chat/conversations/{conversation_id}/messages", {}, body
+    if scenario == "briefing":
+        return (
+            "/api/research/briefing",
+            {"session_id": conversation_id},
+            {"company_name": f"Bench Corp {index}", "industry": "software"},
+        )
+    return (
+        "/api/proposals/generate",
+        {},
+        {"topic": f"Product launch {index}", "platforms": ["linkedin", "twitter", "instagram"]},
+    )
+
+
+async def _run_one(client, clock: _EventClock, scenario: str, index: int) -> RequestResult:
+    conversation_id = str(uuid.uuid4())
+    path, params, body = _request_for(scenario, index, conversation_id)
+    timeline = clock.timelines[conversation_id] = _Timeline(time.perf_counter())
+    error = None
+    try:
+        response = await client.post(path, params=params, json=body)
+        ok = response.status_code < 400 and response.json().get("status") != "error"
+        if not ok:
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+    except Exception as e:
+        ok, error = False, str(e)
+    finished = time.perf_counter()
+    clock.timelines.pop(conversation_id, None)
+
+    def since_start(moment: Optional[float]) -> Optional[float]:
+        return (moment - timeline.started) * 1000 if moment is not None else None
+
+    return RequestResult(
+        scenario=scenario,
+        latency_ms=(finished - timeline.started) * 1000,
+        ok=ok,
+        first_event_ms=since_start(timeline.first_event),
+        first_token_ms=since_start(timeline.first_token),
+        error=error,
+    )
+
+
+def _percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return round(ordered[rank], 1)
+
+
+def _distribution(values: list[float]) -> dict:
+    return {
+        "p50": _percentile(values, 50),
+        "p99": _percentile(values, 99),
+        "mean": round(statistics.fmean(values), 1) if values else None,
+    }
+
+
+def _stage_of(call: CallRecord, prompts: dict[str, str]) -> str:
+    for agent, prompt in prompts.items():
+        if call.system and call.system.startswith(prompt[:200]):
+            return f"{agent}.{call.api}"
+    return f"other.{call.api}"
+
+
+def stage_breakdown(calls: list[CallRecord], requests: int) -> dict:
+    """Group model calls by agent and API; times are per benchmarked request."""
+    from app.agents.prompts import AGENT_PROMPTS
+
+    stages: dict[str, list[CallRecord]] = {}
+    for call in calls:
+        stages.setdefault(_stage_of(call, AGENT_PROMPTS), []).append(call)
+    breakdown = {}
+    for stage, records in sorted(stages.items()):
+        durations = [record.duration_ms for record in records]
+        breakdown[stage] = {
+            "calls": len(records),
+            "errors": sum(1 for record in records if record.status >= 400),
+            "ms_per_request": round(sum(durations) / max(requests, 1), 1),
+            "call_ms": _distribution(durations),
+            "tokens_per_request": round(
+                sum(record.prompt_tokens + record.completion_tokens for record in records) / max(requests, 1)
+            ),
+        }
+    return breakdown
+
+
+async def run_scenario(
+    fake: FakeAzureOpenAI, scenario: str, requests: int, concurrency: int, warmup: int = 1
+) -> dict:
+    """Run ``requests`` requests of one scenario, at most ``concurrency`` at a time.
+
+    ``warmup`` requests run first and are left out of the results, so agent
+    construction and first-import costs don't land in p99.
+    """
+    import httpx
+    from app.main import app
+
+    clock = _EventClock()
+    _install_event_clock(clock)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for index in range(warmup):
+            await _run_one(client, clock, scenario, requests + index)
+        calls_before = len(fake.calls)
+
+        async def bounded(index: int) -> RequestResult:
+            async with semaphore:
+                return await _run_one(client, clock, scenario, index)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+    succeeded = [result for result in results if result.ok]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(results) - len(succeeded),
+        "sample_error": next((result.error for result in results if result.error), None),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(succeeded) / wall, 3) if wall else None,
+        "latency_ms": _distribution([result.latency_ms for result in succeeded]),
+        "first_event_ms": _distribution([r.first_event_ms for r in succeeded if r.first_event_ms is not None]),
+        "first_token_ms": _distribution([r.first_token_ms for r in succeeded if r.first_token_ms is not None]),
+        "stages": stage_breakdown(fake.calls[calls_before:], requests),
+    }
+
+
+async def _run(fake: FakeAzureOpenAI, scenarios: list[str], requests: int, concurrency: int, warmup: int) -> dict:
+    from app.models.database import engine, init_db
+
+    await init_db()
+    try:
+        return {
+            scenario: await run_scenario(fake, scenario, requests, concurrency, warmup)
+            for scenario in scenarios
+        }
+    finally:
+        await engine.dispose()
+
+
+def _print_report(report: dict) -> None:
+    print(f"fake model: {report['fake']}")
+    for scenario, result in report["scenarios"].items():
+        latency, ttft = result["latency_ms"], result["first_token_ms"]
+        print(
+            f"\n{scenario}: {result['requests']} requests x{result['concurrency']}  "
+            f"{result['throughput_rps']} req/s  errors {result['errors']}"
+        )
+        print(f"  latency ms    p50 {latency['p50']}  p99 {latency['p99']}  mean {latency['mean']}")
+        print(f"  first event   p50 {result['first_event_ms']['p50']}  first token p50 {ttft['p50']}")
+        if result["sample_error"]:
+            print(f"  error: {result['sample_error']}")
+        print(f"  {'stage':<30}{'calls':>7}{'ms/req':>10}{'call p50':>10}{'call p99':>10}{'tok/req':>9}")
+        for stage, row in result["stages"].items():
+            print(
+                f"  {stage:<30}{row['calls']:>7}{row['ms_per_request']:>10}"
+                f"{row['call_ms']['p50']:>10}{row['call_ms']['p99']:>10}{row['tokens_per_request']:>9}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed requests per scenario")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    fake = FakeAzureOpenAI(config_from_args(args))
+    with tempfile.TemporaryDirectory(prefix="oneshot-bench") as data_dir, fake.serve() as endpoint:
+        _configure_environment(endpoint, fake.cert_file, data_dir)
+        results = asyncio.run(_run(fake, scenarios, args.requests, args.concurrency, args.warmup))
+
+    config = fake.config
+    report = {
+        "fake": {
+            "ttft_p50_ms": config.ttft.median_ms,
+            "ttft_p99_ms": config.ttft.p99_ms,
+            "tokens_per_second": config.tokens_per_second,
+            "output_tokens": config.output_tokens,
+            "error_rate": config.error_rate,
+            "time_scale": config.time_scale,
+        },
+        "scenarios": results,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
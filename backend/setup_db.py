@@ -18,6 +18,8 @@ Usage:
     python setup_db.py clear         # Delete all data (keep tables)
     python setup_db.py status        # Show database statistics
     python setup_db.py migrate       # Run any pending migrations
+    python setup_db.py backfill      # Rebuild analytics rollups from agent traces
+    python setup_db.py train-intent  # Train the local intent classifier from agent traces
 
 Environment Variables:
     DATABASE_URL - SQLAlchemy connection string (default: sqlite+aiosqlite:///./data/oneshot.db)
@@ -162,6 +164,8 @@ async def clear_database(verbose: bool = True) -> bool:
             Conversation,
             Message,
             AgentTrace,
+            AgentRollup,
+            LatencyHistogram,
             Document,
             KnowledgeItem,
             Engagement,
@@ -181,6 +185,8 @@ async def clear_database(verbose: bool = True) -> bool:
                 ("Knowledge Items", KnowledgeItem),
                 ("Engagements", Engagement),
                 ("Metrics", Metric),
+                ("Agent Rollups", AgentRollup),
+                ("Latency Histograms", LatencyHistogram),
             ]
             
             counts = {}
@@ -201,6 +207,8 @@ async def clear_database(verbose: bool = True) -> bool:
                 KnowledgeItem,
                 Engagement,
                 Metric,
+                AgentRollup,
+                LatencyHistogram,
             ]
             
             for model in delete_order:
@@ -285,6 +293,8 @@ async def show_status(verbose: bool = True) -> dict:
             Conversation,
             Message,
             AgentTrace,
+            AgentRollup,
+            LatencyHistogram,
             Document,
             KnowledgeItem,
             Engagement,
@@ -325,6 +335,8 @@ async def show_status(verbose: bool = True) -> dict:
                 ("Knowledge Items", KnowledgeItem),
                 ("Engagements", Engagement),
                 ("Metrics", Metric),
+                ("Agent Rollups", AgentRollup),
+                ("Latency Histograms", LatencyHistogram),
             ]
             
             if verbose:
@@ -389,6 +401,72 @@ async def run_migrations(verbose: bool = True) -> bool:
         return False
 
 
+async def backfill_rollups(verbose: bool = True, days: int | None = None) -> bool:
+    """Rebuild analytics rollups from raw agent traces."""
+    if verbose:
+        print_header("Backfilling Analytics Rollups")
+
+    try:
+        from datetime import timedelta
+
+        from app.models.database import AsyncSessionLocal, init_db
+        from app.services.rollup_service import get_rollup_service
+
+        await init_db()
+
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        if verbose:
+            scope = f"the last {days} days" if days else "all history"
+            print_status(f"Rebuilding hourly and daily rollups and latency histograms for {scope}...", "pending")
+
+        async with AsyncSessionLocal() as db:
+            count = await get_rollup_service().backfill(db, since=since)
+            await db.commit()
+
+        if verbose:
+            print_status(f"Rolled up {count} finished traces", "success")
+
+        return True
+
+    except Exception as e:
+        print_status(f"Backfill failed: {e}", "error")
+        return False
+
+
+async def train_intent_classifier(verbose: bool = True) -> bool:
+    """Train the local intent classifier on the intents the LLM assigned to past messages."""
+    if verbose:
+        print_header("Training Intent Classifier")
+
+    try:
+        from app.models.database import AsyncSessionLocal, init_db
+        from app.services.intent_classifier import get_intent_classifier, load_training_examples, train
+
+        await init_db()
+        async with AsyncSessionLocal() as db:
+            examples = await load_training_examples(db)
+        if verbose:
+            print_status(f"Found {len(examples)} LLM-classified messages in agent traces", "info")
+
+        model = train(examples)
+        classifier = get_intent_classifier()
+        classifier.save(model)
+
+        if verbose:
+            metrics = model.metrics
+            print_status(f"Saved model to {classifier.model_path}", "success")
+            print(f"    Intents:      {metrics['by_intent']}")
+            print(f"    Accuracy:     {metrics['accuracy']} (5-fold cross-validation)")
+            print(f"    Hit rate:     {metrics['coverage']} at threshold {metrics['threshold']}")
+            print(f"    Accuracy on hits: {metrics['accuracy_when_confident']}")
+
+        return True
+
+    except Exception as e:
+        print_status(f"Training failed: {e}", "error")
+        return False
+
+
 async def main() -> int:
     """Main entry point."""
     parser = argparse.ArgumentParser(
@@ -402,12 +480,14 @@ Examples:
   python setup_db.py reset --seed      # Reset and seed fresh
   python setup_db.py status            # Show database info
   python setup_db.py seed --no-embeddings  # Seed without embeddings (faster)
+  python setup_db.py backfill --days 7     # Rebuild last week's analytics rollups
+  python setup_db.py train-intent          # Train the local intent classifier
         """
     )
     
     parser.add_argument(
         "command",
-        choices=["init", "seed", "reset", "clear", "status", "migrate"],
+        choices=["init", "seed", "reset", "clear", "status", "migrate", "backfill", "train-intent"],
         help="Database operation to perform"
     )
     
@@ -423,6 +503,13 @@ Examples:
         help="Skip generating embeddings during seeding (faster)"
     )
     
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=None,
+        help="Only backfill rollups for the last N days (default: all history)"
+    )
+    
     parser.add_argument(
         "--quiet", "-q",
         action="store_true",
@@ -477,6 +564,12 @@ Examples:
     elif args.command == "migrate":
         success = await run_migrations(verbose)
     
+    elif args.command == "backfill":
+        success = await backfill_rollups(verbose, days=args.days)
+
+    elif args.command == "train-intent":
+        success = await train_intent_classifier(verbose)
+    
     return 0 if success else 1
 
 
@@ -374,6 +374,74 @@ class TestAdvisorAgent:
             assert tokens == 80
             mock_llm.complete_with_usage.assert_awaited_once()
 
+    async def test_advisor_reviews_drafts_as_they_arrive(self):
+        """Each queued draft is reviewed on arrival, overlapping with the drafts still to come."""
+        import asyncio
+        import time
+        from unittest.mock import AsyncMock
+
+        async def complete(prompt, system_prompt, temperature, **kwargs):
+            await asyncio.sleep(0.1)
+            platform = "Twitter/X" if "Twitter/X draft" in prompt else "LinkedIn"
+            response = MagicMock()
+            response.content = f"Score 8 for {platform}"
+            response.tokens_used = 10
+            return response
+
+        mock_llm = MagicMock()
+        mock_llm.complete_with_usage = AsyncMock(side_effect=complete)
+        drafts = asyncio.Queue()
+        reviewed = []
+
+        async def on_review(platform, review):
+            reviewed.append(platform)
+
+        async def scribe():
+            drafts.put_nowait(("twitter", "## Twitter/X\n\nShip it"))
+            await asyncio.sleep(0.1)
+            drafts.put_nowait(("linkedin", "## LinkedIn\n\nWe shipped"))
+            drafts.put_nowait(None)
+
+        with patch("app.agents.advisor.create_agent", side_effect=Exception("Auth")), \
+             patch("app.agents.advisor.get_llm_service", return_value=mock_llm):
+            from app.agents.advisor import run_advisor
+            started = time.perf_counter()
+            (text, tokens, trace), _ = await asyncio.gather(
+                run_advisor("Review posts", {"drafts": drafts, "on_review": on_review,
+                                             "previous_results": {"memory": "Brand voice"}}),
+                scribe(),
+            )
+            elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.28  # Twitter/X review overlaps with the LinkedIn draft
+        assert reviewed == ["twitter", "linkedin"]
+        assert text.startswith("## Twitter/X Review\n\nScore 8 for Twitter/X")
+        assert "## LinkedIn Review\n\nScore 8 for LinkedIn" in text
+        assert tokens == 20
+        assert list(trace["platforms"]) == ["twitter", "linkedin"]
+
+    async def test_advisor_reviews_context_without_drafts(self):
+        """If the scribe produces no drafts, the advisor falls back to one whole-context review."""
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        mock_llm = MagicMock()
+        mock_response = MagicMock()
+        mock_response.content = "Compliance review"
+        mock_response.tokens_used = 80
+        mock_llm.complete_with_usage = AsyncMock(return_value=mock_response)
+        drafts = asyncio.Queue()
+        drafts.put_nowait(None)
+
+        with patch("app.agents.advisor.create_agent", side_effect=Exception("Auth")), \
+             patch("app.agents.advisor.get_llm_service", return_value=mock_llm):
+            from app.agents.advisor import run_advisor
+            text, tokens, _ = await run_advisor("Review", {"drafts": drafts, "previous_results": {"memory": "Voice"}})
+
+        assert text == "Compliance review"
+        assert tokens == 80
+        assert "Memory Output:\nVoice" in mock_llm.complete_with_usage.await_args.kwargs["prompt"]
+
 
 class TestMemoryAgent:
     """Tests for the memory agent module."""
@@ -478,10 +546,47 @@ class TestScribeAgent:
             from app.agents.scribe import run_scribe
             await run_scribe("Write posts", {"platforms": ["twitter", "instagram"]})
 
-            call_args = mock_llm.complete_with_usage.call_args
-            prompt = call_args.kwargs.get("prompt", "")
-            assert "twitter" in prompt
-            assert "instagram" in prompt
+            # One completion per platform
+            prompts = [call.kwargs.get("prompt", "") for call in mock_llm.complete_with_usage.call_args_list]
+            assert len(prompts) == 2
+            assert any("twitter" in prompt and "instagram" not in prompt for prompt in prompts)
+            assert any("instagram" in prompt and "twitter" not in prompt for prompt in prompts)
+
+    async def test_scribe_drafts_platforms_concurrently(self):
+        """Platforms are drafted in parallel, streamed as they finish and assembled in order."""
+        import asyncio
+        import time
+        from unittest.mock import AsyncMock
+
+        delays = {"linkedin": 0.15, "twitter": 0.1, "instagram": 0.05}
+
+        async def complete(prompt, system_prompt, temperature, **kwargs):
+            platform = next(p for p in delays if f"'{p}_draft.md'" in prompt)
+            await asyncio.sleep(delays[platform])
+            response = MagicMock()
+            response.content = f"## {platform} post"
+            response.tokens_used = 10
+            return response
+
+        mock_llm = MagicMock()
+        mock_llm.complete_with_usage = AsyncMock(side_effect=complete)
+        streamed = []
+
+        async def on_draft(platform, draft):
+            streamed.append(platform)
+
+        with patch("app.agents.scribe.create_agent", side_effect=Exception("Auth")), \
+             patch("app.agents.scribe.get_llm_service", return_value=mock_llm):
+            from app.agents.scribe import run_scribe
+            started = time.perf_counter()
+            text, tokens, trace = await run_scribe("Write posts", {"on_draft": on_draft})
+            elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.25  # Not 0.3 s of back-to-back completions
+        assert streamed == ["instagram", "twitter", "linkedin"]
+        assert text == "## linkedin post\n\n## twitter post\n\n## instagram post"
+        assert tokens == 30
+        assert list(trace["platforms"]) == ["linkedin", "twitter", "instagram"]
 
 
 # ============================================================
@@ -610,3 +715,309 @@ class TestAgentPrompts:
         for agent, pattern in patterns.items():
             assert pattern.lower() in AGENT_PROMPTS[agent].lower(), \
                 f"{agent} prompt should mention {pattern}"
+
+
+# ============================================================
+# Handoff Context Budgeting
+# ============================================================
+
+class TestContextBuilder:
+    """Tests for token-budgeted handoff context."""
+
+    _FINDINGS = (
+        "LinkedIn engagement rose 23% in Q3 for B2B brands. "
+        "Short-form video is the fastest growing format across platforms. "
+        "Carousel posts drive more saves than single images on Instagram. "
+        "Posting on Tuesday mornings correlates with higher organic reach."
+    )
+
+    def test_count_tokens(self):
+        from app.agents.context_builder import count_tokens
+        assert count_tokens("") == 0
+        assert 8 <= count_tokens("Short-form video is the fastest growing format.") <= 14
+
+    def test_under_budget_is_unchanged(self):
+        from app.agents.context_builder import compress
+        assert compress(self._FINDINGS, 500) == self._FINDINGS
+
+    def test_compress_keeps_whole_sentences_and_rich_blocks(self):
+        from app.agents.context_builder import compress, count_tokens
+        chart = '```chart-bar\n{"title": "Reach", "data": [1, 2, 3]}\n```'
+        filler = " ".join(f"Observation number {i} about audience behaviour changes." for i in range(40))
+        text = f"{self._FINDINGS}\n\n{chart}\n\n{filler}"
+
+        result = compress(text, 120)
+
+        assert count_tokens(result) <= 120
+        assert chart in result
+        assert "condensed from" in result
+        body = result.replace(chart, "").rsplit("[condensed", 1)[0]
+        sentences = [s.strip() for s in body.replace("\n", " ").split(". ") if s.strip()]
+        assert all(s in text for s in sentences)
+
+    def test_single_long_sentence_is_marked_not_chopped_silently(self):
+        from app.agents.context_builder import compress
+        result = compress("word " * 400, 30)
+        assert "…" in result
+        assert "condensed from" in result
+
+    def test_duplicates_dropped_from_lower_priority_section(self):
+        from app.agents.context_builder import ContextSection, build_context
+        built = build_context([
+            ContextSection("strategist", self._FINDINGS, budget=500, priority=0),
+            ContextSection("researcher", self._FINDINGS + " Only the researcher says this long sentence.", 500, 1),
+        ])
+        assert built.text.count("LinkedIn engagement rose 23%") == 1
+        assert "Only the researcher says this" in built.text
+        assert built.stats["researcher"]["tokens_out"] < built.stats["researcher"]["tokens_in"]
+
+    def test_slack_goes_to_higher_priority_sections(self):
+        from app.agents.context_builder import ContextSection, build_context
+        long_text = " ".join(f"Distinct finding {i} about platform specific engagement trends." for i in range(60))
+        built = build_context([
+            ContextSection("memory", "Brand voice: confident.", budget=200, priority=1),
+            ContextSection("strategist", long_text, budget=200, priority=0),
+        ])
+        assert built.stats["strategist"]["compressed"]
+        assert 200 < built.stats["strategist"]["tokens_out"] <= 400
+
+    def test_handoff_context_uses_titles_and_order(self):
+        from app.agents.context_builder import handoff_context
+        text = handoff_context(
+            "scribe",
+            {"memory": "Brand voice: professional", "strategist": "Focus on thought leadership"},
+            titles={"strategist": "Content Strategy", "memory": "Brand Context", "analyst": "Engagement Data"},
+            template="## {title}\n{text}",
+        )
+        assert text == "## Content Strategy\nFocus on thought leadership\n\n## Brand Context\nBrand voice: professional"
+
+
+# ============================================================
+# Speculative Wave 1
+# ============================================================
+
+class TestMetricsMiddleware:
+    """Tests for metering MAF agent model calls."""
+
+    async def test_streamed_call_metered_when_the_stream_ends(self, monkeypatch):
+        """Latency and usage of a streaming run are recorded once the stream is drained, not at setup."""
+        import asyncio
+        from types import SimpleNamespace
+        from agent_framework import ChatResponseUpdate, TextContent, UsageContent, UsageDetails
+        from app.agents.middleware import llm_metrics_middleware, route_metrics_middleware
+        from app.services import model_router
+        from app.services.token_usage import usage_ledger
+
+        monkeypatch.setattr(model_router, "_model_router", None)
+
+        async def updates():
+            await asyncio.sleep(0.05)
+            yield ChatResponseUpdate(contents=[TextContent(text="Hello")])
+            yield ChatResponseUpdate(contents=[UsageContent(details=UsageDetails(input_token_count=12, output_token_count=3))])
+
+        async def final(context):
+            context.result = updates()
+
+        context = SimpleNamespace(chat_client=SimpleNamespace(model_id="gpt-4o"), is_streaming=True, result=None)
+        route_metrics = route_metrics_middleware("researcher")
+        with usage_ledger("agent") as ledger:
+            await llm_metrics_middleware(context, lambda c: route_metrics(c, final))
+            assert ledger.calls == 0  # Nothing generated yet
+            chunks = [update async for update in context.result]
+
+        assert len(chunks) == 2
+        assert ledger.total_usage.prompt_tokens == 12 and ledger.total_usage.completion_tokens == 3
+        stats = model_router.get_model_router().stats()["routes"]["researcher"]
+        assert stats["calls"] == 1 and stats["prompt_tokens"] == 12
+        assert stats["latency_ms"]["p50"] >= 50
+
+
+class TestSpeculativeWave1:
+    """Tests for agents started while intent is being classified."""
+
+    @staticmethod
+    def _fake_execute(durations: dict[str, float]):
+        import asyncio
+        from app.services.token_usage import record_usage
+
+        async def execute(name, task, context, conversation_id, ws_manager, db, queued_at=None):
+            record_usage("gpt-4o", 100, 0)  # Prompt sent as soon as the agent starts
+            await asyncio.sleep(durations[name])
+            record_usage("gpt-4o", 0, 50)
+            return f"{name} result for {context['platforms']}", 150, {}
+        return execute
+
+    async def test_adopts_needed_and_cancels_the_rest(self):
+        import asyncio
+        from unittest.mock import AsyncMock
+        from app.agents import orchestrator
+        from app.services.token_usage import usage_ledger
+
+        ws_manager = MagicMock()
+        ws_manager.send_agent_completed = AsyncMock()
+        with patch.object(orchestrator, "_execute_agent", self._fake_execute({"researcher": 0, "memory": 10})), \
+                usage_ledger("request") as request:
+            speculation = orchestrator._Speculation(
+                ["researcher", "memory"], "Research trends on Instagram", "conv-1", ws_manager, db=None
+            )
+            await asyncio.sleep(0.01)  # Both start; memory is still waiting on its model call
+            adopted = await speculation.resolve(["researcher", "analyst"])
+            result, _, _ = await speculation.tasks["researcher"]
+
+        assert adopted == ["researcher"]
+        assert result == "researcher result for ['instagram']"
+        assert speculation.tasks["memory"].cancelled()
+        summary = speculation.summary()
+        assert summary["outcomes"] == {"memory": "cancelled", "researcher": "adopted"}
+        assert summary["wasted_tokens"] == 100
+        assert summary["wasted_cost_usd"] > 0
+        assert request.total_usage.total_tokens == 250
+        ws_manager.send_agent_completed.assert_awaited_once()
+
+    async def test_finished_but_unneeded_runs_are_discarded(self):
+        import asyncio
+        from app.agents import orchestrator
+
+        with patch.object(orchestrator, "_execute_agent", self._fake_execute({"researcher": 0, "memory": 0})):
+            speculation = orchestrator._Speculation(["researcher", "memory"], "Hi", "conv-1", MagicMock(), db=None)
+            await asyncio.sleep(0.01)
+            assert await speculation.resolve(["memory"]) == ["memory"]
+
+        summary = speculation.summary()
+        assert summary["outcomes"]["researcher"] == "discarded"
+        assert summary["wasted_tokens"] == 150
+        assert summary["head_start_ms"] >= 10
+
+
+class TestProgressiveSynthesis:
+    """Tests for the response written section by section as agents finish."""
+
+    @staticmethod
+    def _llm(delays: dict[str, float]):
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        async def stream(prompt, system_prompt, on_token, **kwargs):
+            section = next(name for name in delays if f"_{name}_" in prompt)
+            await asyncio.sleep(delays[section])
+            for token in (f"{section} ", "text"):
+                await on_token(token)
+            return f"{section} text"
+
+        llm = MagicMock()
+        llm.stream_with_callback = AsyncMock(side_effect=stream)
+        return llm
+
+    async def test_overview_streams_before_later_agents_finish(self):
+        import asyncio
+        from app.agents import orchestrator
+
+        sections = (
+            ("overview", ("researcher", "memory"), "_overview_"),
+            ("platforms", ("scribe",), "_platforms_"),
+            ("compliance", ("advisor",), "_compliance_"),
+        )
+        streamed = []
+
+        async def on_token(token):
+            streamed.append(token)
+
+        intent = {"target_platforms": ["linkedin"], "primary_intent": "content_creation"}
+        with patch.object(orchestrator, "_SYNTHESIS_SECTIONS", sections):
+            synthesis = orchestrator._ProgressiveSynthesis(
+                self._llm({"overview": 0.05, "platforms": 0, "compliance": 0}), "Write a post", intent,
+                ["researcher", "memory", "scribe", "advisor"], on_token,
+            )
+            synthesis.deliver("researcher", "Trends")
+            synthesis.deliver("memory", "Voice")
+            await asyncio.sleep(0.1)
+            assert streamed == ["overview ", "text"]  # Scribe and advisor still running
+
+            synthesis.deliver("advisor", "Score 9")  # Written now, streamed after the platform cards
+            await asyncio.sleep(0.01)
+            assert streamed == ["overview ", "text"]
+            synthesis.deliver("scribe", "## LinkedIn")
+            response = await synthesis.finish()
+
+        assert response == "overview text\n\nplatforms text\n\ncompliance text"
+        assert "".join(streamed) == response
+
+    async def test_sections_without_agents_in_the_run_are_skipped(self):
+        from app.agents import orchestrator
+
+        async def on_token(token):
+            pass
+
+        intent = {"target_platforms": ["instagram"], "primary_intent": "content_review"}
+        llm = self._llm({"overview": 0, "compliance": 0})
+        with patch.object(orchestrator, "_SYNTHESIS_SECTIONS", (
+            ("overview", ("researcher", "memory"), "_overview_"),
+            ("platforms", ("scribe",), "_platforms_"),
+            ("compliance", ("advisor",), "_compliance_"),
+        )):
+            synthesis = orchestrator._ProgressiveSynthesis(llm, "Review this", intent, ["memory", "advisor"], on_token)
+            synthesis.deliver("memory", "Voice")
+            synthesis.deliver("advisor", "Score 7")
+            response = await synthesis.finish()
+
+        assert response == "overview text\n\ncompliance text"
+        assert llm.stream_with_callback.await_count == 2
+        assert "=== MEMORY ===\nVoice" in llm.stream_with_callback.await_args_list[0].kwargs["prompt"]
+
+
+    async def test_platform_section_gets_the_whole_scribe_output(self):
+        """A long scribe draft should reach the platforms section uncompressed."""
+        from app.agents import orchestrator
+        from app.agents.context_builder import HANDOFF_BUDGETS, count_tokens
+
+        async def on_token(token):
+            pass
+
+        scribe = "\n\n".join(
+            f"Post {i} highlights a distinct benefit number {i} for growing marketing teams today." for i in range(600)
+        )
+        assert count_tokens(scribe) > HANDOFF_BUDGETS["synthesis"]["scribe"][0]
+        intent = {"target_platforms": ["linkedin"], "primary_intent": "content_creation"}
+        llm = self._llm({"platforms": 0})
+        with patch.object(orchestrator, "_SYNTHESIS_SECTIONS", (("platforms", ("scribe",), "_platforms_"),)):
+            synthesis = orchestrator._ProgressiveSynthesis(llm, "Write posts", intent, ["scribe"], on_token)
+            synthesis.deliver("scribe", scribe)
+            await synthesis.finish()
+
+        assert scribe in llm.stream_with_callback.await_args.kwargs["prompt"]
+
+class TestResponseAssembler:
+    """Tests for responses stitched from agent outputs without a synthesis call."""
+
+    def test_trend_research_sections_in_template_order(self):
+        from app.agents.assembler import assemble_response
+
+        chart = '```chart-bar\n{"title": "Engagement", "data": [{"name": "# AI", "value": 4}]}\n```'
+        response = assemble_response(
+            "trend_research",
+            {"memory": "Voice: bold", "researcher": "# Trends\n\n## AI agents\nRising", "analyst": chart},
+            ["linkedin", "twitter"],
+        )
+
+        assert response == (
+            "## Trending on LinkedIn, Twitter/X\n\n### Trends\n\n#### AI agents\nRising\n\n"
+            f"## Performance Data\n\n{chart}\n\n"
+            "## Brand Fit\n\nVoice: bold"
+        )
+
+    def test_headings_inside_fenced_blocks_are_kept(self):
+        from app.agents.assembler import nest_headings
+
+        text = "## Score\n```markdown\n# Draft title\n```\n### Notes"
+        assert nest_headings(text) == "### Score\n```markdown\n# Draft title\n```\n#### Notes"
+        assert nest_headings("#### Deep\nplain") == "#### Deep\nplain"
+
+    def test_falls_back_to_synthesis_when_an_agent_failed(self):
+        from app.agents.assembler import assemble_response
+
+        assert assemble_response("content_review", {"memory": "Voice", "advisor": "Error from advisor: 429"}, []) is None
+        assert assemble_response("content_review", {"advisor": "Score 8"}, []) is None
+        assert assemble_response("content_creation", {"scribe": "Post"}, ["linkedin"]) is None
+        assert assemble_response("content_review", {"memory": "Voice", "advisor": "Score 8"}, []) == (
+            "## Review\n\nScore 8\n\n## Brand Guidelines Applied\n\nVoice"
+        )
@@ -4,10 +4,20 @@ import pytest
 import uuid
 from datetime import datetime, timedelta
 from httpx import AsyncClient
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.database import AgentTrace, Message, Conversation, Document
+from app.models.database import AgentTrace, AgentRollup, Message, Conversation, Document
 from app.models.schemas import AgentTraceResponse
+from app.services import intent_classifier
+from app.services.intent_classifier import (
+    IntentClassifier, IntentModel, detect_platforms, extract_entities, load_training_examples, train,
+)
+from app.services.rollup_service import bucket_start, get_rollup_service, latency_bin, latency_summary
+from app.services.trace_service import get_trace_service
+from app.services.waterfall import (
+    add_span, current_waterfall, expand, record_query, record_span, start_waterfall,
+)
 
 
 class TestListTraces:
@@ -146,6 +156,79 @@ class TestListTraces:
         for item in data:
             assert "tokens_used" in item
 
+    async def test_list_traces_cursor_pagination(
+        self, client: AsyncClient, db_session: AsyncSession
+    ):
+        """Following X-Next-Cursor should visit every trace exactly once."""
+        started = datetime.utcnow() + timedelta(days=1)
+        ids = []
+        for i in range(5):
+            trace = AgentTrace(
+                id=str(uuid.uuid4()),
+                agent_name="cursor_agent",
+                task_type="test",
+                status="completed",
+                started_at=started if i < 3 else started - timedelta(seconds=i),
+                tokens_used=10,
+            )
+            db_session.add(trace)
+            ids.append(trace.id)
+        await db_session.flush()
+
+        seen = []
+        cursor = None
+        while True:
+            url = "/api/analytics/traces?agent_name=cursor_agent&limit=2"
+            if cursor:
+                url += f"&cursor={cursor}"
+            response = await client.get(url)
+            assert response.status_code == 200
+            seen.extend(item["id"] for item in response.json())
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+
+        assert sorted(seen) == sorted(ids)
+        assert len(seen) == len(set(seen))
+
+    async def test_list_traces_summary_fields(
+        self, client: AsyncClient, db_session: AsyncSession
+    ):
+        """fields=summary should omit citations and tool calls."""
+        trace = AgentTrace(
+            id=str(uuid.uuid4()),
+            agent_name="summary_agent",
+            task_type="test",
+            status="completed",
+            started_at=datetime.utcnow(),
+            tokens_used=42,
+            citations=[{"url": "https://example.com", "type": "url"}],
+            tool_calls=[{"tool_name": "search_web"}],
+        )
+        db_session.add(trace)
+        await db_session.flush()
+
+        response = await client.get("/api/analytics/traces?agent_name=summary_agent&fields=summary")
+        assert response.status_code == 200
+        item = response.json()[0]
+        assert item["tokens_used"] == 42
+        assert "citations" not in item
+        assert "tool_calls" not in item
+
+        detail = await client.get(f"/api/analytics/traces/{trace.id}")
+        assert detail.status_code == 200
+        assert detail.json()["citations"][0]["url"] == "https://example.com"
+
+    async def test_get_trace_not_found(self, client: AsyncClient):
+        """Should return 404 for a missing trace."""
+        response = await client.get(f"/api/analytics/traces/{uuid.uuid4()}")
+        assert response.status_code == 404
+
+    async def test_list_traces_invalid_cursor(self, client: AsyncClient):
+        """Malformed cursors should be rejected with 400."""
+        response = await client.get("/api/analytics/traces?cursor=not-a-cursor")
+        assert response.status_code == 400
+
 
 class TestGetMetrics:
     """Tests for GET /api/analytics/metrics endpoint."""
@@ -414,3 +497,342 @@ class TestSocialAnalytics:
         perfs = data["agent_performance"]
         executions = [p["executions"] for p in perfs]
         assert executions == sorted(executions, reverse=True)
+
+
+class TestAnalyticsRollups:
+    """Tests for rollup-backed aggregation in /metrics and /social."""
+
+    async def test_closed_buckets_read_from_rollups(
+        self, client: AsyncClient, db_session: AsyncSession
+    ):
+        """Closed hourly buckets should be counted without any raw traces."""
+        db_session.add(AgentRollup(
+            granularity="hour",
+            bucket_start=bucket_start(datetime.utcnow() - timedelta(hours=3), "hour"),
+            agent_name="rollup_only",
+            executions=5,
+            successes=4,
+            failures=1,
+            total_tokens=500,
+            timed_executions=5,
+            duration_ms_sum=10000,
+            completed_duration_ms_sum=8000,
+        ))
+        await db_session.flush()
+
+        response = await client.get("/api/analytics/social?period=day")
+        perf = {p["agent"]: p for p in response.json()["agent_performance"]}
+        assert perf["rollup_only"]["executions"] == 5
+        assert perf["rollup_only"]["avg_duration_seconds"] == 2.0
+        assert perf["rollup_only"]["success_rate"] == 80.0
+
+    async def test_live_traces_not_double_counted(
+        self, client: AsyncClient, db_session: AsyncSession
+    ):
+        """A trace completed just now is in both rollups and the live scan, but counts once."""
+        trace_service = get_trace_service()
+        trace = await trace_service.start_trace(db_session, "rollup_live", "test", {})
+        await trace_service.complete_trace(db_session, trace, {}, tokens_used=40)
+
+        result = await db_session.execute(
+            select(AgentRollup).where(AgentRollup.agent_name == "rollup_live")
+        )
+        assert {row.granularity for row in result.scalars()} == {"hour", "day"}
+
+        response = await client.get("/api/analytics/metrics?period=day")
+        stats = {s["agent"]: s for s in response.json()["agent_stats"]}
+        assert stats["rollup_live"]["executions"] == 1
+        assert stats["rollup_live"]["avg_tokens"] == 40
+
+    async def test_trace_failed_after_completion_counted_as_failure(self, db_session: AsyncSession):
+        """Failing a completed trace (e.g. a send error) moves it from successes to failures, like a backfill."""
+        trace_service = get_trace_service()
+        trace = await trace_service.start_trace(db_session, "rollup_refail", "test", {})
+        await trace_service.complete_trace(db_session, trace, {}, tokens_used=40, duration_ms=1200)
+        await trace_service.fail_trace(db_session, trace, error="send failed")
+
+        async def snapshot():
+            rollups = (await db_session.execute(
+                select(AgentRollup).where(AgentRollup.agent_name == "rollup_refail")
+            )).scalars().all()
+            histograms = await get_rollup_service().latency_histograms(db_session, trace.started_at)
+            return (
+                sorted((r.granularity, r.executions, r.successes, r.failures, r.total_tokens) for r in rollups),
+                sum(histograms.get("agent:rollup_refail", {}).values()),
+            )
+
+        live = await snapshot()
+        assert live == ([("day", 1, 0, 1, 40), ("hour", 1, 0, 1, 40)], 0)  # Failed traces have no latency sample
+
+        await get_rollup_service().backfill(db_session, since=trace.started_at)
+        assert await snapshot() == live
+
+    async def test_head_scan_skips_unfinished_traces(self, db_session: AsyncSession):
+        """Raw traces before the first closed bucket count only once finished, like rollups."""
+        now = datetime.utcnow()
+        since = bucket_start(now - timedelta(days=2), "hour") + timedelta(minutes=10)
+        for status in ("running", "completed"):
+            db_session.add(AgentTrace(
+                id=str(uuid.uuid4()),
+                agent_name="rollup_head",
+                task_type="test",
+                input_data={},
+                status=status,
+                started_at=since + timedelta(minutes=5),
+                completed_at=since + timedelta(minutes=6) if status == "completed" else None,
+            ))
+        await db_session.flush()
+
+        totals = await get_rollup_service().agent_totals(db_session, since, now)
+        assert totals["rollup_head"]["executions"] == 1
+
+    async def test_backfill_rebuilds_from_traces(
+        self, client: AsyncClient, db_session: AsyncSession
+    ):
+        """Backfill should roll up historical traces that predate rollups."""
+        started = datetime.utcnow() - timedelta(days=2)
+        for status in ("completed", "failed"):
+            db_session.add(AgentTrace(
+                id=str(uuid.uuid4()),
+                agent_name="rollup_backfill",
+                task_type="test",
+                status=status,
+                started_at=started,
+                completed_at=started + timedelta(seconds=3),
+                tokens_used=100,
+            ))
+        await db_session.flush()
+
+        count = await get_rollup_service().backfill(db_session, since=started - timedelta(days=1))
+        assert count >= 2
+
+        result = await db_session.execute(
+            select(AgentRollup).where(
+                AgentRollup.agent_name == "rollup_backfill",
+                AgentRollup.granularity == "day",
+            )
+        )
+        day = result.scalar_one()
+        assert (day.executions, day.successes, day.failures) == (2, 1, 1)
+        assert day.duration_ms_sum == 6000
+
+        response = await client.get("/api/analytics/metrics?period=week")
+        stats = {s["agent"]: s for s in response.json()["agent_stats"]}
+        assert stats["rollup_backfill"]["executions"] == 2
+
+    async def test_latency_percentiles_in_social(
+        self, client: AsyncClient, db_session: AsyncSession
+    ):
+        """Completed traces and wave timings should feed the latency section."""
+        trace_service = get_trace_service()
+        for duration_ms in range(100, 1100, 10):
+            trace = await trace_service.start_trace(db_session, "latency_agent", "test", {})
+            await trace_service.complete_trace(db_session, trace, {}, duration_ms=duration_ms)
+        await get_rollup_service().record_latency(
+            db_session, "wave:wave1", 2500, datetime.utcnow()
+        )
+
+        response = await client.get("/api/analytics/social?period=day")
+        latency = response.json()["latency"]
+        agent = latency["agents"]["latency_agent"]
+        assert agent["count"] == 100
+        assert agent["p50_ms"] == pytest.approx(600, rel=0.06)
+        assert agent["p90_ms"] == pytest.approx(1000, rel=0.06)
+        assert sum(b["count"] for b in agent["histogram"]) == 100
+        assert latency["waves"]["wave1"]["count"] >= 1
+        assert "p99_ms" in latency["orchestrator"]
+
+    def test_latency_summary_empty_and_bins(self):
+        """Percentiles should be zero when empty and fall in the sample's bin."""
+        empty = latency_summary({})
+        assert (empty["count"], empty["p50_ms"], empty["histogram"]) == (0, 0.0, [])
+
+        single = latency_summary({latency_bin(250): 3})
+        assert single["p99_ms"] == pytest.approx(250, rel=0.05)
+        assert single["histogram"][0]["le_ms"] > 250
+
+
+class TestTraceWaterfall:
+    """Tests for the per-request latency waterfall and its endpoint."""
+
+    def test_spans_nest_and_inherit_agent(self):
+        with start_waterfall() as waterfall:
+            with record_span("wave1", "wave"):
+                with record_span("researcher", "agent", agent="researcher"):
+                    add_span("queue", "queue", waterfall.origin, waterfall.origin + 0.01)
+                    with record_span("search_web", "tool"):
+                        pass
+        compact = waterfall.to_compact()
+        spans = expand(compact)["spans"]
+
+        assert compact["v"] == 1
+        assert [s["name"] for s in spans] == ["wave1", "researcher", "queue", "search_web"]
+        assert [s["parent"] for s in spans] == [None, 0, 1, 1]
+        assert spans[0]["agent"] == "orchestrator"
+        assert spans[3]["agent"] == "researcher"
+        assert spans[2]["duration_ms"] == pytest.approx(10, abs=0.2)
+
+    def test_record_span_is_noop_without_waterfall(self):
+        assert current_waterfall() is None
+        with record_span("intent", "intent") as index:
+            assert index is None
+        record_query("INSERT INTO messages (id) VALUES (?)", 0.0, 1.0)
+
+    def test_summary_counts_overlap_once(self):
+        compact = {
+            "v": 1,
+            "total_ms": 300.0,
+            "fields": ["name", "kind", "agent", "start_ms", "duration_ms", "parent"],
+            "spans": [
+                ["researcher", "agent", "researcher", 0.0, 200.0, None],
+                ["memory", "agent", "memory", 100.0, 150.0, None],
+            ],
+        }
+        summary = expand(compact)["summary"]["agent"]
+        assert summary == {"count": 2, "total_ms": 350.0, "wall_ms": 250.0}
+
+    def test_db_writes_are_recorded(self):
+        with start_waterfall() as waterfall:
+            record_query("SELECT * FROM conversations", 0.0, 0.001)
+            record_query('INSERT INTO "messages" (id) VALUES (?)', 0.0, 0.001)
+            record_query("UPDATE agent_traces SET status=? WHERE id=?", 0.0, 0.001)
+
+        assert [(span.kind, span.name) for span in waterfall.spans] == [
+            ("db", "INSERT messages"),
+            ("db", "UPDATE agent_traces"),
+        ]
+
+    async def test_get_waterfall(self, client: AsyncClient, db_session: AsyncSession):
+        with start_waterfall() as waterfall:
+            with record_span("intent", "intent"):
+                pass
+        trace = AgentTrace(
+            id=str(uuid.uuid4()),
+            agent_name="orchestrator",
+            status="completed",
+            started_at=datetime.utcnow(),
+            tokens_used=0,
+            duration_ms=12,
+            waterfall=waterfall.to_compact(),
+        )
+        db_session.add(trace)
+        await db_session.flush()
+
+        response = await client.get(f"/api/analytics/traces/{trace.id}/waterfall")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["trace_id"] == trace.id
+        assert data["spans"][0]["name"] == "intent"
+        assert data["summary"]["intent"]["count"] == 1
+
+    async def test_waterfall_missing(self, client: AsyncClient, db_session: AsyncSession):
+        trace = AgentTrace(
+            id=str(uuid.uuid4()),
+            agent_name="researcher",
+            status="completed",
+            started_at=datetime.utcnow(),
+            tokens_used=0,
+        )
+        db_session.add(trace)
+        await db_session.flush()
+
+        response = await client.get(f"/api/analytics/traces/{trace.id}/waterfall")
+        assert response.status_code == 404
+        response = await client.get(f"/api/analytics/traces/{uuid.uuid4()}/waterfall")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Trace not found"
+
+
+def _intent_examples() -> list[tuple[str, dict]]:
+    topics = ["our analytics dashboard", "the spring campaign", "AI copilots", "remote work", "product launch",
+              "customer stories", "the new API", "sustainability goals"]
+    templates = {
+        "content_creation": ["Write a post about {}", "Draft a tweet announcing {}", "Create social posts for {}"],
+        "trend_research": ["What are the latest trends in {}", "Research competitor activity around {}",
+                           "What topics are trending about {}"],
+        "content_review": ["Review this post about {} for brand voice", "Check this caption on {} against our guidelines",
+                           "Is this draft about {} on brand"],
+    }
+    agents = {"content_creation": ["researcher", "scribe"], "trend_research": ["researcher"],
+              "content_review": ["advisor"]}
+    return [
+        (template.format(topic), {"primary_intent": intent, "required_agents": agents[intent]})
+        for intent, variants in templates.items()
+        for template in variants
+        for topic in topics
+    ]
+
+
+class TestIntentClassifier:
+    """Tests for the local intent classifier and its stats endpoint."""
+
+    def test_platforms_and_entities_from_text(self):
+        assert detect_platforms("Draft a LinkedIn post and a tweet") == ["linkedin", "twitter"]
+        assert detect_platforms("Write something nice") == ["linkedin", "twitter", "instagram"]
+        entities = extract_entities('Write a LinkedIn post about Contoso Analytics and "spring launch" #AI')
+        assert entities == ["Contoso Analytics", "spring launch", "#AI"]
+
+    def test_train_predicts_and_reports_accuracy(self):
+        model = train(_intent_examples(), threshold=0.05)
+
+        assert model.metrics["examples"] == 72
+        assert model.metrics["accuracy"] >= 0.9
+        assert model.metrics["coverage"] > 0.5
+        label, confidence = model.predict("Write a post about our quarterly results")
+        assert label == "content_creation"
+        assert confidence > 0.05
+        assert model.agents["content_review"] == ["advisor"]
+
+        restored = IntentModel.from_dict(model.to_dict())
+        restored_label, restored_confidence = restored.predict("What are the latest trends in fintech")
+        label, confidence = model.predict("What are the latest trends in fintech")
+        assert restored_label == label == "trend_research"
+        assert restored_confidence == pytest.approx(confidence, abs=1e-4)
+
+    def test_train_needs_enough_examples(self):
+        with pytest.raises(ValueError):
+            train(_intent_examples()[:5])
+
+    def test_classify_falls_back_without_model(self, tmp_path):
+        classifier = IntentClassifier(model_path=str(tmp_path / "missing.json"))
+        assert classifier.classify("Write a post") is None
+        classifier.record(None, {"primary_intent": "content_creation"})
+        assert classifier.stats()["live"] == {
+            "requests": 1, "local": 0, "llm": 1, "hit_rate": 0.0, "fallback_agreement": 0.0,
+        }
+
+    def test_classify_builds_full_intent(self, tmp_path):
+        classifier = IntentClassifier(model_path=str(tmp_path / "intent.json"))
+        classifier.save(train(_intent_examples()))
+
+        prediction = IntentClassifier(model_path=str(tmp_path / "intent.json")).classify(
+            "Draft a tweet announcing Contoso Cloud"
+        )
+        assert prediction.intent["primary_intent"] == "content_creation"
+        assert prediction.intent["target_platforms"] == ["twitter"]
+        assert prediction.intent["required_agents"] == ["researcher", "scribe"]
+        assert prediction.intent["key_entities"] == ["Contoso Cloud"]
+        assert prediction.intent["task_description"] == "Draft a tweet announcing Contoso Cloud"
+
+    async def test_training_uses_only_llm_intents(self, db_session: AsyncSession):
+        for source in ("llm", "local"):
+            db_session.add(AgentTrace(
+                id=str(uuid.uuid4()),
+                agent_name="orchestrator",
+                status="completed",
+                started_at=datetime.utcnow(),
+                input_data={"message": f"Write a post ({source})"},
+                output_data={"intent": {"primary_intent": "content_creation"}, "intent_source": source},
+            ))
+        await db_session.flush()
+
+        examples = await load_training_examples(db_session)
+        assert [message for message, _ in examples] == ["Write a post (llm)"]
+
+    async def test_stats_endpoint(self, client: AsyncClient, tmp_path, monkeypatch):
+        monkeypatch.setattr(intent_classifier, "_intent_classifier", IntentClassifier(str(tmp_path / "intent.json")))
+        response = await client.get("/api/analytics/intent-classifier")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["model"] is None
+        assert data["live"]["requests"] == 0
@@ -0,0 +1,139 @@
+"""Tests for the offline benchmark tools: the fake Azure OpenAI server and load generator."""
+
+import json
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from bench.fake_azure_openai import FakeAzureOpenAI, FakeConfig
+from bench.load import RequestRecord, Session, arrival_times, summarize
+from app.agents.orchestrator import INTENT_SCHEMA
+
+
+@pytest.fixture
+def fake() -> FakeAzureOpenAI:
+    return FakeAzureOpenAI(FakeConfig(time_scale=0, output_tokens=12))
+
+
+@pytest.fixture
+async def fake_client(fake):
+    async with AsyncClient(transport=ASGITransport(app=fake.app), base_url="https://fake") as client:
+        yield client
+
+
+def _chat(content: str = "Write a post", **extra) -> dict:
+    return {
+        "messages": [{"role": "system", "content": "You are a test."}, {"role": "user", "content": content}],
+        **extra,
+    }
+
+
+class TestFakeAzureOpenAI:
+    """Test the deterministic chat, embeddings and Responses endpoints."""
+
+    async def test_chat_completion_reports_usage(self, fake, fake_client: AsyncClient):
+        response = await fake_client.post("/openai/deployments/gpt-4o/chat/completions", json=_chat())
+        assert response.status_code == 200
+        body = response.json()
+        assert body["choices"][0]["message"]["content"]
+        assert body["usage"]["completion_tokens"] == 12
+        assert fake.calls[0].api == "chat"
+        assert fake.calls[0].system == "You are a test."
+
+    async def test_same_request_same_output(self, fake_client: AsyncClient):
+        path = "/openai/deployments/gpt-4o/chat/completions"
+        first = (await fake_client.post(path, json=_chat())).json()
+        second = (await fake_client.post(path, json=_chat())).json()
+        assert first["choices"][0]["message"]["content"] == second["choices"][0]["message"]["content"]
+
+    async def test_structured_output_follows_schema(self, fake_client: AsyncClient):
+        response = await fake_client.post(
+            "/openai/deployments/gpt-4o/chat/completions",
+            json=_chat(response_format={"type": "json_schema", "json_schema": INTENT_SCHEMA}),
+        )
+        intent = json.loads(response.json()["choices"][0]["message"]["content"])
+        assert set(INTENT_SCHEMA["schema"]["required"]) <= set(intent)
+        allowed = INTENT_SCHEMA["schema"]["properties"]["primary_intent"]["enum"]
+        assert intent["primary_intent"] in allowed
+
+    async def test_stream_ends_with_usage_chunk(self, fake_client: AsyncClient):
+        response = await fake_client.post(
+            "/openai/deployments/gpt-4o/chat/completions",
+            json=_chat(stream=True, stream_options={"include_usage": True}),
+        )
+        lines = [line[6:] for line in response.text.splitlines() if line.startswith("data: ")]
+        assert lines[-1] == "[DONE]"
+        chunks = [json.loads(line) for line in lines[:-1]]
+        text = "".join(c["choices"][0]["delta"].get("content") or "" for c in chunks if c["choices"])
+        assert text
+        assert chunks[-1]["usage"]["completion_tokens"] == 12
+
+    async def test_embeddings_dimensions(self, fake_client: AsyncClient):
+        response = await fake_client.post(
+            "/openai/deployments/text-embedding-3-small/embeddings", json={"input": ["a", "b"]}
+        )
+        data = response.json()["data"]
+        assert len(data) == 2
+        assert len(data[0]["embedding"]) == 1536
+
+    async def test_responses_api(self, fake, fake_client: AsyncClient):
+        response = await fake_client.post(
+            "/openai/responses",
+            json={"model": "gpt-4o", "instructions": "You are the Scribe.", "input": "Write"},
+        )
+        body = response.json()
+        assert body["output"][0]["content"][0]["text"]
+        assert fake.calls[0].system == "You are the Scribe."
+
+    async def test_injected_errors(self):
+        fake = FakeAzureOpenAI(FakeConfig(time_scale=0, error_rate=1.0, error_status=429))
+        async with AsyncClient(transport=ASGITransport(app=fake.app), base_url="https://fake") as client:
+            response = await client.post("/openai/deployments/gpt-4o/chat/completions", json=_chat())
+        assert response.status_code == 429
+        assert "retry-after-ms" in response.headers
+        assert fake.calls[0].status == 429
+
+
+class TestLoadGenerator:
+    """Test arrival scheduling and result accounting in bench.load."""
+
+    def test_constant_arrivals(self):
+        times = arrival_times(rate=4, duration=1, poisson=False, seed=1)
+        assert times == pytest.approx([0.25, 0.5, 0.75])
+
+    def test_poisson_arrivals_are_seeded(self):
+        first = arrival_times(rate=10, duration=5, poisson=True, seed=3)
+        assert first == arrival_times(rate=10, duration=5, poisson=True, seed=3)
+        assert 20 < len(first) < 90
+        assert all(0 < t < 5 for t in first)
+
+    def test_session_counts_sequence_gaps(self):
+        session = Session("http://localhost:8000")
+        record = RequestRecord(scenario="chat", index=0)
+        session.begin(record, arrived=0.0)
+        for seq, event_type in [(1, "agent.started"), (2, "stream.token"), (5, "stream.token")]:
+            session._observe({"event_type": event_type, "seq": seq, "data": {"agent_name": "orchestrator"}})
+        session._observe({"event_type": "agent.completed", "seq": 6, "data": {"agent_name": "orchestrator"}})
+
+        assert record.events == 4
+        assert record.events_lost == 2
+        assert record.first_token_ms is not None
+        assert session.completed.is_set()
+
+    def test_summarize_reports_errors_and_loss(self):
+        records = [
+            RequestRecord("chat", 0, status=200, latency_ms=100, first_token_ms=20, events=10, completed_event=True),
+            RequestRecord("chat", 1, status=200, latency_ms=300, first_token_ms=40, events=8, events_lost=2,
+                          completed_event=False),
+            RequestRecord("chat", 2, status=500, error="HTTP 500", latency_ms=50),
+        ]
+        summary = summarize(records, elapsed=2.0, uses_ws=True)
+
+        assert summary["succeeded"] == 2
+        assert summary["errors"] == {"500": 1}
+        assert summary["error_rate"] == pytest.approx(0.3333, abs=1e-4)
+        assert summary["throughput_rps"] == 1.0
+        assert summary["latency_ms"]["p50"] == 100
+        assert summary["events_lost"] == 2
+        assert summary["event_loss_rate"] == 0.1
+        assert summary["missing_completion"] == 1
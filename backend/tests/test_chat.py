@@ -1,12 +1,20 @@
 """Tests for chat API endpoints."""
 
 import pytest
+import time
 import uuid
+from datetime import datetime, timedelta
 from httpx import AsyncClient
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.database import Conversation, Message
+from app.config import settings
+from app.models.database import AgentTrace, Conversation, KnowledgeItem, Message, ResponseCacheEntry
 from app.models.schemas import ConversationResponse, MessageResponse
+from app.services import context_cache as context_cache_module
+from app.services.brand_data import brand_data_version
+from app.services.context_cache import ContextCache, context_key, conversation_topic
+from app.services.response_cache import ResponseCache
 
 
 class TestListConversations:
@@ -168,6 +176,29 @@ class TestListMessages:
         )
         assert response.status_code == 200
 
+    async def test_list_messages_cursor_pagination(
+        self, client: AsyncClient, db_session: AsyncSession, sample_conversation: Conversation
+    ):
+        """Cursor pages should return messages oldest first without gaps."""
+        for i in range(3):
+            db_session.add(Message(
+                id=str(uuid.uuid4()),
+                conversation_id=sample_conversation.id,
+                role="user",
+                content=f"Message {i}",
+                created_at=datetime.utcnow() + timedelta(seconds=i),
+            ))
+        await db_session.flush()
+
+        url = f"/api/chat/conversations/{sample_conversation.id}/messages?limit=2"
+        first = await client.get(url)
+        cursor = first.headers["x-next-cursor"]
+        second = await client.get(f"{url}&cursor={cursor}")
+
+        contents = [m["content"] for m in first.json() + second.json()]
+        assert contents == ["Message 0", "Message 1", "Message 2"]
+        assert "x-next-cursor" not in second.headers
+
 
 class TestSendMessage:
     """Tests for POST /api/chat/conversations/{id}/messages endpoint."""
@@ -202,3 +233,173 @@ class TestSendMessage:
         assert response.status_code == 200
         data = response.json()
         MessageResponse.model_validate(data)
+
+
+class TestResponseCache:
+    """Tests for the semantic cache of orchestrator runs."""
+
+    @staticmethod
+    async def _store(cache: ResponseCache, db: AsyncSession, version: str, **overrides):
+        run = {
+            "embedding": [1.0, 0.0, 0.0],
+            "message": "Write a LinkedIn post about our AI launch",
+            "intent": "content_creation",
+            "platforms": ["linkedin", "twitter"],
+            "brand_version": version,
+            "response": "Here is your post",
+            "context": {"researcher": "Trends", "memory": "Brand voice"},
+            "citations": [{"title": "Guidelines", "contributing_agent": "memory"}],
+            "document_id": "doc-1",
+            "document_title": "Social Post: AI launch",
+            "trace_id": "trace-1",
+        }
+        await cache.store(db, **{**run, **overrides})
+
+    async def test_similarity_decides_hit_warm_or_miss(self, db_session: AsyncSession):
+        """Near-identical requests hit, similar ones warm-start, others miss."""
+        cache, version = ResponseCache(), uuid.uuid4().hex
+        await self._store(cache, db_session, version)
+
+        hit = await cache.lookup(db_session, [1.0, 0.01, 0.0], "content_creation", ["twitter", "linkedin"], version)
+        assert hit.kind == "hit"
+        assert hit.entry.response == "Here is your post"
+        assert hit.summary()["reused_agents"] == ["memory", "researcher"]
+
+        warm = await cache.lookup(db_session, [1.0, 0.4, 0.0], "content_creation", ["linkedin", "twitter"], version)
+        assert warm.kind == "warm"
+        assert 0.9 <= warm.similarity < 0.97
+
+        assert await cache.lookup(db_session, [0.0, 1.0, 0.0], "content_creation", ["linkedin", "twitter"], version) is None
+        assert cache.stats()["hit"] == 1 and cache.stats()["warm"] == 1 and cache.stats()["miss"] == 1
+        assert hit.entry.hits == 2
+
+    async def test_key_scopes_intent_platforms_and_brand_version(self, db_session: AsyncSession):
+        """Entries only match the same intent, platform set and brand data."""
+        cache, version = ResponseCache(), uuid.uuid4().hex
+        await self._store(cache, db_session, version)
+
+        assert await cache.lookup(db_session, [1.0, 0.0, 0.0], "content_strategy", ["linkedin", "twitter"], version) is None
+        assert await cache.lookup(db_session, [1.0, 0.0, 0.0], "content_creation", ["linkedin"], version) is None
+        assert await cache.lookup(db_session, [1.0, 0.0, 0.0], "content_creation", ["linkedin", "twitter"], "other") is None
+        # Reviews depend on the exact draft and are never cached
+        assert await cache.lookup(db_session, [1.0, 0.0, 0.0], "content_review", ["linkedin", "twitter"], version) is None
+
+    async def test_ttl_and_brand_changes_expire_entries(self, db_session: AsyncSession, monkeypatch):
+        """Expired entries stop matching; storing prunes them and entries for old brand data."""
+        cache, version = ResponseCache(), uuid.uuid4().hex
+        await self._store(cache, db_session, version)
+        monkeypatch.setattr(settings, "response_cache_ttl", 0)
+        assert await cache.lookup(db_session, [1.0, 0.0, 0.0], "content_creation", ["linkedin", "twitter"], version) is None
+
+        monkeypatch.setattr(settings, "response_cache_ttl", 3600)
+        old_version = uuid.uuid4().hex
+        await self._store(cache, db_session, old_version)
+        new_version = uuid.uuid4().hex
+        await self._store(cache, db_session, new_version)
+        keys = (await db_session.execute(select(ResponseCacheEntry.cache_key))).scalars().all()
+        assert keys and all(key.endswith(f"|{new_version}") for key in keys)
+
+    async def test_degraded_and_uncacheable_runs_are_not_stored(self, db_session: AsyncSession):
+        """Runs with failed agents, and intents outside the cacheable set, aren't stored."""
+        cache, version = ResponseCache(), uuid.uuid4().hex
+        await self._store(cache, db_session, version, context={"researcher": "Error from researcher: timeout"})
+        await self._store(cache, db_session, version, intent="question")
+        count = (await db_session.execute(
+            select(func.count(ResponseCacheEntry.id)).where(ResponseCacheEntry.cache_key.endswith(f"|{version}"))
+        )).scalar()
+        assert count == 0
+
+    async def test_opt_out(self, monkeypatch):
+        """Message metadata {"cache": false}, or the setting, bypasses the cache."""
+        cache = ResponseCache()
+        assert cache.enabled_for({})
+        assert cache.enabled_for(None)
+        assert not cache.enabled_for({"cache": False})
+        monkeypatch.setattr(settings, "response_cache_enabled", False)
+        assert not cache.enabled_for({})
+
+    async def test_brand_data_version_tracks_knowledge_base(self, db_session: AsyncSession):
+        """Adding brand knowledge changes the version that cache keys include."""
+        before = await brand_data_version(db_session)
+        assert await brand_data_version(db_session) == before
+        item = KnowledgeItem(id=str(uuid.uuid4()), title="Tone", content="Warm and direct.", category="brand")
+        db_session.add(item)
+        await db_session.flush()
+        added = await brand_data_version(db_session)
+        assert added != before
+
+        item.content = "Cool and direct."  # Same length, edited in place
+        await db_session.flush()
+        assert await brand_data_version(db_session) != added
+
+
+class TestContextCache:
+    """Tests for memoized Wave 1 context."""
+
+    def test_key_normalizes_topic_and_buckets_by_agent_ttl(self):
+        """Entity order, case and punctuation don't matter; each agent's TTL sets its bucket."""
+        assert context_key("memory", ["#AI Launch", "Acme"], ["twitter", "linkedin"], "v1", now=0) == \
+            context_key("memory", ["acme", "ai launch"], ["linkedin", "twitter"], "v1", now=0)
+        researcher_ttl = settings.context_cache_ttl["researcher"]
+        assert context_key("researcher", ["acme"], [], "v1", now=0) != \
+            context_key("researcher", ["acme"], [], "v1", now=researcher_ttl)
+        assert context_key("memory", ["acme"], [], "v1", now=0) == \
+            context_key("memory", ["acme"], [], "v1", now=researcher_ttl)
+        assert context_key("strategist", ["acme"], [], "v1") is None
+
+    async def test_store_then_reuse_for_same_topic(self, db_session: AsyncSession):
+        """Outputs are reused for the same topic and platforms only; failed runs aren't stored."""
+        cache, version = ContextCache(), uuid.uuid4().hex
+        await cache.store(
+            db_session,
+            {
+                "researcher": ("Trends", 120, {"citations": [{"title": "News"}]}),
+                "memory": ("Error from memory: timeout", 0, {}),
+                "strategist": ("Plan", 80, {}),
+            },
+            ["Acme", "AI Launch"], ["linkedin"], version,
+        )
+        found = await cache.lookup(
+            db_session, ["researcher", "memory", "strategist"], ["ai launch", "acme"], ["linkedin"], version
+        )
+        assert set(found) == {"researcher"}
+        assert found["researcher"].result == "Trends"
+        assert found["researcher"].citations == [{"title": "News"}]
+        assert cache.stats()["tokens_saved"] == 120
+
+        assert await cache.lookup(db_session, ["researcher"], ["acme", "ai launch"], ["twitter"], version) == {}
+        assert await cache.lookup(db_session, ["researcher"], ["acme", "ai launch"], ["linkedin"], "other") == {}
+
+    async def test_entries_expire_with_the_agent_bucket(self, db_session: AsyncSession, monkeypatch):
+        """Researcher output expires after its short TTL while memory is still reused."""
+        cache, version = ContextCache(), uuid.uuid4().hex
+        await cache.store(db_session, {"researcher": ("Trends", 10, {}), "memory": ("Voice", 10, {})},
+                          ["acme"], ["linkedin"], version)
+        later = time.time() + settings.context_cache_ttl["researcher"]
+        monkeypatch.setattr(context_cache_module.time, "time", lambda: later)
+        found = await cache.lookup(db_session, ["researcher", "memory"], ["acme"], ["linkedin"], version)
+        assert "researcher" not in found
+
+    async def test_follow_up_inherits_conversation_topic(
+        self, db_session: AsyncSession, sample_conversation: Conversation
+    ):
+        """The latest completed request's entities are the topic of a follow-up."""
+        first = Message(id=str(uuid.uuid4()), conversation_id=sample_conversation.id, role="user", content="Post")
+        follow_up = Message(id=str(uuid.uuid4()), conversation_id=sample_conversation.id, role="user",
+                            content="make the twitter one shorter")
+        db_session.add_all([first, follow_up])
+        db_session.add(AgentTrace(
+            id=str(uuid.uuid4()), message_id=first.id, agent_name="orchestrator", task_type="message_processing",
+            status="completed", output_data={"intent": {"key_entities": ["AI launch"]}},
+        ))
+        await db_session.flush()
+        assert await conversation_topic(db_session, sample_conversation.id, follow_up.id) == ["AI launch"]
+        assert await conversation_topic(db_session, str(uuid.uuid4())) == []
+
+    async def test_cache_stats_endpoint(self, client: AsyncClient):
+        """GET /api/analytics/caches reports both caches."""
+        response = await client.get("/api/analytics/caches")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"response", "context"}
+        assert "hit_rate" in data["context"]
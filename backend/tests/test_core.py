@@ -1,7 +1,16 @@
-"""Tests for core endpoints: health check and root."""
+"""Tests for core endpoints: health check, root and metrics."""
+
+import asyncio
 
 import pytest
-from httpx import AsyncClient
+import httpx
+from httpx import AsyncClient, ASGITransport
+from openai import AsyncAzureOpenAI
+
+from app.services import telemetry
+from app.services.llm_service import LLMService
+from app.services.token_usage import TokenUsage, cost_usd, current_ledger, record_usage, usage_ledger
+from bench.fake_azure_openai import FakeAzureOpenAI, FakeConfig
 
 
 class TestHealthEndpoint:
@@ -55,3 +64,274 @@ class TestRootEndpoint:
         response = await client.get("/")
         data = response.json()
         assert data["docs"] == "/docs"
+
+
+class TestMetricsEndpoint:
+    """Tests for GET /metrics Prometheus endpoint."""
+
+    async def test_metrics_prometheus_format(self, client: AsyncClient):
+        """Should serve Prometheus text with the instrumented families."""
+        telemetry.LLM_CALLS.inc(deployment="test-deployment", method="complete", status="ok")
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = response.text
+        assert "# TYPE oneshot_llm_calls_total counter" in body
+        assert 'oneshot_llm_calls_total{deployment="test-deployment",method="complete",status="ok"}' in body
+        assert "oneshot_websocket_connections " in body
+
+    async def test_metrics_openmetrics_negotiation(self, client: AsyncClient):
+        """Should switch to OpenMetrics when the scraper accepts it."""
+        response = await client.get(
+            "/metrics", headers={"Accept": "application/openmetrics-text; version=1.0.0"}
+        )
+        assert response.headers["content-type"].startswith("application/openmetrics-text")
+        assert "# TYPE oneshot_llm_calls counter" in response.text
+        assert response.text.endswith("# EOF\n")
+
+    async def test_failed_query_leaves_no_timer_behind(self):
+        """A statement that raises should not break timing of the connection's later queries."""
+        from sqlalchemy import event, text
+        from sqlalchemy.exc import OperationalError
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        from app.models import database
+
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        event.listen(engine.sync_engine, "before_cursor_execute", database._start_query_timer)
+        event.listen(engine.sync_engine, "after_cursor_execute", database._observe_query)
+        before = telemetry.DB_QUERY_DURATION.count(operation="SELECT")
+        try:
+            async with engine.connect() as conn:
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("SELECT * FROM missing_table"))
+                await conn.execute(text("SELECT 1"))
+                info = (await conn.get_raw_connection()).info
+        finally:
+            await engine.dispose()
+
+        assert telemetry.DB_QUERY_DURATION.count(operation="SELECT") == before + 1
+        assert "query_started" not in info
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Histogram samples should be cumulative with matching sum and count."""
+        histogram = telemetry.Histogram("test_latency_seconds", "Test.", ("op",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value, op="read")
+        lines = histogram.samples(openmetrics=False)
+        assert 'test_latency_seconds_bucket{op="read",le="0.1"} 1' in lines
+        assert 'test_latency_seconds_bucket{op="read",le="1.0"} 3' in lines
+        assert 'test_latency_seconds_bucket{op="read",le="+Inf"} 4' in lines
+        assert 'test_latency_seconds_count{op="read"} 4' in lines
+
+
+class TestTokenUsage:
+    """Tests for per-call token accounting and per-request ledgers."""
+
+    def test_cost_uses_deployment_pricing(self):
+        """Prompt and completion tokens should be priced separately per million."""
+        assert cost_usd("gpt-4o", TokenUsage(1_000_000, 100_000)) == pytest.approx(3.5)
+        assert cost_usd("unpriced-deployment", TokenUsage(1000, 1000)) == 0
+
+    def test_nested_ledgers_roll_up(self):
+        """A child ledger's calls should count toward its parent but not its siblings."""
+        with usage_ledger("request") as request:
+            record_usage("gpt-4o", 100, 10)
+            with usage_ledger("scribe") as scribe:
+                record_usage("gpt-4o-mini", 200, 50)
+            with usage_ledger("advisor") as advisor:
+                record_usage("gpt-4o", 300, 20)
+        assert current_ledger() is None
+        assert scribe.total_usage == TokenUsage(200, 50)
+        assert advisor.total_usage == TokenUsage(300, 20)
+        assert request.own_usage == TokenUsage(100, 10)
+        summary = request.summary()
+        assert summary["calls"] == 3
+        assert summary["total_tokens"] == 680
+        assert set(summary["by_deployment"]) == {"gpt-4o", "gpt-4o-mini"}
+        assert summary["cost_usd"] == pytest.approx(
+            cost_usd("gpt-4o", TokenUsage(400, 30)) + cost_usd("gpt-4o-mini", TokenUsage(200, 50)), abs=1e-6
+        )
+
+    async def test_concurrent_requests_are_isolated(self):
+        """Requests running concurrently should each see only their own calls."""
+        async def request(tokens: int) -> TokenUsage:
+            with usage_ledger("request") as ledger:
+                for _ in range(3):
+                    record_usage("gpt-4o", tokens, 1)
+                    await asyncio.sleep(0)
+            return ledger.total_usage
+
+        first, second = await asyncio.gather(request(10), request(1000))
+        assert first == TokenUsage(30, 3)
+        assert second == TokenUsage(3000, 3)
+
+    async def test_llm_service_counts_streamed_usage(self):
+        """Streams should request usage and record the final chunk's counts."""
+        fake = FakeAzureOpenAI(FakeConfig(time_scale=0, output_tokens=7))
+        service = LLMService()
+        service.client = AsyncAzureOpenAI(
+            azure_endpoint="https://fake",
+            api_key="test",
+            api_version="2025-03-01-preview",
+            http_client=httpx.AsyncClient(transport=ASGITransport(app=fake.app)),
+        )
+        with usage_ledger("request") as ledger:
+            text = await service.stream_with_callback("Write a post", model="gpt-4o")
+            response = await service.complete_with_usage("Write a post", model="gpt-4o")
+        assert text
+        assert response.usage.completion_tokens == 7
+        assert ledger.calls == 2
+        assert ledger.total_usage.completion_tokens == 14
+        assert ledger.total_usage.prompt_tokens == fake.calls[0].prompt_tokens * 2
+
+
+class TestModelRouter:
+    """Tests for per-route deployment choice, fallback and stats."""
+
+    @staticmethod
+    def _service(fake: FakeAzureOpenAI, failing: dict[str, str]) -> LLMService:
+        """An LLMService on the fake; deployments in ``failing`` answer 429 or 500, drop the
+        connection, hang, stall before a stream's first chunk or are slow."""
+        inner = ASGITransport(app=fake.app)
+
+        class Transport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                deployment = request.url.path.split("/deployments/")[1].split("/")[0]
+                if failing.get(deployment) == "429":
+                    return httpx.Response(429, headers={"retry-after": "20"}, json={"error": {"message": "busy"}})
+                if failing.get(deployment) == "500":
+                    return httpx.Response(500, json={"error": {"message": "internal error"}})
+                if failing.get(deployment) == "disconnect":
+                    raise httpx.ConnectError("connection reset", request=request)
+                if failing.get(deployment) == "stall":
+                    async def stalled():
+                        await asyncio.sleep(5)
+                        yield b""
+                    return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=stalled())
+                if failing.get(deployment) == "hang":
+                    await asyncio.sleep(5)
+                if failing.get(deployment) == "slow":
+                    await asyncio.sleep(0.3)
+                return await inner.handle_async_request(request)
+
+        service = LLMService()
+        service.client = AsyncAzureOpenAI(
+            azure_endpoint="https://fake",
+            api_key="test",
+            api_version="2025-03-01-preview",
+            http_client=httpx.AsyncClient(transport=Transport()),
+            max_retries=2,
+        )
+        return service
+
+    def test_routes_resolve_most_specific_first(self, monkeypatch):
+        from app.config import settings
+        from app.services.model_router import ModelRouter
+
+        monkeypatch.setattr(settings, "model_routes", {
+            "default": ["primary"],
+            "advisor": ["secondary", "primary"],
+            "advisor:review": ["small", "secondary"],
+        })
+        router = ModelRouter()
+        primary, secondary = settings.azure_openai_deployment_name, settings.azure_openai_gpt5_deployment_name
+        assert router.deployments("advisor:review") == ["small", secondary]
+        assert router.deployments("advisor") == router.deployments("advisor:summary") == [secondary, primary]
+        assert router.deployments("scribe") == router.deployments(None) == [primary]
+
+        router.failed("advisor", secondary, TimeoutError())
+        assert router.deployments("advisor") == [primary, secondary]
+        assert router.deployments("advisor:review") == ["small", secondary]
+
+    async def test_rate_limited_deployment_falls_back_and_cools_down(self, monkeypatch):
+        from app.config import settings
+        from app.services import model_router
+
+        monkeypatch.setattr(settings, "model_routes", {"memory": ["busy-model", "gpt-4o-mini"]})
+        monkeypatch.setattr(model_router, "_model_router", None)
+        fake = FakeAzureOpenAI(FakeConfig(time_scale=0, output_tokens=5))
+        service = self._service(fake, {"busy-model": "429"})
+
+        first = await service.complete_with_usage("Summarize brand voice", route="memory")
+        second = await service.complete_with_usage("Summarize brand voice", route="memory")
+
+        assert first.content and second.content
+        stats = model_router.get_model_router().stats()
+        memory = stats["routes"]["memory"]
+        assert memory["calls"] == 2
+        assert memory["fallbacks"] == 1  # Cooling down for Retry-After, so the second call skips it
+        assert memory["by_deployment"] == {
+            "busy-model": {"calls": 1, "cost_usd": 0.0},
+            "gpt-4o-mini": {"calls": 2, "cost_usd": memory["cost_usd"]},
+        }
+        assert memory["cost_usd"] > 0
+        assert 15 < stats["cooling_down"]["busy-model"] <= 20
+        assert [call.deployment for call in fake.calls] == ["gpt-4o-mini", "gpt-4o-mini"]
+
+    async def test_timeout_falls_back_before_the_stream_starts(self, monkeypatch):
+        from app.config import settings
+        from app.services import model_router
+
+        monkeypatch.setattr(settings, "model_routes", {"orchestrator:synthesis": ["slow-model", "gpt-4o"]})
+        monkeypatch.setattr(settings, "model_route_timeout", 0.2)
+        monkeypatch.setattr(model_router, "_model_router", None)
+        fake = FakeAzureOpenAI(FakeConfig(time_scale=0, output_tokens=5))
+        service = self._service(fake, {"slow-model": "hang"})
+
+        with usage_ledger("request") as ledger:
+            text = await service.stream_with_callback("Write it up", route="orchestrator:synthesis")
+
+        assert text
+        assert set(ledger.summary()["by_deployment"]) == {"gpt-4o"}
+        synthesis = model_router.get_model_router().stats()["routes"]["orchestrator:synthesis"]
+        assert synthesis["fallbacks"] == 1
+        assert synthesis["completion_tokens"] == 5
+
+    async def test_last_deployment_is_not_timed_out(self, monkeypatch):
+        from app.config import settings
+        from app.services import model_router
+
+        monkeypatch.setattr(settings, "model_routes", {"scribe": ["slow-model"]})
+        monkeypatch.setattr(settings, "model_route_timeout", 0.05)
+        monkeypatch.setattr(model_router, "_model_router", None)
+        fake = FakeAzureOpenAI(FakeConfig(time_scale=0, output_tokens=5))
+        service = self._service(fake, {"slow-model": "slow"})
+
+        response = await service.complete_with_usage("Draft the post", route="scribe")
+
+        assert response.content
+        scribe = model_router.get_model_router().stats()["routes"]["scribe"]
+        assert (scribe["calls"], scribe["fallbacks"], scribe["errors"]) == (1, 0, 0)
+
+    @pytest.mark.parametrize("failure", ["500", "disconnect"])
+    async def test_server_and_connection_errors_fall_back(self, monkeypatch, failure):
+        from app.config import settings
+        from app.services import model_router
+
+        monkeypatch.setattr(settings, "model_routes", {"scribe": ["broken-model", "gpt-4o"]})
+        monkeypatch.setattr(model_router, "_model_router", None)
+        fake = FakeAzureOpenAI(FakeConfig(time_scale=0, output_tokens=5))
+        service = self._service(fake, {"broken-model": failure})
+
+        response = await service.complete_with_usage("Draft the post", route="scribe")
+
+        assert response.content
+        scribe = model_router.get_model_router().stats()["routes"]["scribe"]
+        assert (scribe["calls"], scribe["fallbacks"], scribe["errors"]) == (1, 1, 0)
+        assert [call.deployment for call in fake.calls] == ["gpt-4o"]
+
+    async def test_stream_stalled_before_first_chunk_falls_back(self, monkeypatch):
+        from app.config import settings
+        from app.services import model_router
+
+        monkeypatch.setattr(settings, "model_routes", {"orchestrator:synthesis": ["stalled-model", "gpt-4o"]})
+        monkeypatch.setattr(settings, "model_route_timeout", 0.2)
+        monkeypatch.setattr(model_router, "_model_router", None)
+        fake = FakeAzureOpenAI(FakeConfig(time_scale=0, output_tokens=5))
+        service = self._service(fake, {"stalled-model": "stall"})
+
+        text = await service.stream_with_callback("Write it up", route="orchestrator:synthesis")
+
+        assert text
+        assert model_router.get_model_router().stats()["routes"]["orchestrator:synthesis"]["fallbacks"] == 1
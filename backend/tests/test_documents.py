@@ -2,11 +2,15 @@
 
 import pytest
 import uuid
+from unittest.mock import patch
 from httpx import AsyncClient
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.database import Document
+from app.agents import orchestrator
+from app.models.database import AgentRollup, AgentTrace, Conversation, Document
 from app.models.schemas import DocumentResponse
+from app.services.document_service import find_platform_section, patch_platform_section
 
 
 class TestListDocuments:
@@ -62,6 +66,33 @@ class TestListDocuments:
         response = await client.get("/api/documents?limit=10&offset=0")
         assert response.status_code == 200
 
+    async def test_list_documents_summary_fields(
+        self, client: AsyncClient, sample_document: Document
+    ):
+        """fields=summary should omit content and include size and preview."""
+        response = await client.get("/api/documents?fields=summary")
+        assert response.status_code == 200
+        item = next(d for d in response.json() if d["id"] == sample_document.id)
+        assert "content" not in item
+        assert "metadata" not in item
+        assert item["title"] == sample_document.title
+        assert item["size"] == len(sample_document.content)
+        assert sample_document.content.startswith(item["preview"])
+
+    async def test_list_documents_explicit_fields(
+        self, client: AsyncClient, sample_document: Document
+    ):
+        """An explicit field list should return only those fields plus id."""
+        response = await client.get("/api/documents?fields=title,doc_type")
+        assert response.status_code == 200
+        for item in response.json():
+            assert set(item) == {"id", "title", "doc_type"}
+
+    async def test_list_documents_unknown_field(self, client: AsyncClient):
+        """Unknown field names should be rejected with 400."""
+        response = await client.get("/api/documents?fields=title,password")
+        assert response.status_code == 400
+
 
 class TestGetDocument:
     """Tests for GET /api/documents/{id} endpoint."""
@@ -203,3 +234,170 @@ class TestExportDocument:
         )
         assert "content-disposition" in response.headers
         assert "attachment" in response.headers["content-disposition"]
+
+
+_SOCIAL_POST = """# Dashboard launch
+
+## LinkedIn
+
+Old LinkedIn post.
+
+```platform-linkedin
+{"content": "old"}
+```
+
+## Instagram
+
+Old caption.
+
+```platform-instagram
+{"content": "old caption"}
+```
+
+## Posting schedule
+
+Tuesday 9am.
+"""
+
+
+class TestPlatformSections:
+    """Tests for locating and patching one platform's content."""
+
+    def test_patch_heading_section_keeps_rest(self):
+        """A heading section gets the new body under its own heading; other sections are untouched."""
+        content, patched = patch_platform_section(
+            _SOCIAL_POST, "instagram", "### Instagram caption\n\nNew caption.\n\n```platform-instagram\n{}\n```"
+        )
+        assert patched == "section"
+        assert "## Instagram\n\nNew caption." in content
+        assert "Old caption." not in content and "### Instagram caption" not in content
+        assert "Old LinkedIn post." in content
+        assert content.endswith("## Posting schedule\n\nTuesday 9am.\n")
+
+    def test_patch_preview_card_only(self):
+        """Without a heading, only the platform's preview card is swapped."""
+        content = 'Intro\n\n```platform-x\n{"content": "a"}\n```\n\nOutro\n'
+        patched_content, patched = patch_platform_section(
+            content, "twitter", 'Thread text\n```platform-twitter\n{"content": "b"}\n```\nNotes'
+        )
+        assert patched == "preview"
+        assert patched_content == 'Intro\n\n```platform-twitter\n{"content": "b"}\n```\n\nOutro\n'
+
+    def test_missing_platform_is_appended(self):
+        """A platform the document doesn't cover gets a new section at the end."""
+        content, patched = patch_platform_section(_SOCIAL_POST, "twitter", "Fresh thread.")
+        assert patched == "appended"
+        assert content.endswith("## Twitter/X\n\nFresh thread.\n")
+
+    def test_shared_and_fenced_headings_are_skipped(self):
+        """Headings naming several platforms, or inside code blocks, aren't a platform's section."""
+        content = "## LinkedIn and Instagram\n\nBoth.\n\n```\n## Instagram\n```\n"
+        assert find_platform_section(content, "instagram") is None
+
+
+class TestRegeneratePlatform:
+    """Tests for POST /api/documents/{document_id}/regenerate endpoint."""
+
+    @staticmethod
+    def _fake_execute(calls: list):
+        async def fake(agent_name, task, context, conversation_id, ws_manager, db, queued_at=None):
+            calls.append((agent_name, task, context))
+            result = "## Instagram\n\nShorter caption." if agent_name == "scribe" else "Score 9/10"
+            return result, 50, {"citations": [{"title": f"{agent_name} source"}]}
+        return fake
+
+    async def test_regenerate_patches_one_platform(
+        self, client: AsyncClient, db_session: AsyncSession, sample_conversation: Conversation
+    ):
+        """Only scribe and advisor run, with the stored context; the section is patched in place."""
+        document = Document(
+            id=str(uuid.uuid4()),
+            conversation_id=sample_conversation.id,
+            title="Social Post: Dashboard launch",
+            doc_type="social_post",
+            content=_SOCIAL_POST,
+            metadata_={"topic": "Dashboard", "context": {"memory": "Brand voice"}, "citations": [{"title": "old"}]},
+        )
+        db_session.add(document)
+        await db_session.flush()
+
+        calls = []
+        with patch.object(orchestrator, "_execute_agent", self._fake_execute(calls)):
+            response = await client.post(
+                f"/api/documents/{document.id}/regenerate",
+                json={"platform": "instagram", "instruction": "Make it shorter"},
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [name for name, _, _ in calls] == ["scribe", "advisor"]
+        _, scribe_task, scribe_context = calls[0]
+        assert scribe_context["platforms"] == ["instagram"]
+        assert scribe_context["previous_results"] == {"memory": "Brand voice"}
+        assert "Make it shorter" in scribe_task and "Old caption." in scribe_task
+        assert calls[1][2]["previous_results"]["scribe"] == "## Instagram\n\nShorter caption."
+
+        assert data["id"] == document.id
+        assert "Shorter caption." in data["content"] and "Old caption." not in data["content"]
+        assert "Old LinkedIn post." in data["content"]
+        regeneration = data["metadata"]["regenerations"][-1]
+        assert regeneration["platform"] == "instagram"
+        assert regeneration["patched"] == "section"
+        assert regeneration["advisor_review"] == "Score 9/10"
+        assert [c["title"] for c in data["metadata"]["citations"]] == ["old", "scribe source", "advisor source"]
+
+    async def test_failed_regeneration_keeps_failed_trace(
+        self, client: AsyncClient, db_session: AsyncSession, sample_conversation: Conversation
+    ):
+        """A failed regeneration should persist a failed trace and leave the document untouched."""
+        document = Document(
+            id=str(uuid.uuid4()),
+            conversation_id=sample_conversation.id,
+            title="Social Post: Dashboard launch",
+            doc_type="social_post",
+            content=_SOCIAL_POST,
+            metadata_={"topic": "Dashboard"},
+        )
+        db_session.add(document)
+        await db_session.flush()
+        document_id, conversation_id = document.id, sample_conversation.id
+
+        async def failing(agent_name, task, context, conversation_id, ws_manager, db, queued_at=None):
+            return "Error from scribe: rate limited", 0, {}
+
+        try:
+            with patch.object(orchestrator, "_execute_agent", failing):
+                response = await client.post(
+                    f"/api/documents/{document_id}/regenerate",
+                    json={"platform": "instagram", "instruction": "Make it shorter"},
+                )
+            assert response.status_code == 500
+
+            await db_session.rollback()  # What get_db does outside tests; committed rows survive it
+            traces = (await db_session.execute(
+                select(AgentTrace).where(AgentTrace.task_type == "platform_regeneration")
+            )).scalars().all()
+            assert [t.status for t in traces] == ["failed"]
+            assert "rate limited" in traces[0].error
+            saved = await db_session.get(Document, document_id)
+            assert saved.content == _SOCIAL_POST
+        finally:
+            # The route committed; clean up so later tests see an empty database
+            await db_session.rollback()
+            await db_session.execute(delete(AgentTrace))
+            await db_session.execute(delete(AgentRollup))
+            await db_session.execute(delete(Document).where(Document.id == document_id))
+            await db_session.execute(delete(Conversation).where(Conversation.id == conversation_id))
+            await db_session.commit()
+
+    async def test_regenerate_errors(self, client: AsyncClient, sample_document: Document):
+        """Unknown documents, non-social documents and unknown platforms are rejected."""
+        payload = {"platform": "twitter", "instruction": "Punchier"}
+        response = await client.post(f"/api/documents/{uuid.uuid4()}/regenerate", json=payload)
+        assert response.status_code == 404
+        response = await client.post(f"/api/documents/{sample_document.id}/regenerate", json=payload)
+        assert response.status_code == 400
+        response = await client.post(
+            f"/api/documents/{sample_document.id}/regenerate", json={"platform": "tiktok", "instruction": "x"}
+        )
+        assert response.status_code == 422
@@ -4,11 +4,45 @@ import pytest
 import asyncio
 import uuid
 import json
+import os
+import shutil
+import tempfile
 from datetime import datetime
 
+import msgpack
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.websocket import ConnectionManager, ReplayStore, SLOW_CONSUMER_CLOSE_CODE, _Outbound
+from app.api import framing
 from app.models.database import Conversation
+from app.services.event_bus import InProcessEventBus, UnixSocketEventBus
+
+
+class FakeWebSocket:
+    """Minimal WebSocket stand-in whose sends can be held open to simulate a slow client."""
+
+    def __init__(self, blocked: bool = False):
+        self.sent: list[dict] = []
+        self.binary: list[bytes] = []
+        self.subprotocol: str | None = None
+        self.closed_with: int | None = None
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def accept(self, subprotocol: str | None = None):
+        self.subprotocol = subprotocol
+
+    async def send_text(self, text: str):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        await self.gate.wait()
+        self.binary.append(data)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
 
 
 class TestWebSocketConnection:
@@ -176,3 +210,408 @@ class TestWebSocketEvents:
         assert event["event_type"] == "document.generated"
         assert "document_id" in event["data"]
         assert "title" in event["data"]
+
+
+class TestConnectionManagerFanOut:
+    """Tests for per-connection send queues and slow-consumer policies."""
+
+    async def _settle(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    async def _raw_token(self, manager: ConnectionManager, token: str):
+        """Publish a token frame directly, bypassing coalescing."""
+        await manager.broadcast("conv", "stream.token", {"agent_name": "orchestrator", "token": token})
+
+    async def test_slow_client_does_not_block_others(self):
+        """Broadcast should return immediately and fast clients should still receive."""
+        manager = ConnectionManager(max_queue_size=8, policy="drop_oldest")
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        await manager.connect(slow, "conv")
+        await manager.connect(fast, "conv")
+
+        await asyncio.wait_for(manager.send_agent_started("conv", "orchestrator", "task"), timeout=1)
+        await self._settle()
+
+        assert [e["event_type"] for e in fast.sent] == ["agent.started"]
+        assert slow.sent == []
+        assert manager.queue_depth() == 0  # slow client's message is in flight, not queued
+        manager.disconnect(slow, "conv")
+        manager.disconnect(fast, "conv")
+
+    async def test_drop_oldest_discards_tokens_first(self):
+        """A full queue should shed the oldest stream tokens but keep lifecycle events."""
+        manager = ConnectionManager(max_queue_size=3, policy="drop_oldest")
+        ws = FakeWebSocket(blocked=True)
+        await manager.connect(ws, "conv")
+        await manager.send_agent_started("conv", "orchestrator", "task")  # taken by the writer
+        await self._settle()
+
+        await manager.send_agent_thinking("conv", "orchestrator", "thinking")
+        for token in ("a", "b", "c", "d"):
+            await self._raw_token(manager, token)
+        ws.gate.set()
+        await self._settle()
+
+        tokens = [e["data"]["token"] for e in ws.sent if e["event_type"] == "stream.token"]
+        assert "agent.thinking" in [e["event_type"] for e in ws.sent]
+        assert tokens == ["c", "d"]
+        manager.disconnect(ws, "conv")
+
+    async def test_coalesce_merges_tokens(self):
+        """Coalescing should merge queued tokens per agent without losing text."""
+        manager = ConnectionManager(max_queue_size=2, policy="coalesce")
+        ws = FakeWebSocket(blocked=True)
+        await manager.connect(ws, "conv")
+        await manager.send_agent_started("conv", "orchestrator", "task")
+        await self._settle()
+
+        for token in ("Hel", "lo", " wor", "ld"):
+            await self._raw_token(manager, token)
+        ws.gate.set()
+        await self._settle()
+
+        text = "".join(e["data"]["token"] for e in ws.sent if e["event_type"] == "stream.token")
+        assert text == "Hello world"
+        manager.disconnect(ws, "conv")
+
+    async def test_disconnect_policy_closes_slow_client(self):
+        """The disconnect policy should drop the connection once its queue overflows."""
+        manager = ConnectionManager(max_queue_size=1, policy="disconnect")
+        ws = FakeWebSocket(blocked=True)
+        await manager.connect(ws, "conv")
+        for token in ("a", "b", "c"):
+            await self._raw_token(manager, token)
+        await self._settle()
+
+        assert ws.closed_with == SLOW_CONSUMER_CLOSE_CODE
+        assert manager.connection_count() == 0
+
+    async def test_tokens_coalesced_into_few_frames(self):
+        """Many small tokens should arrive as a handful of frames with identical text."""
+        manager = ConnectionManager(token_flush_ms=20, token_flush_chars=50)
+        ws = FakeWebSocket()
+        await manager.connect(ws, "conv")
+
+        tokens = [f"t{i} " for i in range(100)]
+        for token in tokens:
+            await manager.send_stream_token("conv", "orchestrator", token)
+        manager.flush_tokens("conv", "orchestrator")
+        await self._settle()
+
+        frames = [e for e in ws.sent if e["event_type"] == "stream.token"]
+        assert "".join(e["data"]["token"] for e in frames) == "".join(tokens)
+        assert len(frames) <= len(tokens) // 10
+        manager.disconnect(ws, "conv")
+
+    async def test_buffered_tokens_flush_on_interval(self):
+        """A partial batch should still be delivered once the flush interval passes."""
+        manager = ConnectionManager(token_flush_ms=10, token_flush_chars=1000)
+        ws = FakeWebSocket()
+        await manager.connect(ws, "conv")
+
+        await manager.send_stream_token("conv", "orchestrator", "partial")
+        await self._settle()
+        assert ws.sent == []
+        await asyncio.sleep(0.05)
+
+        assert [e["data"]["token"] for e in ws.sent] == ["partial"]
+        manager.disconnect(ws, "conv")
+
+    async def test_tokens_flushed_before_next_event(self):
+        """Buffered tokens must be sent before any later event for the conversation."""
+        manager = ConnectionManager(token_flush_ms=1000, token_flush_chars=1000)
+        ws = FakeWebSocket()
+        await manager.connect(ws, "conv")
+
+        await manager.send_stream_token("conv", "orchestrator", "Done.")
+        await manager.send_agent_completed("conv", "orchestrator", "ok", 10)
+        await self._settle()
+
+        assert [e["event_type"] for e in ws.sent] == ["stream.token", "agent.completed"]
+        manager.disconnect(ws, "conv")
+
+    def test_unknown_policy_rejected(self):
+        """Misconfigured policies should fail fast."""
+        with pytest.raises(ValueError):
+            ConnectionManager(policy="block")
+
+
+class TestEventBus:
+    """Tests for cross-worker delivery through the Unix socket event bus."""
+
+    @pytest.fixture
+    def socket_path(self):
+        # Unix socket paths are limited to ~100 bytes, so avoid pytest's long tmp_path
+        directory = tempfile.mkdtemp(prefix="bus")
+        yield os.path.join(directory, "bus.sock")
+        shutil.rmtree(directory, ignore_errors=True)
+
+    async def _wait_for(self, predicate, timeout: float = 2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not predicate():
+            assert asyncio.get_running_loop().time() < deadline, "timed out waiting for delivery"
+            await asyncio.sleep(0.01)
+
+    async def test_events_reach_clients_on_other_workers(self, socket_path: str):
+        """An event published by one worker should reach a client connected to another, in order."""
+        publisher = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        subscriber = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        await publisher.bus.start()
+        await subscriber.bus.start()
+        assert publisher.bus.broker is not None  # first worker elected itself broker host
+        assert subscriber.bus.broker is None
+
+        ws = FakeWebSocket()
+        await subscriber.connect(ws, "conv")
+        await self._wait_for(lambda: "conv" in publisher.bus.broker._topics)
+        await publisher.send_agent_started("conv", "orchestrator", "task")
+        for i in range(20):
+            await publisher.send_agent_thinking("conv", "orchestrator", f"step {i}")
+        await publisher.send_stream_token("conv", "orchestrator", "Hello")
+        await publisher.send_agent_completed("conv", "orchestrator", "ok", 10)
+        await self._wait_for(lambda: len(ws.sent) == 23)
+
+        assert [e["event_type"] for e in ws.sent][0] == "agent.started"
+        assert [e["data"]["thought"] for e in ws.sent[1:21]] == [f"step {i}" for i in range(20)]
+        assert [e["event_type"] for e in ws.sent[21:]] == ["stream.token", "agent.completed"]
+
+        subscriber.disconnect(ws, "conv")
+        await subscriber.bus.stop()
+        await publisher.bus.stop()
+
+    async def test_broker_skips_workers_not_watching_the_conversation(self, socket_path: str):
+        """A worker should only receive events for conversations its clients are watching."""
+        publisher = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        watcher = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        bystander = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        for manager in (publisher, watcher, bystander):
+            await manager.bus.start()
+        broker = publisher.bus.broker
+
+        watched, other = FakeWebSocket(), FakeWebSocket()
+        await watcher.connect(watched, "conv")
+        await bystander.connect(other, "other")
+        await self._wait_for(lambda: "conv" in broker._topics and "other" in broker._topics)
+
+        await publisher.send_agent_started("conv", "orchestrator", "task")
+        await publisher.send_agent_started("other", "orchestrator", "task")
+        # The broker relays in arrival order, so "other" arriving means "conv" was skipped
+        await self._wait_for(lambda: len(watched.sent) == 1 and len(other.sent) == 1)
+        assert bystander.replay.last_seq("conv") == 0
+        assert publisher.replay.last_seq("conv") == 1  # the sender still gets its own events
+
+        watcher.disconnect(watched, "conv")
+        bystander.disconnect(other, "other")
+        for manager in (bystander, watcher, publisher):
+            await manager.bus.stop()
+
+    async def test_seq_keeps_increasing_when_a_run_moves_worker(self, socket_path: str):
+        """A worker that never saw a conversation should not restart its numbering."""
+        first = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        second = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        watcher = ConnectionManager(bus=UnixSocketEventBus(socket_path))
+        for manager in (first, second, watcher):
+            await manager.bus.start()
+
+        ws = FakeWebSocket()
+        await watcher.connect(ws, "conv")
+        await self._wait_for(lambda: "conv" in first.bus.broker._topics)
+        for i in range(3):
+            await first.send_agent_thinking("conv", "orchestrator", f"step {i}")
+        await self._wait_for(lambda: len(ws.sent) == 3)
+        await second.send_agent_started("conv", "orchestrator", "next message")
+        await self._wait_for(lambda: len(ws.sent) == 4)
+
+        assert [e["seq"] for e in ws.sent] == [1, 2, 3, 4]
+        await self._wait_for(lambda: second.replay.last_seq("conv") == 4)
+
+        watcher.disconnect(ws, "conv")
+        for manager in (watcher, second, first):
+            await manager.bus.stop()
+
+    async def test_subscription_outlives_the_last_client_by_the_replay_window(self):
+        """Workers should keep a conversation's events long enough for its client to resume."""
+        calls = []
+
+        class RecordingBus(InProcessEventBus):
+            def subscribe(self, conversation_id):
+                calls.append(("subscribe", conversation_id))
+
+            def unsubscribe(self, conversation_id):
+                calls.append(("unsubscribe", conversation_id))
+
+        manager = ConnectionManager(bus=RecordingBus(), replay=ReplayStore(100, 10_000, 100_000, 0.05))
+        ws = FakeWebSocket()
+        await manager.connect(ws, "conv")
+        manager.disconnect(ws, "conv")
+        await manager.connect(FakeWebSocket(), "conv")  # back within the window: no churn
+        assert calls == [("subscribe", "conv")]
+
+        manager.disconnect(next(iter(manager.active_connections["conv"])), "conv")
+        await asyncio.sleep(0.1)
+        assert calls == [("subscribe", "conv"), ("unsubscribe", "conv")]
+
+    async def test_in_process_bus_skips_conversations_without_clients(self):
+        """Without replay, the default bus should not publish events nobody can receive."""
+        published = []
+        bus = InProcessEventBus()
+        manager = ConnectionManager(bus=bus, replay=ReplayStore(0, 0, 0, 0))
+        bus.bind(lambda *event: published.append(event))
+
+        await manager.send_agent_started("conv", "orchestrator", "task")
+        await manager.send_stream_token("conv", "orchestrator", "token")
+
+        assert published == []
+
+
+class TestEventReplay:
+    """Tests for resuming a conversation with ?last_seq after a reconnect."""
+
+    async def _settle(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    async def test_reconnect_resumes_after_last_seq(self):
+        """Events published while the client was away should be replayed in order, once."""
+        manager = ConnectionManager()
+        first = FakeWebSocket()
+        await manager.connect(first, "conv")
+        await manager.send_agent_started("conv", "orchestrator", "task")
+        await manager.send_agent_thinking("conv", "orchestrator", "one")
+        await self._settle()
+        last_seq = first.sent[-1]["seq"]
+        manager.disconnect(first, "conv")
+
+        await manager.send_agent_thinking("conv", "orchestrator", "two")
+        await manager.send_stream_token("conv", "orchestrator", "Hi")
+        await manager.send_agent_completed("conv", "orchestrator", "ok", 10)
+
+        second = FakeWebSocket()
+        await manager.connect(second, "conv", last_seq=last_seq)
+        await manager.send_document_generated("conv", "doc-1", "proposal", "Title")
+        await self._settle()
+
+        assert [e["event_type"] for e in second.sent] == [
+            "agent.thinking", "stream.token", "agent.completed", "document.generated",
+        ]
+        seqs = [e["seq"] for e in second.sent]
+        assert seqs == list(range(last_seq + 1, last_seq + 5))
+        manager.disconnect(second, "conv")
+
+    async def test_gap_reported_when_events_evicted(self):
+        """A client that fell behind the log should be told which events are gone."""
+        manager = ConnectionManager(replay=ReplayStore(3, 1 << 20, 1 << 20, 60))
+        for i in range(10):
+            await manager.send_agent_thinking("conv", "orchestrator", f"step {i}")
+
+        ws = FakeWebSocket()
+        await manager.connect(ws, "conv", last_seq=2)
+        await self._settle()
+
+        assert ws.sent[0]["event_type"] == "replay.gap"
+        assert ws.sent[0]["data"] == {"last_seq": 2, "first_seq": 8}
+        assert [e["seq"] for e in ws.sent[1:]] == [8, 9, 10]
+        manager.disconnect(ws, "conv")
+
+    async def test_gap_reported_when_server_restarted(self):
+        """A last_seq the server has no log for, or is ahead of, should report a gap and restart numbering."""
+        manager = ConnectionManager()  # Fresh process: no log for the conversation
+        ws = FakeWebSocket()
+        await manager.connect(ws, "conv", last_seq=40)
+        await manager.send_agent_thinking("conv", "orchestrator", "after restart")
+        await self._settle()
+
+        assert ws.sent[0]["event_type"] == "replay.gap"
+        assert ws.sent[0]["data"] == {"last_seq": 40, "first_seq": None}
+        assert ws.sent[1]["seq"] == 1
+        manager.disconnect(ws, "conv")
+
+        behind = FakeWebSocket()  # Log exists but ends before the client's last_seq
+        await manager.connect(behind, "conv", last_seq=40)
+        await self._settle()
+
+        assert behind.sent[0]["data"] == {"last_seq": 40, "first_seq": 1}
+        assert [e["seq"] for e in behind.sent[1:]] == [1]
+        manager.disconnect(behind, "conv")
+
+    def test_replay_store_bounded_by_bytes_and_age(self):
+        """Logs should shed old events by size and age, and evict stale conversations."""
+        store = ReplayStore(max_events=100, max_bytes=30, max_total_bytes=1000, max_age=10)
+
+        def event(seq: int, created: float) -> _Outbound:
+            return _Outbound("agent.thinking", "x" * 10, {}, "", created, seq)
+
+        for seq in range(1, 6):
+            store.record("a", event(seq, created=100.0))
+        assert store.total_bytes == 30  # only the newest three fit
+
+        store.record("b", event(1, created=105.0))
+        store.record("b", event(2, created=115.0))  # "a" is now older than max_age
+        assert store.last_seq("a") == 0
+        assert store.last_seq("b") == 2
+        assert store.total_bytes == 20
+
+
+class TestCompactFraming:
+    """Tests for the negotiated MessagePack WebSocket encoding."""
+
+    def test_subprotocol_negotiation(self):
+        """Only clients offering the msgpack subprotocol should get binary frames."""
+        assert framing.negotiate_encoding({"subprotocols": [framing.MSGPACK_SUBPROTOCOL]}) == "msgpack"
+        assert framing.negotiate_encoding({"subprotocols": []}) == "json"
+        assert framing.negotiate_encoding({}) == "json"
+
+    async def test_msgpack_client_receives_compact_frames(self):
+        """A msgpack connection should get binary frames carrying the same events."""
+        manager = ConnectionManager()
+        packed, plain = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(packed, "conv", encoding="msgpack")
+        await manager.connect(plain, "conv")
+
+        await manager.send_agent_started("conv", "scribe", "Draft posts")
+        await manager.send_stream_token("conv", "orchestrator", "Hello")
+        manager.flush_tokens("conv")
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        assert packed.subprotocol == framing.MSGPACK_SUBPROTOCOL
+        assert packed.sent == [] and len(packed.binary) == 2
+        decoded = [framing.decode_compact(frame) for frame in packed.binary]
+        assert [(e["event_type"], e["seq"], e["data"]) for e in decoded] == [
+            (e["event_type"], e["seq"], e["data"]) for e in plain.sent
+        ]
+        assert msgpack.unpackb(packed.binary[1])[3] == [framing.AGENT_CODES["orchestrator"], "Hello"]
+        assert len(packed.binary[1]) < len(json.dumps(plain.sent[1]))
+        manager.disconnect(packed, "conv")
+        manager.disconnect(plain, "conv")
+
+    async def test_deflate_negotiated_with_msgpack_frames(self):
+        """uvicorn should accept permessage-deflate alongside the msgpack subprotocol."""
+        import socket
+        import uvicorn
+        from fastapi import FastAPI
+        from websockets.asyncio.client import connect
+        from app.api.websocket import manager, websocket_router
+
+        app = FastAPI()
+        app.include_router(websocket_router)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+        serving = asyncio.create_task(server.serve())
+        try:
+            while not server.started:
+                await asyncio.sleep(0.01)
+            async with connect(
+                f"ws://127.0.0.1:{port}/ws/agents/deflate-conv", subprotocols=[framing.MSGPACK_SUBPROTOCOL]
+            ) as ws:
+                assert ws.subprotocol == framing.MSGPACK_SUBPROTOCOL
+                assert "permessage-deflate" in ws.response.headers["Sec-WebSocket-Extensions"]
+                await manager.send_agent_started("deflate-conv", "scribe", "Draft posts")
+                frame = framing.decode_compact(await asyncio.wait_for(ws.recv(), 5))
+                assert frame["event_type"] == "agent.started"
+        finally:
+            server.should_exit = True
+            await serving
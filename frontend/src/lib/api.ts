@@ -15,6 +15,7 @@ import type {
   ResearchRequest,
   BriefingRequest,
   AgentTrace,
+  TraceWaterfall,
   Metrics,
 } from "./types";
 import { getRuntimeApiBase } from "./runtime-config";
@@ -171,6 +172,9 @@ export const analyticsApi = {
     return fetchJson<AgentTrace[]>(`/api/analytics/traces?${params}`);
   },
 
+  waterfall: (traceId: string) =>
+    fetchJson<TraceWaterfall>(`/api/analytics/traces/${traceId}/waterfall`),
+
   metrics: (period: "day" | "week" | "month" = "day") =>
     fetchJson<Metrics>(`/api/analytics/metrics?period=${period}`),
 };
@@ -92,6 +92,28 @@ export interface AgentTrace {
   parent_trace_id: string | null;
 }
 
+export interface WaterfallSpan {
+  id: number;
+  name: string;
+  kind: string;
+  agent: string | null;
+  start_ms: number;
+  duration_ms: number;
+  end_ms: number;
+  parent: number | null;
+}
+
+export interface TraceWaterfall {
+  trace_id: string;
+  agent_name: AgentName;
+  status: string;
+  started_at: string;
+  duration_ms: number | null;
+  total_ms: number;
+  spans: WaterfallSpan[];
+  summary: Record<string, { count: number; total_ms: number; wall_ms: number }>;
+}
+
 // ============ Document Types ============
 
 export interface Document {
@@ -168,14 +190,19 @@ export type WSEventType =
   | "agent.tool_call"
   | "agent.citations"
   | "stream.token"
+  | "agent.draft"
+  | "agent.review"
   | "document.generated"
   | "response.citations"
   | "connection.established"
-  | "connection.error";
+  | "connection.error"
+  | "replay.gap";
 
 export interface WSEvent<T = unknown> {
   event_type: WSEventType;
   timestamp: string;
+  /** Per-conversation sequence number, used to resume after a reconnect. */
+  seq?: number;
   data: T;
 }
 
@@ -206,6 +233,20 @@ export interface StreamTokenEvent {
   agent_name: AgentName;
 }
 
+/** One platform's finished draft, sent as soon as it is written. */
+export interface AgentDraftEvent {
+  agent_name: AgentName;
+  platform: "linkedin" | "twitter" | "instagram";
+  content: string;
+}
+
+/** The Advisor's review of one platform's draft, sent while other drafts are still being written. */
+export interface AgentReviewEvent {
+  agent_name: AgentName;
+  platform: "linkedin" | "twitter" | "instagram";
+  content: string;
+}
+
 export interface DocumentGeneratedEvent {
   document_id: string;
   doc_type: string;
@@ -12,6 +12,8 @@ import type {
   AgentHandoffEvent,
   AgentToolCallEvent,
   StreamTokenEvent,
+  AgentDraftEvent,
+  AgentReviewEvent,
   DocumentGeneratedEvent,
   AgentCitationsEvent,
   ResponseCitationsEvent,
@@ -32,9 +34,12 @@ interface WSHandlers {
   onAgentCitations?: EventHandler<AgentCitationsEvent>;
   onResponseCitations?: EventHandler<ResponseCitationsEvent>;
   onStreamToken?: EventHandler<StreamTokenEvent>;
+  onAgentDraft?: EventHandler<AgentDraftEvent>;
+  onAgentReview?: EventHandler<AgentReviewEvent>;
   onDocumentGenerated?: EventHandler<DocumentGeneratedEvent>;
   onConnectionEstablished?: EventHandler<void>;
   onConnectionError?: EventHandler<{ error: string }>;
+  onReplayGap?: EventHandler<{ last_seq: number; first_seq: number | null }>;
   onClose?: EventHandler<void>;
 }
 
@@ -49,6 +54,8 @@ class AgentWebSocket {
   private connectionEpoch = 0;
   /** True while an intentional disconnect is in progress. */
   private intentionalClose = false;
+  /** Sequence number of the last event handled; sent on reconnect to replay missed events. */
+  private lastSeq: number | null = null;
 
   connect(conversationId: string, handlers: WSHandlers = {}): void {
     // Skip if already connected to the same conversation
@@ -65,6 +72,7 @@ class AgentWebSocket {
     this.handlers = handlers;
     this.reconnectAttempts = 0;
     this.intentionalClose = false;
+    this.lastSeq = null;
     this.createConnection();
   }
 
@@ -96,7 +104,8 @@ class AgentWebSocket {
 
     const epoch = this.connectionEpoch;
     const wsBase = getRuntimeWsBase();
-    const url = `${wsBase}/ws/agents/${this.conversationId}`;
+    const resume = this.lastSeq !== null ? `?last_seq=${this.lastSeq}` : "";
+    const url = `${wsBase}/ws/agents/${this.conversationId}${resume}`;
     
     try {
       this.ws = new WebSocket(url);
@@ -152,6 +161,10 @@ class AgentWebSocket {
   }
 
   private handleEvent(event: WSEvent): void {
+    if (event.seq !== undefined) {
+      if (this.lastSeq !== null && event.seq <= this.lastSeq) return; // already handled
+      this.lastSeq = event.seq;
+    }
     const store = useStore.getState();
 
     switch (event.event_type as WSEventType) {
@@ -212,6 +225,20 @@ class AgentWebSocket {
         break;
       }
 
+      case "agent.draft": {
+        const data = event.data as AgentDraftEvent;
+        store.updateAgentStatus(data.agent_name, "executing", `${data.platform} draft ready`);
+        this.handlers.onAgentDraft?.(data);
+        break;
+      }
+
+      case "agent.review": {
+        const data = event.data as AgentReviewEvent;
+        store.updateAgentStatus(data.agent_name, "executing", `${data.platform} reviewed`);
+        this.handlers.onAgentReview?.(data);
+        break;
+      }
+
       case "document.generated": {
         const data = event.data as DocumentGeneratedEvent;
         this.handlers.onDocumentGenerated?.(data);
@@ -246,6 +273,15 @@ class AgentWebSocket {
         break;
       }
 
+      case "replay.gap": {
+        const data = event.data as { last_seq: number; first_seq: number | null };
+        console.warn("[WS] Some events were missed while disconnected:", data);
+        // The server may have restarted its numbering; accept whatever it replays next
+        this.lastSeq = data.first_seq !== null ? data.first_seq - 1 : null;
+        this.handlers.onReplayGap?.(data);
+        break;
+      }
+
       default:
         console.warn("[WS] Unknown event type:", event.event_type);
     }